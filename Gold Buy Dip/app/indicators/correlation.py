@@ -0,0 +1,179 @@
+"""
+Streaming return-correlation matrix for pair selection.
+
+The research notebook's ``PAIRS_TO_TEST`` holds correlation coefficients computed
+once offline. ``RollingCorrelation`` keeps rolling co-moment sums for N tracked
+symbols over the last ``window`` bar returns and updates the full N x N matrix per
+bar with two rank-1 updates (add the new return vector, remove the one leaving the
+window), so re-ranking 100+ symbols costs well under a millisecond per bar.
+
+``top_pairs`` returns candidates in the notebook's ``(symbol1, symbol2,
+correlation)`` format for either RSI Pairs mode: most negative correlations for
+``negative``, most positive for ``positive``. ``pair_configs`` turns them into
+RSIPairsConfig copies for RSIPairsStrategy instances.
+"""
+
+from __future__ import annotations
+
+import copy
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+class RollingCorrelation:
+    """
+    Rolling Pearson correlation of simple bar returns across symbols.
+
+    Feed one close per symbol per bar with ``update``. A symbol with no price for a
+    bar (missing key or NaN) contributes a zero return for that bar. Running sums
+    are rebuilt from the return buffer every ``resync_every`` updates to stop
+    floating point drift from the add/remove updates.
+    """
+
+    def __init__(self, symbols: Sequence[str], window: int = 500, resync_every: Optional[int] = None):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.window = window
+        self.resync_every = resync_every or window
+
+        n = len(self.symbols)
+        self._returns = np.zeros((window, n))
+        self._pos = 0
+        self._count = 0
+        self._since_resync = 0
+        self._sum = np.zeros(n)
+        self._cross = np.zeros((n, n))
+        self._last_close = np.full(n, np.nan)
+        self._upper = np.triu_indices(n, k=1)
+
+    def __len__(self) -> int:
+        """Number of returns currently in the window"""
+        return self._count
+
+    def _as_vector(self, closes: Union[Mapping[str, float], Sequence[float], np.ndarray]) -> np.ndarray:
+        if isinstance(closes, Mapping):
+            vector = np.full(len(self.symbols), np.nan)
+            for symbol, price in closes.items():
+                idx = self.index.get(symbol)
+                if idx is not None and price is not None:
+                    vector[idx] = price
+            return vector
+        vector = np.asarray(closes, dtype=np.float64)
+        if vector.shape != (len(self.symbols),):
+            raise ValueError(f"Expected {len(self.symbols)} closes, got shape {vector.shape}")
+        return vector
+
+    def update(self, closes: Union[Mapping[str, float], Sequence[float], np.ndarray]):
+        """Add one bar of closes (dict by symbol, or a vector in ``symbols`` order)"""
+        closes = self._as_vector(closes)
+        first_bar = np.isnan(self._last_close).all()
+        returns = closes / self._last_close - 1.0
+        returns[~np.isfinite(returns)] = 0.0
+        self._last_close = np.where(np.isnan(closes), self._last_close, closes)
+
+        # Nothing to difference against yet
+        if first_bar:
+            return
+        outgoing = self._returns[self._pos].copy() if self._count == self.window else None
+
+        self._returns[self._pos] = returns
+        self._pos = (self._pos + 1) % self.window
+        self._sum += returns
+        self._cross += np.outer(returns, returns)
+        if outgoing is not None:
+            self._sum -= outgoing
+            self._cross -= np.outer(outgoing, outgoing)
+        else:
+            self._count += 1
+
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every:
+            self.resync()
+
+    def warm_up(self, close_matrix: np.ndarray):
+        """Seed from history: close_matrix has one row per bar, one column per symbol"""
+        close_matrix = np.asarray(close_matrix, dtype=np.float64)
+        tail = close_matrix[-(self.window + 1):]
+        for row in tail:
+            self.update(row)
+        self.resync()
+
+    def resync(self):
+        """Recompute the running sums from the return buffer"""
+        window = self._window_returns()
+        self._sum = window.sum(axis=0)
+        self._cross = window.T @ window
+        self._since_resync = 0
+
+    def _window_returns(self) -> np.ndarray:
+        if self._count < self.window:
+            return self._returns[:self._count]
+        return self._returns
+
+    def matrix(self) -> np.ndarray:
+        """N x N correlation matrix (NaN where a symbol had no variance in the window)"""
+        n = self._count
+        n_symbols = len(self.symbols)
+        if n < 2:
+            return np.full((n_symbols, n_symbols), np.nan)
+        mean = self._sum / n
+        cov = self._cross / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        corr[np.outer(std, std) == 0] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def correlation(self, symbol1: str, symbol2: str) -> float:
+        return float(self.matrix()[self.index[symbol1], self.index[symbol2]])
+
+    def top_pairs(self, mode: str = "negative", limit: int = 20,
+                  threshold: Optional[float] = None) -> List[Tuple[str, str, float]]:
+        """
+        Best pairs for an RSI Pairs mode, as ``(symbol1, symbol2, correlation)``.
+
+        ``negative`` ranks by most negative correlation, ``positive`` by most
+        positive. ``threshold`` drops pairs weaker than it (e.g. -0.25 / 0.8).
+        """
+        if mode not in ("negative", "positive"):
+            raise ValueError(f"Unknown correlation mode: {mode}")
+
+        rows, cols = self._upper
+        values = self.matrix()[rows, cols]
+        valid = ~np.isnan(values)
+        if threshold is not None:
+            valid &= values <= threshold if mode == "negative" else values >= threshold
+        candidates = np.flatnonzero(valid)
+        if len(candidates) == 0:
+            return []
+
+        scores = values[candidates] if mode == "negative" else -values[candidates]
+        limit = min(limit, len(candidates))
+        best = candidates[np.argpartition(scores, limit - 1)[:limit]] if limit < len(candidates) else candidates
+        best = best[np.argsort(values[best] if mode == "negative" else -values[best], kind="stable")]
+        return [(self.symbols[rows[i]], self.symbols[cols[i]], float(values[i])) for i in best]
+
+
+def pair_configs(base_config: Any, pairs: Sequence[Tuple[str, str, float]]) -> List[Any]:
+    """Copies of an RSIPairsConfig with symbol1/symbol2 set from top_pairs output"""
+    configs = []
+    for symbol1, symbol2, _ in pairs:
+        config = copy.copy(base_config)
+        config.symbol1 = symbol1
+        config.symbol2 = symbol2
+        configs.append(config)
+    return configs
+
+
+def correlation_table(engine: RollingCorrelation) -> Dict[str, Dict[str, float]]:
+    """Nested dict view of the current matrix, e.g. for status endpoints"""
+    corr = engine.matrix()
+    return {
+        s1: {s2: float(corr[i, j]) for j, s2 in enumerate(engine.symbols) if j != i}
+        for i, s1 in enumerate(engine.symbols)
+    }
@@ -0,0 +1,424 @@
+"""
+Accelerated indicator kernels with pure-Python fallback.
+
+The RSI/ATR series used by RSI 6 Trades and the Z-score/ATR used by Gold Buy Dip
+are plain Python loops. This module holds the same loops, written once over NumPy
+arrays and compiled with Numba when it is installed:
+
+- calculate_rsi_series / calculate_atr_series: Wilder RSI/ATR series, same
+  signature and list output (None before the first value) as in RSI 6 Trades
+- calculate_zscore / calculate_atr: same signature and MT4 semantics as
+  app.indicators.zscore / app.indicators.atr
+- zscore_series / atr_window_series: the value calculate_zscore / calculate_atr
+  would return at every bar of a full history, for backtests
+
+Every kernel performs the same floating point operations in the same order as the
+original code, so outputs are identical (see check_parity). Without Numba,
+calculate_zscore and calculate_atr are the original functions and ACCELERATED is
+False; callers only switch to these implementations when it is True.
+
+Importing this module does not import Numba: availability is checked with
+importlib, and the kernels are compiled on the first call that needs them, so
+processes that never compute an indicator never pay for the JIT.
+
+Run ``python -m app.indicators.kernels`` for the parity check and a 1M-bar
+benchmark.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.indicators.atr import calculate_atr as _python_calculate_atr
+from app.indicators.zscore import calculate_zscore as _python_calculate_zscore
+
+ACCELERATED = importlib.util.find_spec("numba") is not None
+
+_KERNELS: List[str] = []
+_compiled = False
+
+
+def _maybe_jit(fn: Callable) -> Callable:
+    """Register fn for compilation; it stays plain Python until _compile_kernels runs"""
+    _KERNELS.append(fn.__name__)
+    return fn
+
+
+def _compile_kernels() -> None:
+    """Swap every registered kernel for its Numba dispatcher, once per process"""
+    global _compiled
+    if _compiled or not ACCELERATED:
+        return
+    _compiled = True
+    try:
+        from numba import njit
+    except ImportError:
+        # Broken install: the kernels keep working interpreted
+        return
+    namespace = globals()
+    for name in _KERNELS:
+        namespace[name] = njit(cache=True, nogil=True)(namespace[name])
+
+
+# --- Kernels (plain Python, compiled when Numba is available) ---
+
+@_maybe_jit
+def _rsi_from_averages(ag: float, al: float) -> float:
+    if al == 0 and ag == 0:
+        return 50.0
+    if al == 0:
+        return 100.0
+    if ag == 0:
+        return 0.0
+    return 100.0 - (100.0 / (1.0 + ag / al))
+
+
+@_maybe_jit
+def _rsi_series_kernel(closes: np.ndarray, period: int) -> np.ndarray:
+    length = closes.shape[0]
+    out = np.full(length, np.nan)
+    gains = np.zeros(length)
+    losses = np.zeros(length)
+    for i in range(1, length):
+        change = closes[i] - closes[i - 1]
+        gains[i] = max(change, 0.0)
+        losses[i] = max(-change, 0.0)
+
+    avg_gain = 0.0
+    avg_loss = 0.0
+    for i in range(1, period + 1):
+        avg_gain += gains[i]
+        avg_loss += losses[i]
+    avg_gain = avg_gain / period
+    avg_loss = avg_loss / period
+    out[period] = _rsi_from_averages(avg_gain, avg_loss)
+
+    for i in range(period + 1, length):
+        avg_gain = ((avg_gain * (period - 1)) + gains[i]) / period
+        avg_loss = ((avg_loss * (period - 1)) + losses[i]) / period
+        out[i] = _rsi_from_averages(avg_gain, avg_loss)
+    return out
+
+
+@_maybe_jit
+def _true_range(high: float, low: float, prev_close: float) -> float:
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+@_maybe_jit
+def _atr_series_kernel(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int) -> np.ndarray:
+    length = closes.shape[0]
+    out = np.full(length, np.nan)
+    true_ranges = np.zeros(length)
+    for i in range(1, length):
+        true_ranges[i] = _true_range(highs[i], lows[i], closes[i - 1])
+
+    first_atr = 0.0
+    for i in range(1, period + 1):
+        first_atr += true_ranges[i]
+    out[period] = first_atr / period
+
+    for i in range(period + 1, length):
+        out[i] = (out[i - 1] * (period - 1) + true_ranges[i]) / period
+    return out
+
+
+@_maybe_jit
+def _zscore_at(closes: np.ndarray, end: int, period: int) -> float:
+    """Z-score of closes[end] against closes[end - period:end] (MT4 Close[0] vs Close[1..period])"""
+    mean = 0.0
+    for j in range(end - period, end):
+        mean += closes[j]
+    mean = mean / period
+
+    sum_squares = 0.0
+    for j in range(end - period, end):
+        sum_squares += (closes[j] - mean) ** 2
+    std_dev = (sum_squares / period) ** 0.5
+    if std_dev == 0:
+        return 0.0
+    return (closes[end] - mean) / std_dev
+
+
+@_maybe_jit
+def _atr_at(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, end: int, period: int) -> float:
+    """MT4 ATR over bars end-1 .. end-period, each against the previous close"""
+    total = 0.0
+    for i in range(1, period + 1):
+        current = end - i + 1
+        total += _true_range(highs[current], lows[current], closes[current - 1])
+    return total / period
+
+
+@_maybe_jit
+def _zscore_series_kernel(closes: np.ndarray, period: int) -> np.ndarray:
+    length = closes.shape[0]
+    out = np.zeros(length)
+    for end in range(period, length):
+        out[end] = _zscore_at(closes, end, period)
+    return out
+
+
+@_maybe_jit
+def _atr_window_series_kernel(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int) -> np.ndarray:
+    length = closes.shape[0]
+    out = np.full(length, 0.001)
+    for end in range(period + 1, length):
+        out[end] = _atr_at(highs, lows, closes, end, period)
+    return out
+
+
+def _as_float_array(values: Sequence[float]) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+# --- Public API (drop-in replacements) ---
+
+def calculate_rsi_series(closes: List[float], period: int) -> List[Optional[float]]:
+    """Wilder RSI series; identical output to the RSI 6 Trades implementation"""
+    if len(closes) < period + 1:
+        return []
+    _compile_kernels()
+    values = _rsi_series_kernel(_as_float_array(closes), period).tolist()
+    values[:period] = [None] * period
+    return values
+
+
+def calculate_atr_series(highs: List[float], lows: List[float], closes: List[float], period: int) -> List[Optional[float]]:
+    """Wilder ATR series; identical output to the RSI 6 Trades implementation"""
+    if len(closes) < period + 1:
+        return []
+    _compile_kernels()
+    values = _atr_series_kernel(_as_float_array(highs), _as_float_array(lows), _as_float_array(closes), period).tolist()
+    values[:period] = [None] * period
+    return values
+
+
+def _accelerated_calculate_zscore(closes: list, period: int) -> float:
+    """Compiled app.indicators.zscore.calculate_zscore"""
+    if len(closes) < period + 1:
+        return 0
+    _compile_kernels()
+    window = _as_float_array(closes[-(period + 1):])
+    return _zscore_at(window, period, period)
+
+
+def _accelerated_calculate_atr(candles: List, period: int) -> float:
+    """Compiled app.indicators.atr.calculate_atr"""
+    if len(candles) < period + 2:
+        return 0.001
+    _compile_kernels()
+    window = candles[-(period + 1):]
+    highs = np.fromiter((c.high for c in window), dtype=np.float64, count=period + 1)
+    lows = np.fromiter((c.low for c in window), dtype=np.float64, count=period + 1)
+    closes = np.fromiter((c.close for c in window), dtype=np.float64, count=period + 1)
+    return _atr_at(highs, lows, closes, period, period)
+
+
+if ACCELERATED:
+    calculate_zscore = _accelerated_calculate_zscore
+    calculate_atr = _accelerated_calculate_atr
+else:
+    calculate_zscore = _python_calculate_zscore
+    calculate_atr = _python_calculate_atr
+
+
+def zscore_series(closes: Sequence[float], period: int) -> np.ndarray:
+    """calculate_zscore(closes[:i + 1], period) for every bar i, as one array"""
+    _compile_kernels()
+    return _zscore_series_kernel(_as_float_array(closes), period)
+
+
+def atr_window_series(highs: Sequence[float], lows: Sequence[float], closes: Sequence[float], period: int) -> np.ndarray:
+    """calculate_atr(candles[:i + 1], period) for every bar i, as one array"""
+    _compile_kernels()
+    return _atr_window_series_kernel(_as_float_array(highs), _as_float_array(lows), _as_float_array(closes), period)
+
+
+# --- Parity check and benchmark ---
+
+class _Bar:
+    __slots__ = ("high", "low", "close")
+
+    def __init__(self, high: float, low: float, close: float):
+        self.high = high
+        self.low = low
+        self.close = close
+
+
+def _sample_ohlc(n_bars: int, seed: int = 7) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    closes = 2000.0 + np.cumsum(rng.normal(0.0, 1.5, n_bars))
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    highs = np.maximum(opens, closes) + rng.random(n_bars)
+    lows = np.minimum(opens, closes) - rng.random(n_bars)
+    return {"high": highs, "low": lows, "close": closes}
+
+
+def _max_abs_diff(a: Sequence[Optional[float]], b: Sequence[Optional[float]]) -> float:
+    if len(a) != len(b):
+        return float("inf")
+    left = np.array([np.nan if v is None else v for v in a], dtype=np.float64)
+    right = np.array([np.nan if v is None else v for v in b], dtype=np.float64)
+    if not np.array_equal(np.isnan(left), np.isnan(right)):
+        return float("inf")
+    mask = ~np.isnan(left)
+    return float(np.max(np.abs(left[mask] - right[mask]), initial=0.0))
+
+
+def original_rsi_series(closes: List[float], period: int) -> List[Optional[float]]:
+    """The original RSI 6 Trades calculate_rsi_series, kept verbatim as the parity reference"""
+    length = len(closes)
+    if length < period + 1:
+        return []
+    rsis = [None] * length
+    gains = [0.0] * length
+    losses = [0.0] * length
+
+    for i in range(1, length):
+        change = closes[i] - closes[i - 1]
+        gains[i] = max(change, 0.0)
+        losses[i] = max(-change, 0.0)
+
+    avg_gain = sum(gains[1:period + 1]) / period
+    avg_loss = sum(losses[1:period + 1]) / period
+
+    def _compute_rsi(ag, al):
+        if al == 0 and ag == 0: return 50.0
+        if al == 0: return 100.0
+        if ag == 0: return 0.0
+        return 100.0 - (100.0 / (1.0 + ag / al))
+
+    rsis[period] = _compute_rsi(avg_gain, avg_loss)
+
+    for i in range(period + 1, length):
+        avg_gain = ((avg_gain * (period - 1)) + gains[i]) / period
+        avg_loss = ((avg_loss * (period - 1)) + losses[i]) / period
+        rsis[i] = _compute_rsi(avg_gain, avg_loss)
+
+    return rsis
+
+
+def original_atr_series(highs: List[float], lows: List[float], closes: List[float], period: int) -> List[Optional[float]]:
+    """The original RSI 6 Trades calculate_atr_series, kept verbatim as the parity reference"""
+    length = len(closes)
+    if length < period + 1:
+        return []
+    atrs = [None] * length
+    true_ranges = [0.0] * length
+
+    for i in range(1, length):
+        hl = highs[i] - lows[i]
+        hc = abs(highs[i] - closes[i - 1])
+        lc = abs(lows[i] - closes[i - 1])
+        true_ranges[i] = max(hl, hc, lc)
+
+    first_atr = sum(true_ranges[1:period + 1]) / period
+    atrs[period] = first_atr
+
+    for i in range(period + 1, length):
+        atrs[i] = ((atrs[i - 1] or 0.0) * (period - 1) + true_ranges[i]) / period
+
+    return atrs
+
+
+def check_parity(reference_rsi_series: Optional[Callable] = None, reference_atr_series: Optional[Callable] = None,
+                 n_bars: int = 20_000, period: int = 14, tol: float = 1e-12) -> Dict[str, float]:
+    """
+    Compare every accelerated function with its reference on random data.
+
+    RSI / ATR series are compared with the original RSI 6 Trades loops
+    (original_rsi_series / original_atr_series, or the module's
+    python_calculate_rsi_series / python_calculate_atr_series passed in), Z-score
+    and ATR with app.indicators.zscore / app.indicators.atr. Raises AssertionError
+    when any maximum absolute difference exceeds ``tol``; returns the differences.
+    """
+    data = _sample_ohlc(n_bars)
+    highs, lows, closes = data["high"].tolist(), data["low"].tolist(), data["close"].tolist()
+    bars = [_Bar(h, l, c) for h, l, c in zip(highs, lows, closes)]
+    reference_rsi_series = reference_rsi_series or original_rsi_series
+    reference_atr_series = reference_atr_series or original_atr_series
+
+    expected_z = [_python_calculate_zscore(closes[max(0, i - period):i + 1], period) for i in range(n_bars)]
+    expected_atr = [_python_calculate_atr(bars[max(0, i - period - 1):i + 1], period) for i in range(n_bars)]
+    recent = range(n_bars - 200, n_bars)
+
+    diffs = {
+        "rsi_series": _max_abs_diff(calculate_rsi_series(closes, period), reference_rsi_series(closes, period)),
+        "atr_series": _max_abs_diff(calculate_atr_series(highs, lows, closes, period),
+                                    reference_atr_series(highs, lows, closes, period)),
+        "zscore": max(abs(_accelerated_calculate_zscore(closes[:i + 1], period) - expected_z[i]) for i in recent),
+        "atr": max(abs(_accelerated_calculate_atr(bars[:i + 1], period) - expected_atr[i]) for i in recent),
+        "zscore_series": _max_abs_diff(zscore_series(closes, period).tolist(), expected_z),
+        "atr_window_series": _max_abs_diff(atr_window_series(highs, lows, closes, period).tolist(), expected_atr),
+    }
+    failed = {name: diff for name, diff in diffs.items() if not diff <= tol}
+    assert not failed, f"Kernel parity above {tol}: {failed}"
+    return diffs
+
+
+def benchmark(reference_rsi_series: Optional[Callable] = None, reference_atr_series: Optional[Callable] = None,
+              n_bars: int = 1_000_000, period: int = 14) -> Dict[str, Dict[str, float]]:
+    """
+    Time accelerated vs Python implementations over an n_bars series.
+
+    zscore/atr are timed as a full-history backtest pass: the Python side calls the
+    original function once per bar, the accelerated side runs the series kernel.
+    """
+    data = _sample_ohlc(n_bars)
+    highs, lows, closes = data["high"].tolist(), data["low"].tolist(), data["close"].tolist()
+    bars = [_Bar(h, l, c) for h, l, c in zip(highs, lows, closes)]
+    reference_rsi_series = reference_rsi_series or original_rsi_series
+    reference_atr_series = reference_atr_series or original_atr_series
+
+    # Warm the JIT so compilation is not timed
+    calculate_rsi_series(closes[:100], period)
+    calculate_atr_series(highs[:100], lows[:100], closes[:100], period)
+    zscore_series(closes[:100], period)
+    atr_window_series(highs[:100], lows[:100], closes[:100], period)
+
+    cases = {
+        "rsi_series": (
+            lambda: reference_rsi_series(closes, period),
+            lambda: calculate_rsi_series(closes, period),
+        ),
+        "atr_series": (
+            lambda: reference_atr_series(highs, lows, closes, period),
+            lambda: calculate_atr_series(highs, lows, closes, period),
+        ),
+        "zscore": (
+            lambda: [_python_calculate_zscore(closes[i - period:i + 1], period) for i in range(period, n_bars)],
+            lambda: zscore_series(closes, period),
+        ),
+        "atr": (
+            lambda: [_python_calculate_atr(bars[i - period - 1:i + 1], period) for i in range(period + 1, n_bars)],
+            lambda: atr_window_series(highs, lows, closes, period),
+        ),
+    }
+
+    results = {}
+    for name, (python_fn, fast_fn) in cases.items():
+        start = time.perf_counter()
+        python_fn()
+        python_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        fast_fn()
+        fast_seconds = time.perf_counter() - start
+        results[name] = {
+            "python_s": python_seconds,
+            "accelerated_s": fast_seconds,
+            "speedup": python_seconds / fast_seconds if fast_seconds > 0 else float("inf"),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    print(f"Numba available: {ACCELERATED}")
+    for name, diff in check_parity().items():
+        print(f"parity {name:18s} max|diff| = {diff:.3e}")
+    for name, row in benchmark().items():
+        print(f"1M bars {name:11s} python {row['python_s']:8.3f}s  accelerated {row['accelerated_s']:8.3f}s  x{row['speedup']:.1f}")
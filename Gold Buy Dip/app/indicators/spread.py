@@ -0,0 +1,343 @@
+"""
+Streaming spread statistics for the RSI Pairs "positive" correlation mode.
+
+For a positively correlated pair the trade is a divergence: one leg's RSI runs
+overbought while the other runs oversold, and the hedge-ratio-adjusted price spread
+is stretched the same way. The trade sells the rich leg, buys the cheap one and
+waits for the spread to revert.
+
+``SpreadStats`` keeps rolling sums of both prices, their squares and cross product
+over ``window`` bars (taken relative to an anchor price to limit cancellation).
+From those it derives, in O(1) per bar:
+
+- the OLS hedge ratio ``beta = cov(s1, s2) / var(s2)``
+- the spread ``s1 - beta * s2`` and its rolling mean / std (exact for the current
+  beta, since both come from the same sums)
+- the spread z-score
+
+RSIPairsStrategy sizes the second leg of a positive-mode trade with the same beta,
+so the position holds the spread whose z-score triggered it.
+
+``screen_pairs`` runs the same statistics over full close histories with cumulative
+sums and counts entry signals for both modes in one pass, so a pair universe can be
+screened for negative and positive correlation together. RSI is computed as the
+strategy computes it (``app.indicators.rsi`` over its bounded candle buffer), so
+the screen flags the bars the strategy would trade.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.indicators.rsi import calculate_rsi
+
+# Leg directions for every trade type (symbol1 leg, symbol2 leg)
+LEG_DIRECTIONS = {
+    "long": ("long", "long"),
+    "short": ("short", "short"),
+    "long_spread": ("long", "short"),
+    "short_spread": ("short", "long"),
+}
+
+
+class SpreadStats:
+    """Rolling hedge ratio, spread mean/std and z-score for one pair"""
+
+    def __init__(self, window: int = 100, resync_every: Optional[int] = None):
+        if window < 2:
+            raise ValueError("window must be at least 2")
+        self.window = window
+        self.resync_every = resync_every or window
+        self._x = np.zeros(window)
+        self._y = np.zeros(window)
+        self._pos = 0
+        self._count = 0
+        self._since_resync = 0
+        self._sx = self._sy = self._sxx = self._syy = self._sxy = 0.0
+        self._anchor_x = self._anchor_y = None
+        self.last_s1 = math.nan
+        self.last_s2 = math.nan
+        self.divergence = 0.0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def ready(self) -> bool:
+        return self._count >= self.window
+
+    def update(self, s1_price: float, s2_price: float, s1_rsi: Optional[float] = None,
+               s2_rsi: Optional[float] = None):
+        """Add one bar; RSI values, when given, update the RSI divergence"""
+        if self._anchor_x is None:
+            self._anchor_x, self._anchor_y = s1_price, s2_price
+        if self._count == self.window:
+            old_x = self._x[self._pos] - self._anchor_x
+            old_y = self._y[self._pos] - self._anchor_y
+            self._sx -= old_x
+            self._sy -= old_y
+            self._sxx -= old_x * old_x
+            self._syy -= old_y * old_y
+            self._sxy -= old_x * old_y
+        else:
+            self._count += 1
+
+        self._x[self._pos] = s1_price
+        self._y[self._pos] = s2_price
+        self._pos = (self._pos + 1) % self.window
+        dx = s1_price - self._anchor_x
+        dy = s2_price - self._anchor_y
+        self._sx += dx
+        self._sy += dy
+        self._sxx += dx * dx
+        self._syy += dy * dy
+        self._sxy += dx * dy
+        self.last_s1 = s1_price
+        self.last_s2 = s2_price
+        if s1_rsi is not None and s2_rsi is not None:
+            self.divergence = s1_rsi - s2_rsi
+
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every:
+            self.resync()
+
+    def seed(self, s1_prices: Sequence[float], s2_prices: Sequence[float]):
+        """Restart from aligned price histories, oldest first (the last ``window`` pairs are kept)"""
+        if len(s1_prices) != len(s2_prices):
+            raise ValueError("s1_prices and s2_prices must be aligned")
+        x = np.asarray(s1_prices, dtype=np.float64)[-self.window:]
+        y = np.asarray(s2_prices, dtype=np.float64)[-self.window:]
+        n = len(x)
+        self._x = np.zeros(self.window)
+        self._y = np.zeros(self.window)
+        self._x[:n] = x
+        self._y[:n] = y
+        self._count = n
+        self._pos = n % self.window
+        self._sx = self._sy = self._sxx = self._syy = self._sxy = 0.0
+        self._anchor_x = self._anchor_y = None
+        self.last_s1 = float(x[-1]) if n else math.nan
+        self.last_s2 = float(y[-1]) if n else math.nan
+        self.divergence = 0.0
+        self.resync()
+
+    def resync(self):
+        """Recompute the running sums from the buffers, re-anchoring on the latest prices"""
+        if self._count == 0:
+            return
+        self._anchor_x, self._anchor_y = self.last_s1, self.last_s2
+        x = (self._x[:self._count] if self._count < self.window else self._x) - self._anchor_x
+        y = (self._y[:self._count] if self._count < self.window else self._y) - self._anchor_y
+        self._sx = float(x.sum())
+        self._sy = float(y.sum())
+        self._sxx = float(x @ x)
+        self._syy = float(y @ y)
+        self._sxy = float(x @ y)
+        self._since_resync = 0
+
+    def _moments(self) -> Tuple[float, float, float, float, float]:
+        n = self._count
+        mean_x = self._sx / n
+        mean_y = self._sy / n
+        var_x = max(self._sxx / n - mean_x * mean_x, 0.0)
+        var_y = max(self._syy / n - mean_y * mean_y, 0.0)
+        cov = self._sxy / n - mean_x * mean_y
+        return mean_x, mean_y, var_x, var_y, cov
+
+    @property
+    def beta(self) -> float:
+        if self._count < 2:
+            return 1.0
+        _, _, _, var_y, cov = self._moments()
+        return cov / var_y if var_y > 0 else 1.0
+
+    def spread_stats(self) -> Dict[str, float]:
+        """Hedge ratio, current spread, its rolling mean/std and z-score"""
+        if self._count < 2:
+            return {'beta': 1.0, 'spread': 0.0, 'spread_mean': 0.0, 'spread_std': 0.0, 'spread_z': 0.0}
+        mean_x, mean_y, var_x, var_y, cov = self._moments()
+        beta = cov / var_y if var_y > 0 else 1.0
+        spread = self.last_s1 - beta * self.last_s2
+        mean = (mean_x + self._anchor_x) - beta * (mean_y + self._anchor_y)
+        std = math.sqrt(max(var_x - 2 * beta * cov + beta * beta * var_y, 0.0))
+        # Deviation from the mean computed on anchored prices: same value, less cancellation
+        deviation = (self.last_s1 - self._anchor_x - mean_x) - beta * (self.last_s2 - self._anchor_y - mean_y)
+        zscore = deviation / std if std > 0 else 0.0
+        return {'beta': beta, 'spread': spread, 'spread_mean': mean, 'spread_std': std, 'spread_z': zscore}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State for strategy snapshots (see app.services.state_snapshot)"""
+        return {
+            'window': self.window, 'pos': self._pos, 'count': self._count,
+            'x': self._x.copy(), 'y': self._y.copy(),
+            'last_s1': self.last_s1, 'last_s2': self.last_s2, 'divergence': self.divergence,
+        }
+
+    def restore(self, snapshot: Dict[str, Any]):
+        if int(snapshot['window']) != self.window:
+            raise ValueError(f"Spread window changed from {snapshot['window']} to {self.window}")
+        self._x = np.asarray(snapshot['x'], dtype=np.float64).copy()
+        self._y = np.asarray(snapshot['y'], dtype=np.float64).copy()
+        self._pos = int(snapshot['pos'])
+        self._count = int(snapshot['count'])
+        self.last_s1 = float(snapshot['last_s1'])
+        self.last_s2 = float(snapshot['last_s2'])
+        self.divergence = float(snapshot['divergence'])
+        self.resync()
+
+
+def positive_entry(divergence: float, spread_z: float, min_divergence: float, entry_z: float,
+                   hedge_ratio: float = 1.0, min_hedge_ratio: float = 0.0,
+                   max_hedge_ratio: float = math.inf) -> Optional[str]:
+    """
+    Positive-correlation divergence entry.
+
+    symbol1 rich (RSI well above symbol2 and spread stretched up) -> "short_spread"
+    (short symbol1, long symbol2); the mirror case -> "long_spread". No entry when
+    the hedge ratio the spread is built with is not positive or outside the bounds,
+    since the position could not hold that spread.
+    """
+    if not (hedge_ratio > 0 and min_hedge_ratio <= hedge_ratio <= max_hedge_ratio):
+        return None
+    if divergence >= min_divergence and spread_z >= entry_z:
+        return "short_spread"
+    if divergence <= -min_divergence and spread_z <= -entry_z:
+        return "long_spread"
+    return None
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of values[i - window + 1 : i + 1] for every i (NaN before the first full window)"""
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    out = np.full(len(values), np.nan)
+    out[window - 1:] = csum[window:] - csum[:-window]
+    return out
+
+
+def spread_series(s1_closes: Sequence[float], s2_closes: Sequence[float], window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """The beta and spread_z SpreadStats reports after every bar, for a full history"""
+    x = np.asarray(s1_closes, dtype=np.float64)
+    y = np.asarray(s2_closes, dtype=np.float64)
+    if len(x) < window:
+        return np.full(len(x), np.nan), np.full(len(x), np.nan)
+    # z is shift invariant; centring limits cancellation in the cumulative sums
+    x = x - x.mean()
+    y = y - y.mean()
+    mean_x = _rolling_sum(x, window) / window
+    mean_y = _rolling_sum(y, window) / window
+    var_x = np.maximum(_rolling_sum(x * x, window) / window - mean_x * mean_x, 0.0)
+    var_y = np.maximum(_rolling_sum(y * y, window) / window - mean_y * mean_y, 0.0)
+    cov = _rolling_sum(x * y, window) / window - mean_x * mean_y
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = np.where(var_y > 0, cov / var_y, 1.0)
+        std = np.sqrt(np.maximum(var_x - 2 * beta * cov + beta * beta * var_y, 0.0))
+        z = np.where(std > 0, ((x - mean_x) - beta * (y - mean_y)) / std, 0.0)
+    beta[:window - 1] = np.nan
+    z[:window - 1] = np.nan
+    return beta, z
+
+
+def spread_zscore_series(s1_closes: Sequence[float], s2_closes: Sequence[float], window: int) -> np.ndarray:
+    """The spread_z SpreadStats reports after every bar, for a full history"""
+    return spread_series(s1_closes, s2_closes, window)[1]
+
+
+def candle_buffer_length(rsi_period: int, atr_period: int) -> int:
+    """Bars RSIPairsStrategy keeps per symbol"""
+    return max(rsi_period, atr_period) + 10
+
+
+def rsi_series(closes: Sequence[float], period: int, buffer_length: int) -> np.ndarray:
+    """
+    RSI after every bar as RSIPairsStrategy computes it: ``calculate_rsi`` over the
+    last ``buffer_length`` closes, NaN until ``period + 1`` closes are available.
+    """
+    values = np.asarray(closes, dtype=np.float64).tolist()
+    out = np.full(len(values), np.nan)
+    for i in range(period, len(values)):
+        out[i] = calculate_rsi(values[max(0, i + 1 - buffer_length):i + 1], period)
+    return out
+
+
+def entry_signal_series(s1_closes: Sequence[float], s2_closes: Sequence[float], rsi_period: int = 14,
+                        atr_period: int = 14, rsi_overbought: float = 75, rsi_oversold: float = 25,
+                        spread_window: int = 100, spread_entry_z: float = 2.0,
+                        rsi_divergence: Optional[float] = None, min_hedge_ratio: float = 0.0,
+                        max_hedge_ratio: float = math.inf, rsi1: Optional[np.ndarray] = None,
+                        rsi2: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Per-bar entry conditions of both modes for aligned histories of one pair.
+
+    Matches RSIPairsStrategy.check_entry_conditions on every bar it is evaluated:
+    RSI from ``rsi_series`` and spread statistics fed from the first bar with RSI
+    data on. Hedge ratio bounds apply to beta (equal contract sizes assumed).
+    ``rsi1`` / ``rsi2`` can be passed to reuse ``rsi_series`` results.
+    """
+    x = np.asarray(s1_closes, dtype=np.float64)
+    y = np.asarray(s2_closes, dtype=np.float64)
+    buffer_length = candle_buffer_length(rsi_period, atr_period)
+    rsi1 = rsi_series(x, rsi_period, buffer_length) if rsi1 is None else rsi1
+    rsi2 = rsi_series(y, rsi_period, buffer_length) if rsi2 is None else rsi2
+    min_divergence = rsi_overbought - rsi_oversold if rsi_divergence is None else rsi_divergence
+
+    # The strategy only updates the spread once both RSI buffers are long enough
+    beta = np.full(len(x), np.nan)
+    z = np.full(len(x), np.nan)
+    beta[rsi_period:], z[rsi_period:] = spread_series(x[rsi_period:], y[rsi_period:], spread_window)
+    divergence = rsi1 - rsi2
+
+    with np.errstate(invalid="ignore"):
+        hedge_ok = (beta > 0) & (beta >= min_hedge_ratio) & (beta <= max_hedge_ratio)
+        return {
+            'negative_short': (rsi1 > rsi_overbought) & (rsi2 > rsi_overbought),
+            'negative_long': (rsi1 < rsi_oversold) & (rsi2 < rsi_oversold),
+            'positive_short_spread': hedge_ok & (divergence >= min_divergence) & (z >= spread_entry_z),
+            'positive_long_spread': hedge_ok & (divergence <= -min_divergence) & (z <= -spread_entry_z),
+        }
+
+
+def screen_pairs(closes: Dict[str, Sequence[float]], pairs: Sequence[Tuple[str, ...]], rsi_period: int = 14,
+                 rsi_overbought: float = 75, rsi_oversold: float = 25, spread_window: int = 100,
+                 spread_entry_z: float = 2.0, rsi_divergence: Optional[float] = None, atr_period: int = 14,
+                 min_hedge_ratio: float = 0.0, max_hedge_ratio: float = math.inf) -> List[Dict[str, Any]]:
+    """
+    Count entry signals per pair for both correlation modes in one pass.
+
+    ``closes`` maps symbol -> aligned close history; ``pairs`` are
+    ``(symbol1, symbol2, ...)`` tuples such as RollingCorrelation.top_pairs output.
+    Signals are those of ``entry_signal_series``; RSI is computed once per symbol.
+    Returns one row per pair with negative/positive long/short signal counts and
+    the index of the last signal of each mode (-1 if none).
+    """
+    arrays = {symbol: np.asarray(values, dtype=np.float64) for symbol, values in closes.items()}
+    buffer_length = candle_buffer_length(rsi_period, atr_period)
+    rsi_cache: Dict[str, np.ndarray] = {}
+
+    def _rsi(symbol: str) -> np.ndarray:
+        if symbol not in rsi_cache:
+            rsi_cache[symbol] = rsi_series(arrays[symbol], rsi_period, buffer_length)
+        return rsi_cache[symbol]
+
+    rows = []
+    for pair in pairs:
+        s1, s2 = pair[0], pair[1]
+        signals = entry_signal_series(arrays[s1], arrays[s2], rsi_period, atr_period, rsi_overbought,
+                                      rsi_oversold, spread_window, spread_entry_z, rsi_divergence,
+                                      min_hedge_ratio, max_hedge_ratio, _rsi(s1), _rsi(s2))
+        negative = signals['negative_short'] | signals['negative_long']
+        positive = signals['positive_short_spread'] | signals['positive_long_spread']
+        rows.append({
+            'symbol1': s1,
+            'symbol2': s2,
+            'negative_short': int(signals['negative_short'].sum()),
+            'negative_long': int(signals['negative_long'].sum()),
+            'positive_short_spread': int(signals['positive_short_spread'].sum()),
+            'positive_long_spread': int(signals['positive_long_spread'].sum()),
+            'last_negative_signal': int(np.flatnonzero(negative)[-1]) if negative.any() else -1,
+            'last_positive_signal': int(np.flatnonzero(positive)[-1]) if positive.any() else -1,
+        })
+    return rows
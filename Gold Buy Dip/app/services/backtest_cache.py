@@ -0,0 +1,372 @@
+"""
+Content-addressed cache of backtest results with resume from end-of-range state.
+
+Re-running the pairs notebook after changing one pair, or after appending a week
+of bars, used to recompute every pair from the first bar. Here a backtest result
+(the ``TradeLedger`` of closed trades plus the strategy's end-of-range
+``snapshot_state()``) is stored under a key derived from:
+
+- the strategy config (canonical JSON) and the runner's starting balance
+- the code version (unless given explicitly, a hash of the strategy's source file
+  and of every ``app`` module it depends on, e.g. indicators and symbol registry)
+- the data (hash of every OHLC column of every symbol)
+
+An identical run is answered from disk. When the data has only grown, the
+previous result of the same config / code / series start (its *lineage*) is
+found through a small ``.head`` file; if the stored bars are still an exact
+prefix of the new data, the strategy and ledger are restored from it and only
+the new bars are replayed. Any revision of old bars changes the prefix hash and
+forces a full run.
+
+Entries use the app.services.state_snapshot binary format and are evicted least
+recently used first once the directory exceeds ``max_bytes``. Typical use:
+
+    cache = BacktestCache("cache/backtests", max_bytes=2 * 1024**3)
+    runner = CachedBacktestRunner(cache, feed=pair_feed(MarketData))
+    for symbol1, symbol2 in PAIRS_TO_TEST:
+        data = {symbol1: arrays1, symbol2: arrays2}  # aligned OHLC column dicts
+        result = runner.run(f"{symbol1}-{symbol2}", config, data,
+                            lambda: RSIPairsStrategy(config, f"{symbol1}-{symbol2}"))
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import inspect
+import json
+import os
+import sys
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from types import ModuleType
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.services.state_snapshot import SnapshotError, decode_snapshot, encode_snapshot, write_bytes_atomic
+from app.services.trade_ledger import TradeLedger
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import arrays_to_candles, ohlc_length
+
+logger = lazy_logger(__name__)
+
+CACHE_VERSION = 1
+
+_RESULT_SUFFIX = ".result"
+_HEAD_SUFFIX = ".head"
+
+# feed(strategy, data, start) processes bars [start:] of every symbol in data
+Feed = Callable[[Any, Dict[str, Dict[str, Any]], int], None]
+
+
+def _canonical(value: Any) -> Any:
+    """JSON default hook giving configs a stable representation"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if hasattr(value, "__dict__"):
+        return {k: v for k, v in vars(value).items() if not k.startswith("_")}
+    return str(value)
+
+
+def _digest(*parts: Any) -> str:
+    text = json.dumps(parts, default=_canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def config_fingerprint(config: Any) -> str:
+    """Hash of a config dataclass, dict or plain object"""
+    return _digest(config)
+
+
+def _source(obj: Any) -> bytes:
+    try:
+        path = inspect.getsourcefile(obj)
+        with open(path, "rb") as fh:
+            return fh.read()
+    except (TypeError, OSError):
+        return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', repr(obj))}".encode()
+
+
+def _module_dependencies(module: ModuleType, packages: Sequence[str]) -> Dict[str, ModuleType]:
+    """module plus every module of ``packages`` it references, directly or through them"""
+    def in_packages(name: str) -> bool:
+        return any(name == package or name.startswith(package + ".") for package in packages)
+
+    found = {module.__name__: module}
+    pending = [module]
+    while pending:
+        for value in list(vars(pending.pop()).values()):
+            if isinstance(value, ModuleType):
+                name = value.__name__
+            elif inspect.isclass(value) or inspect.isfunction(value):
+                name = value.__module__
+            else:
+                name = type(value).__module__
+            if not name or name in found or not in_packages(name):
+                continue
+            dependency = sys.modules.get(name)
+            if dependency is not None:
+                found[name] = dependency
+                pending.append(dependency)
+    return found
+
+
+def code_version(obj: Any, packages: Sequence[str] = ("app",)) -> str:
+    """
+    Hash of the source defining obj (a class, function or module) and of every module
+    of ``packages`` it depends on, so a change to a shared indicator or service also
+    changes the version
+    """
+    module = obj if isinstance(obj, ModuleType) else sys.modules.get(getattr(obj, "__module__", ""))
+    if module is None:
+        return hashlib.blake2b(_source(obj), digest_size=16).hexdigest()
+    digest = hashlib.blake2b(digest_size=16)
+    for name, dependency in sorted(_module_dependencies(module, packages).items()):
+        digest.update(name.encode() + b"\0")
+        digest.update(_source(dependency) + b"\0")
+    return digest.hexdigest()
+
+
+def data_fingerprint(data: Dict[str, Dict[str, Any]], bars: Optional[int] = None) -> str:
+    """Hash of the first ``bars`` bars (default all) of every column of every symbol"""
+    digest = hashlib.blake2b(digest_size=16)
+    for symbol in sorted(data):
+        columns = data[symbol]
+        digest.update(symbol.encode())
+        for name in sorted(columns):
+            values = columns[name]
+            if not isinstance(values, np.ndarray):
+                digest.update(f"{name}={values!r}".encode())
+                continue
+            values = np.ascontiguousarray(values[:bars] if bars is not None else values)
+            digest.update(f"{name}:{values.dtype.str}:{values.shape}".encode())
+            digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def series_length(data: Dict[str, Dict[str, Any]]) -> int:
+    """Common bar count of aligned series; raises ValueError if they differ"""
+    lengths = {symbol: ohlc_length(columns) for symbol, columns in data.items()}
+    if len(set(lengths.values())) != 1:
+        raise ValueError(f"Series must be aligned to the same bars: {lengths}")
+    return next(iter(lengths.values()))
+
+
+def single_symbol_feed(candle_cls: Any) -> Feed:
+    """Feed for one-symbol strategies: ``_process_market_data(candle)`` per bar"""
+    def feed(strategy: Any, data: Dict[str, Dict[str, Any]], start: int):
+        (columns,) = data.values()
+        for candle in arrays_to_candles(columns, candle_cls, start):
+            strategy._process_market_data(candle)
+    return feed
+
+
+def pair_feed(candle_cls: Any) -> Feed:
+    """Feed for RSIPairsStrategy: the symbol2 candle is added, then the symbol1 bar processed"""
+    def feed(strategy: Any, data: Dict[str, Dict[str, Any]], start: int):
+        s1 = arrays_to_candles(data[strategy.symbol1], candle_cls, start)
+        s2 = arrays_to_candles(data[strategy.symbol2], candle_cls, start)
+        for c1, c2 in zip(s1, s2):
+            strategy.add_candle_data(strategy.symbol2, c2)
+            strategy._process_market_data(c1)
+    return feed
+
+
+@dataclass
+class BacktestResult:
+    """Outcome of a cached run"""
+    name: str
+    key: str
+    ledger: TradeLedger
+    bars: int
+    bars_processed: int  # bars fed to the strategy in this run (0 on a cache hit)
+    source: str  # "cache", "resumed" or "full"
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        return self.ledger.metrics_dict()
+
+
+class BacktestCache:
+    """
+    Size-bounded on-disk store of backtest results.
+
+    Results are files named by their key; reading one refreshes its mtime, and
+    ``put`` evicts the least recently used results until the directory holds at
+    most ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, name + suffix)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored payload for key, or None"""
+        path = self._path(key, _RESULT_SUFFIX)
+        try:
+            with open(path, "rb") as fh:
+                payload = decode_snapshot(fh.read())
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (SnapshotError, ValueError, zlib.error) as e:
+            logger.error(f"Dropping unreadable backtest cache entry {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return payload
+
+    def put(self, key: str, payload: Dict[str, Any], lineage: Optional[str] = None) -> int:
+        """Store payload under key (and make it the head of lineage); returns bytes written"""
+        size = write_bytes_atomic(self._path(key, _RESULT_SUFFIX), encode_snapshot(payload))
+        if lineage is not None:
+            write_bytes_atomic(self._path(lineage, _HEAD_SUFFIX), key.encode())
+        self.evict(keep=key)
+        return size
+
+    def head(self, lineage: str) -> Optional[str]:
+        """Key of the latest result stored for lineage"""
+        try:
+            with open(self._path(lineage, _HEAD_SUFFIX), "rb") as fh:
+                return fh.read().decode().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Delete least recently used results beyond max_bytes; returns the number removed"""
+        with self._lock:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(_RESULT_SUFFIX):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path, entry.name[:-len(_RESULT_SUFFIX)]))
+                    total += stat.st_size
+
+            removed = 0
+            for _, size, path, key in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self._remove(path)
+                total -= size
+                removed += 1
+            self.evictions += removed
+        if removed:
+            logger.info(f"Backtest cache evicted {removed} entries ({total / 1024 ** 2:.1f} MB kept)")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class CachedBacktestRunner:
+    """
+    Runs backtests through a BacktestCache.
+
+    ``feed(strategy, data, start)`` replays bars ``[start:]``; the strategy records
+    closed trades into ``strategy.trade_ledger`` (RSIPairsStrategy and GoldBuyDipStrategy
+    do so themselves, other strategies can do it from their feed) and must implement
+    ``snapshot_state()`` / ``restore_state()``.
+    """
+
+    def __init__(self, cache: BacktestCache, feed: Feed, starting_balance: float = 0.0):
+        self.cache = cache
+        self.feed = feed
+        self.starting_balance = starting_balance
+        self.resumed = 0
+        self.full_runs = 0
+        self.bars_processed = 0
+
+    def run(self, name: str, config: Any, data: Dict[str, Dict[str, Any]], make_strategy: Callable[[], Any],
+            code: Optional[str] = None) -> BacktestResult:
+        """Backtest ``data`` with a fresh ``make_strategy()``, reusing stored work where possible"""
+        bars = series_length(data)
+        strategy = make_strategy()
+        code = code or code_version(type(strategy))
+        config_key = config_fingerprint(config)
+        data_key = data_fingerprint(data)
+        key = _digest(CACHE_VERSION, config_key, code, self.starting_balance, data_key)
+        # Same config, code, balance and series start: earlier results of this lineage can be resumed
+        starts = {symbol: int(columns["timestamp"][0]) if bars else None for symbol, columns in data.items()}
+        lineage = _digest(CACHE_VERSION, config_key, code, self.starting_balance, starts)
+
+        payload = self.cache.get(key)
+        if payload is not None:
+            return BacktestResult(name, key, TradeLedger.from_snapshot(payload["ledger"]), bars, 0, "cache")
+
+        ledger, start = self._resume(name, lineage, data, bars, strategy)
+        source = "resumed" if start else "full"
+        if ledger is None:
+            ledger = TradeLedger(starting_balance=self.starting_balance)
+        strategy.trade_ledger = ledger
+
+        self.feed(strategy, data, start)
+        processed = bars - start
+        self.bars_processed += processed
+        if start:
+            self.resumed += 1
+        else:
+            self.full_runs += 1
+
+        self.cache.put(key, {
+            "meta": {"name": name, "bars": bars, "data": data_key, "lineage": lineage},
+            "ledger": ledger.snapshot(),
+            "strategy": strategy.snapshot_state(),
+        }, lineage)
+        logger.info(f"Backtest {name}: {source} run, {processed}/{bars} bars processed, {len(ledger)} trades")
+        return BacktestResult(name, key, ledger, bars, processed, source)
+
+    def _resume(self, name: str, lineage: str, data: Dict[str, Dict[str, Any]], bars: int,
+                strategy: Any):
+        """Restore the lineage head into strategy if its bars are a prefix of data"""
+        head = self.cache.head(lineage)
+        if head is None:
+            return None, 0
+        payload = self.cache.get(head)
+        if payload is None:
+            return None, 0
+        meta = payload["meta"]
+        stored_bars = int(meta["bars"])
+        if stored_bars > bars or data_fingerprint(data, stored_bars) != meta["data"]:
+            logger.info(f"Backtest {name}: history changed since the cached run, replaying in full")
+            return None, 0
+        strategy.restore_state(payload["strategy"])
+        return TradeLedger.from_snapshot(payload["ledger"]), stored_bars
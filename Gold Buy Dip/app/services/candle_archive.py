@@ -0,0 +1,475 @@
+"""
+Compressed long-horizon candle archive with indexed range decode.
+
+Years of M1 bars for gold and 60+ FX symbols take a lot of space as float64 OHLC
+(40 bytes per bar before timestamps) or CSV. The archive stores one file per
+symbol:
+
+    header  = magic "CNDL", format version, point, timestamp kind
+    chunk*  = zlib( column* ), up to ``chunk_size`` bars each
+    index   = (first_ts, last_ts, offset, length, bars, crc32) per chunk
+    footer  = index offset, chunk count, magic "CNDX"
+
+Prices are stored as integer points (app.utilities.fixed_point). Timestamps and
+closes are delta-encoded against the previous bar, and open / high / low against
+the same bar's close. Every column is then zigzag-mapped to unsigned, narrowed to
+the smallest unsigned dtype that holds it, and the chunk is zlib-compressed. A
+steady M1 series becomes a run of identical timestamp deltas and small price
+steps, around 4-8 bytes per bar against 40 for float64 OHLC.
+
+Reading a time range looks up the overlapping chunks in the index and decodes
+only those, with NumPy (frombuffer, zigzag decode, cumsum), into the column dict
+used by app.utilities.ohlc_arrays. That dict feeds the strategies' ``warm_up``
+(``warm_up_strategy``) and the notebook-style backtests (``load_pair``,
+app.services.backtest_cache).
+
+Run ``python -m app.services.candle_archive`` for a size and decode-throughput
+benchmark against CSV and raw arrays.
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.services.state_snapshot import write_bytes_atomic
+from app.utilities.fixed_point import PriceScale, check_points
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import OHLC_FIELDS, datetime_to_us, ohlc_length
+
+logger = lazy_logger(__name__)
+
+ARCHIVE_MAGIC = b"CNDL"
+INDEX_MAGIC = b"CNDX"
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".cndl"
+
+_HEADER = struct.Struct("<4sHdB")
+_INDEX_ENTRY = struct.Struct("<qqQIII")
+_FOOTER = struct.Struct("<QI4s")
+_COLUMN_HEADER = struct.Struct("<Bq")
+
+# Column order inside a chunk; open/high/low are stored relative to close
+_COLUMNS = ("timestamp", "close", "open", "high", "low")
+_UNSIGNED = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+TimeBound = Union[None, int, datetime]
+
+
+class ArchiveError(Exception):
+    """Raised when an archive file is missing, corrupt or of an unknown version"""
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.uint64)
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+def _encode_column(values: np.ndarray, reference: Optional[np.ndarray]) -> bytes:
+    """Deltas against the previous value (reference None) or against reference, zigzag, narrowed"""
+    if reference is None:
+        base = int(values[0]) if len(values) else 0
+        deltas = np.diff(values)
+    else:
+        base = 0
+        deltas = values - reference
+    encoded = _zigzag(deltas)
+    peak = int(encoded.max()) if len(encoded) else 0
+    code = next(i for i, dtype in enumerate(_UNSIGNED) if peak <= np.iinfo(dtype).max)
+    return _COLUMN_HEADER.pack(code, base) + encoded.astype(_UNSIGNED[code]).tobytes()
+
+
+def _decode_column(raw: memoryview, offset: int, count: int, reference: Optional[np.ndarray]) -> Tuple[np.ndarray, int]:
+    code, base = _COLUMN_HEADER.unpack_from(raw, offset)
+    offset += _COLUMN_HEADER.size
+    dtype = np.dtype(_UNSIGNED[code])
+    n_values = count - 1 if reference is None else count
+    deltas = _unzigzag(np.frombuffer(raw, dtype=dtype, count=n_values, offset=offset))
+    offset += n_values * dtype.itemsize
+    if reference is not None:
+        return reference + deltas, offset
+    values = np.empty(count, dtype=np.int64)
+    if count:
+        values[0] = base
+        np.cumsum(deltas, out=values[1:])
+        values[1:] += base
+    return values, offset
+
+
+def encode_chunk(columns: Dict[str, np.ndarray], level: int = 6) -> bytes:
+    """Compress one chunk of int64 timestamp / point OHLC columns"""
+    close = columns["close"]
+    parts = [_encode_column(columns["timestamp"], None), _encode_column(close, None)]
+    parts += [_encode_column(columns[name], close) for name in ("open", "high", "low")]
+    return zlib.compress(b"".join(parts), level)
+
+
+def decode_chunk(data: bytes, count: int) -> Dict[str, np.ndarray]:
+    """Inverse of encode_chunk"""
+    raw = memoryview(zlib.decompress(data))
+    timestamps, offset = _decode_column(raw, 0, count, None)
+    close, offset = _decode_column(raw, offset, count, None)
+    columns = {"timestamp": timestamps, "close": close}
+    for name in ("open", "high", "low"):
+        columns[name], offset = _decode_column(raw, offset, count, close)
+    return columns
+
+
+@dataclass(frozen=True)
+class ChunkInfo:
+    first_ts: int
+    last_ts: int
+    offset: int
+    length: int
+    bars: int
+    crc: int
+
+
+@dataclass
+class _ArchiveIndex:
+    point: float
+    timestamp_kind: int
+    chunks: List[ChunkInfo]
+    first_ts: np.ndarray
+    last_ts: np.ndarray
+    mtime_ns: int
+    size: int
+
+
+def _time_bound(value: TimeBound) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return datetime_to_us(value)
+    return int(value)
+
+
+def _empty_columns(dtype: Any = np.int64) -> Dict[str, np.ndarray]:
+    columns = {name: np.empty(0, dtype=dtype) for name in OHLC_FIELDS}
+    columns["timestamp"] = np.empty(0, dtype=np.int64)
+    return columns
+
+
+class CandleArchive:
+    """
+    Directory of per-symbol candle archives.
+
+    ``write`` replaces a symbol's history and ``append`` adds newer bars (both
+    rewrite the file atomically; appended chunks reuse the compressed bytes of
+    existing full chunks). Reads return float OHLC column dicts, or integer
+    points with ``read_points``.
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 65536, level: int = 6, registry: Any = None):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.level = level
+        self.registry = registry
+        self._indexes: Dict[str, _ArchiveIndex] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, symbol: str) -> str:
+        return os.path.join(self.directory, symbol.upper() + ARCHIVE_SUFFIX)
+
+    def symbols(self) -> List[str]:
+        return sorted(name[:-len(ARCHIVE_SUFFIX)] for name in os.listdir(self.directory) if name.endswith(ARCHIVE_SUFFIX))
+
+    def _scale(self, symbol: str, point: Optional[float]) -> PriceScale:
+        if point is not None:
+            return PriceScale(point)
+        return PriceScale.for_symbol(symbol, self.registry)
+
+    # --- Writing ---
+
+    def _encode(self, arrays: Dict[str, Any], scale: PriceScale, symbol: str) -> Dict[str, np.ndarray]:
+        n = ohlc_length(arrays)
+        timestamps = np.asarray(arrays["timestamp"], dtype=np.int64)
+        if n > 1 and np.any(np.diff(timestamps) <= 0):
+            raise ValueError(f"{symbol}: timestamps must be strictly increasing")
+        columns = {"timestamp": timestamps}
+        for name in OHLC_FIELDS:
+            values = np.asarray(arrays[name], dtype=np.float64)
+            if not check_points(values, scale):
+                logger.warning(f"{symbol}: {name} prices are not on the {scale.point} point grid and will be rounded")
+            columns[name] = scale.points_array(values)
+        return columns
+
+    def _chunks(self, columns: Dict[str, np.ndarray], offset: int) -> Tuple[List[bytes], List[ChunkInfo]]:
+        blobs, infos = [], []
+        n = len(columns["timestamp"])
+        for start in range(0, n, self.chunk_size):
+            chunk = {name: values[start:start + self.chunk_size] for name, values in columns.items()}
+            blob = encode_chunk(chunk, self.level)
+            infos.append(ChunkInfo(int(chunk["timestamp"][0]), int(chunk["timestamp"][-1]), offset, len(blob),
+                                   len(chunk["timestamp"]), zlib.crc32(blob)))
+            blobs.append(blob)
+            offset += len(blob)
+        return blobs, infos
+
+    def _write_file(self, symbol: str, point: float, timestamp_kind: int, blobs: List[bytes], infos: List[ChunkInfo]) -> int:
+        parts = [_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, point, timestamp_kind)]
+        parts += blobs
+        index_offset = sum(len(part) for part in parts)
+        parts += [_INDEX_ENTRY.pack(i.first_ts, i.last_ts, i.offset, i.length, i.bars, i.crc) for i in infos]
+        parts.append(_FOOTER.pack(index_offset, len(infos), INDEX_MAGIC))
+        size = write_bytes_atomic(self.path_for(symbol), b"".join(parts))
+        with self._lock:
+            self._indexes.pop(symbol.upper(), None)
+        return size
+
+    def write(self, symbol: str, arrays: Dict[str, Any], point: Optional[float] = None) -> int:
+        """Replace the archive of symbol with an OHLC column dict; returns the file size"""
+        scale = self._scale(symbol, point)
+        columns = self._encode(arrays, scale, symbol)
+        blobs, infos = self._chunks(columns, _HEADER.size)
+        return self._write_file(symbol, scale.point, int(arrays.get("timestamp_kind", 0)), blobs, infos)
+
+    def append(self, symbol: str, arrays: Dict[str, Any]) -> int:
+        """
+        Add bars newer than the last archived one (older or equal ones are skipped).
+
+        A short last chunk is decoded and merged with the new bars; full chunks
+        are copied as compressed bytes. Returns the number of bars appended.
+        """
+        if not os.path.exists(self.path_for(symbol)):
+            self.write(symbol, arrays)
+            return ohlc_length(arrays)
+        index = self._index(symbol)
+        scale = PriceScale(index.point)
+        columns = self._encode(arrays, scale, symbol)
+        if index.chunks:
+            keep = np.searchsorted(columns["timestamp"], index.chunks[-1].last_ts, side="right")
+            columns = {name: values[keep:] for name, values in columns.items()}
+        added = len(columns["timestamp"])
+        if added == 0:
+            return 0
+
+        chunks = list(index.chunks)
+        with open(self.path_for(symbol), "rb") as fh:
+            if chunks and chunks[-1].bars < self.chunk_size:
+                last = chunks.pop()
+                fh.seek(last.offset)
+                tail = decode_chunk(fh.read(last.length), last.bars)
+                columns = {name: np.concatenate((tail[name], columns[name])) for name in columns}
+            blobs = []
+            for info in chunks:
+                fh.seek(info.offset)
+                blobs.append(fh.read(info.length))
+        new_blobs, new_infos = self._chunks(columns, chunks[-1].offset + chunks[-1].length if chunks else _HEADER.size)
+        self._write_file(symbol, index.point, index.timestamp_kind, blobs + new_blobs, chunks + new_infos)
+        return added
+
+    # --- Reading ---
+
+    def _index(self, symbol: str) -> _ArchiveIndex:
+        path = self.path_for(symbol)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise ArchiveError(f"No archive for {symbol}") from None
+        key = symbol.upper()
+        with self._lock:
+            cached = self._indexes.get(key)
+        if cached is not None and cached.mtime_ns == stat.st_mtime_ns and cached.size == stat.st_size:
+            return cached
+
+        with open(path, "rb") as fh:
+            header = fh.read(_HEADER.size)
+            if len(header) < _HEADER.size or stat.st_size < _HEADER.size + _FOOTER.size:
+                raise ArchiveError(f"{path}: file too short")
+            magic, version, point, timestamp_kind = _HEADER.unpack(header)
+            if magic != ARCHIVE_MAGIC:
+                raise ArchiveError(f"{path}: not a candle archive")
+            if version != ARCHIVE_VERSION:
+                raise ArchiveError(f"{path}: unsupported archive version {version}")
+            fh.seek(stat.st_size - _FOOTER.size)
+            index_offset, count, footer_magic = _FOOTER.unpack(fh.read(_FOOTER.size))
+            if footer_magic != INDEX_MAGIC:
+                raise ArchiveError(f"{path}: missing index footer")
+            fh.seek(index_offset)
+            raw = fh.read(count * _INDEX_ENTRY.size)
+        chunks = [ChunkInfo(*_INDEX_ENTRY.unpack_from(raw, i * _INDEX_ENTRY.size)) for i in range(count)]
+        index = _ArchiveIndex(
+            point, timestamp_kind, chunks,
+            np.array([c.first_ts for c in chunks], dtype=np.int64),
+            np.array([c.last_ts for c in chunks], dtype=np.int64),
+            stat.st_mtime_ns, stat.st_size,
+        )
+        with self._lock:
+            self._indexes[key] = index
+        return index
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        index = self._index(symbol)
+        bars = sum(c.bars for c in index.chunks)
+        return {
+            "symbol": symbol.upper(),
+            "bars": bars,
+            "chunks": len(index.chunks),
+            "point": index.point,
+            "first_ts": int(index.first_ts[0]) if bars else None,
+            "last_ts": int(index.last_ts[-1]) if bars else None,
+            "bytes": index.size,
+            "bytes_per_bar": index.size / bars if bars else 0.0,
+        }
+
+    def _read_chunks(self, symbol: str, index: _ArchiveIndex, first: int, last: int) -> Dict[str, np.ndarray]:
+        if first >= last:
+            return _empty_columns()
+        decoded = []
+        with open(self.path_for(symbol), "rb") as fh:
+            for info in index.chunks[first:last]:
+                fh.seek(info.offset)
+                blob = fh.read(info.length)
+                if zlib.crc32(blob) != info.crc:
+                    raise ArchiveError(f"{symbol}: checksum mismatch in chunk at offset {info.offset}")
+                decoded.append(decode_chunk(blob, info.bars))
+        if len(decoded) == 1:
+            return decoded[0]
+        return {name: np.concatenate([chunk[name] for chunk in decoded]) for name in _COLUMNS}
+
+    def read_points(self, symbol: str, start: TimeBound = None, end: TimeBound = None) -> Dict[str, Any]:
+        """Bars with start <= timestamp < end as int64 point columns (ohlc_to_points layout)"""
+        index = self._index(symbol)
+        start_us, end_us = _time_bound(start), _time_bound(end)
+        first = 0 if start_us is None else int(np.searchsorted(index.last_ts, start_us, side="left"))
+        last = len(index.chunks) if end_us is None else int(np.searchsorted(index.first_ts, end_us, side="left"))
+        columns = self._read_chunks(symbol, index, first, last)
+        timestamps = columns["timestamp"]
+        lo = 0 if start_us is None else int(np.searchsorted(timestamps, start_us, side="left"))
+        hi = len(timestamps) if end_us is None else int(np.searchsorted(timestamps, end_us, side="left"))
+        result: Dict[str, Any] = {name: columns[name][lo:hi] for name in _COLUMNS}
+        result["timestamp_kind"] = index.timestamp_kind
+        result["point"] = index.point
+        return result
+
+    @staticmethod
+    def _prices(points: Dict[str, Any]) -> Dict[str, Any]:
+        scale = PriceScale(points["point"])
+        result: Dict[str, Any] = {name: scale.prices_array(points[name]) for name in OHLC_FIELDS}
+        result["timestamp"] = points["timestamp"]
+        result["timestamp_kind"] = points["timestamp_kind"]
+        return result
+
+    def read(self, symbol: str, start: TimeBound = None, end: TimeBound = None) -> Dict[str, Any]:
+        """Bars with start <= timestamp < end as an ohlc_arrays column dict (float64 prices)"""
+        return self._prices(self.read_points(symbol, start, end))
+
+    def tail(self, symbol: str, count: int) -> Dict[str, Any]:
+        """The last ``count`` bars, decoding only the chunks that hold them"""
+        index = self._index(symbol)
+        first, available = len(index.chunks), 0
+        while first > 0 and available < count:
+            first -= 1
+            available += index.chunks[first].bars
+        columns = self._read_chunks(symbol, index, first, len(index.chunks))
+        offset = max(0, len(columns["timestamp"]) - max(count, 0))
+        points: Dict[str, Any] = {name: columns[name][offset:] for name in _COLUMNS}
+        points["timestamp_kind"] = index.timestamp_kind
+        points["point"] = index.point
+        return self._prices(points)
+
+
+def warm_up_strategy(strategy: Any, archive: CandleArchive, symbol: Optional[str] = None, bars: int = 500) -> int:
+    """
+    Seed a strategy's candle buffer from the archive via its ``warm_up``.
+
+    Single-symbol strategies read ``strategy.pair``; for RSIPairsStrategy pass the
+    leg symbol (it is forwarded to ``warm_up(arrays, symbol)``).
+    """
+    if symbol is None:
+        return strategy.warm_up(archive.tail(strategy.pair, bars))
+    return strategy.warm_up(archive.tail(symbol, bars), symbol)
+
+
+def load_pair(archive: CandleArchive, symbol1: str, symbol2: str, start: TimeBound = None,
+              end: TimeBound = None) -> Dict[str, Dict[str, Any]]:
+    """Both legs of a pair restricted to their common timestamps (the notebook's inner merge)"""
+    left = archive.read(symbol1, start, end)
+    right = archive.read(symbol2, start, end)
+    _, left_idx, right_idx = np.intersect1d(left["timestamp"], right["timestamp"], assume_unique=True,
+                                            return_indices=True)
+    aligned = {}
+    for symbol, arrays, idx in ((symbol1, left, left_idx), (symbol2, right, right_idx)):
+        columns = {name: arrays[name][idx] for name in ("timestamp",) + OHLC_FIELDS}
+        columns["timestamp_kind"] = arrays["timestamp_kind"]
+        aligned[symbol] = columns
+    return aligned
+
+
+# --- Benchmark ---
+
+def _sample_m1(n_bars: int, seed: int = 3) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    closes = np.round(2000.0 + np.cumsum(rng.normal(0.0, 0.35, n_bars)), 2)
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    highs = np.round(np.maximum(opens, closes) + rng.exponential(0.15, n_bars), 2)
+    lows = np.round(np.minimum(opens, closes) - rng.exponential(0.15, n_bars), 2)
+    # M1 bars with weekend gaps
+    minutes = np.arange(n_bars, dtype=np.int64)
+    minutes += (minutes // 7200) * 2880
+    timestamps = datetime_to_us(datetime(2020, 1, 6)) + minutes * 60_000_000
+    return {"timestamp": timestamps, "open": opens, "high": highs, "low": lows, "close": closes, "timestamp_kind": 0}
+
+
+def benchmark(n_bars: int = 1_000_000, point: float = 0.01) -> Dict[str, Dict[str, float]]:
+    """Size and full-history decode throughput of the archive, CSV and raw .npy arrays"""
+    data = _sample_m1(n_bars)
+    fields = ("timestamp",) + OHLC_FIELDS
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        archive = CandleArchive(directory)
+        archive.write("XAUUSD", data, point=point)
+        size = os.path.getsize(archive.path_for("XAUUSD"))
+        start = time.perf_counter()
+        decoded = archive.read("XAUUSD")
+        seconds = time.perf_counter() - start
+        assert all(np.array_equal(decoded[name], data[name]) for name in fields), "Archive round trip mismatch"
+        middle = int(data["timestamp"][n_bars // 2])
+        range_start = time.perf_counter()
+        archive.read("XAUUSD", middle, middle + 7 * 24 * 3600 * 1_000_000)
+        results["archive"] = {"bytes": size, "read_s": seconds, "week_read_s": time.perf_counter() - range_start}
+
+        csv_path = os.path.join(directory, "XAUUSD.csv")
+        table = np.column_stack([data[name] for name in fields])
+        np.savetxt(csv_path, table, fmt=["%d", "%.2f", "%.2f", "%.2f", "%.2f"], delimiter=",",
+                   header=",".join(fields), comments="")
+        start = time.perf_counter()
+        np.loadtxt(csv_path, delimiter=",", skiprows=1)
+        results["csv"] = {"bytes": os.path.getsize(csv_path), "read_s": time.perf_counter() - start}
+
+        npy_size = 0
+        for name in fields:
+            path = os.path.join(directory, f"{name}.npy")
+            np.save(path, data[name])
+            npy_size += os.path.getsize(path)
+        start = time.perf_counter()
+        for name in fields:
+            np.load(os.path.join(directory, f"{name}.npy"))
+        results["npy"] = {"bytes": npy_size, "read_s": time.perf_counter() - start}
+
+    for row in results.values():
+        row["bytes_per_bar"] = row["bytes"] / n_bars
+        row["bars_per_s"] = n_bars / row["read_s"] if row["read_s"] > 0 else float("inf")
+    return results
+
+
+if __name__ == "__main__":
+    for name, row in benchmark().items():
+        print(f"{name:8s} {row['bytes'] / 1024 ** 2:8.2f} MB  {row['bytes_per_bar']:6.2f} B/bar  "
+              f"read {row['read_s']:7.3f}s  {row['bars_per_s'] / 1e6:8.2f} M bars/s")
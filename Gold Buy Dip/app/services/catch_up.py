@@ -0,0 +1,110 @@
+"""
+Catch-up mode for strategy loops that fall behind.
+
+After a broker hiccup or a long pause, several closed bars are queued for a
+strategy at once. Feeding them one by one into ``_process_market_data`` repeats
+the full per-bar work for bars that can no longer be traded on (RSI 6 Trades
+syncs broker positions on every bar, every strategy recomputes indicators and
+logs), so a backlog grows instead of draining.
+
+``CatchUpRunner`` takes the bars queued for one strategy. When there are more
+than ``max_backlog`` of them, all but the newest are handed to the strategy's
+``fast_forward(candles)``, which only advances buffers and indicator state (no
+entry logic, no broker calls, no per-bar logging). Signals are then evaluated on
+the newest bar alone. Smaller batches are processed bar by bar as before.
+Strategies without ``fast_forward`` are always processed bar by bar.
+
+    runner = CatchUpRunner(strategy, max_backlog=2)
+    for candle, signal in runner.process(queued_candles):
+        ...
+    runner.stats.as_dict()  # {"bars": ..., "coalesced": ..., ...}
+
+``app.services.market_data_bus`` uses one runner per strategy when a
+``StrategySpec`` sets ``max_backlog``.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.utilities.lazy_imports import lazy_logger
+
+logger = lazy_logger(__name__)
+
+# on_error(candle, exception) lets the caller report a failed bar and carry on
+ErrorHandler = Callable[[Any, Exception], None]
+
+
+@dataclass
+class CatchUpStats:
+    """Counters of one runner"""
+    batches: int = 0
+    bars: int = 0
+    evaluated: int = 0  # bars run through _process_market_data
+    coalesced: int = 0  # stale bars fast-forwarded without signal evaluation
+    backlogs: int = 0  # batches that triggered catch-up
+    max_backlog: int = 0  # largest batch seen
+    fast_forward_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dataclasses.asdict(self)
+
+
+class CatchUpRunner:
+    """Feeds queued bars to one strategy, coalescing backlogs (never when max_backlog is None)"""
+
+    def __init__(self, strategy: Any, max_backlog: Optional[int] = 1,
+                 process_kwargs: Optional[Dict[str, Any]] = None, name: Optional[str] = None):
+        if max_backlog is not None and max_backlog < 1:
+            raise ValueError("max_backlog must be at least 1")
+        self.strategy = strategy
+        self.max_backlog = max_backlog
+        self.process_kwargs = process_kwargs or {}
+        self.name = name or getattr(strategy, "pair", type(strategy).__name__)
+        self.stats = CatchUpStats()
+        self._can_fast_forward = callable(getattr(strategy, "fast_forward", None))
+
+    def process(self, candles: Sequence[Any], on_error: Optional[ErrorHandler] = None) -> List[Tuple[Any, Any]]:
+        """
+        Process a batch of queued bars, oldest first.
+
+        Returns ``(candle, signal)`` for every evaluated bar that produced a signal.
+        Exceptions raised by the strategy propagate unless ``on_error`` is given.
+        """
+        stats = self.stats
+        stats.batches += 1
+        stats.bars += len(candles)
+        stats.max_backlog = max(stats.max_backlog, len(candles))
+
+        backlog = self.max_backlog is not None and len(candles) > self.max_backlog
+        if backlog and self._can_fast_forward:
+            stale, candles = candles[:-1], candles[-1:]
+            started = time.perf_counter()
+            try:
+                self.strategy.fast_forward(list(stale))
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(stale[-1], e)
+            stats.fast_forward_seconds += time.perf_counter() - started
+            stats.backlogs += 1
+            stats.coalesced += len(stale)
+            logger.warning(f"{self.name}: behind by {len(stale) + 1} bars, coalesced {len(stale)} "
+                           f"and evaluating the newest only ({stats.coalesced} coalesced so far)")
+
+        signals: List[Tuple[Any, Any]] = []
+        for candle in candles:
+            stats.evaluated += 1
+            try:
+                signal = self.strategy._process_market_data(candle, **self.process_kwargs)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(candle, e)
+                continue
+            if signal is not None:
+                signals.append((candle, signal))
+        return signals
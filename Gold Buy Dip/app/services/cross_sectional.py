@@ -0,0 +1,320 @@
+"""
+Cross-sectional Gold Buy Dip: one config evaluated on many symbols at once.
+
+Running the same ``GoldBuyDipConfig`` on 50-200 symbols used to mean 50-200
+``GoldBuyDipStrategy`` objects, each walking its own candle list bar by bar.
+``GoldBuyDipUniverse`` keeps the state of every instance in NumPy arrays indexed by
+symbol (candle buffers as bars x symbols matrices, setup state, trigger direction,
+wait counter, grid prices / lots) and advances all symbols with a handful of
+vectorised operations per bar close:
+
+1. append the bar to every buffer
+2. grid take profit (volume-weighted average price +/- TP) -> CLOSE_ALL
+3. percentage trigger for symbols waiting for one
+4. Z-score confirmation / timeout for triggered symbols -> initial trade
+5. ATR or percent grid spacing for open grids -> grid trade
+
+The rules and their order are those of ``GoldBuyDipStrategy._process_market_data``
+(without the per-instance drawdown check, which belongs to
+app.services.equity_monitor). ``TradeSignal`` objects are only built for the
+symbols that actually fire.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.models.trading_models import SetupState, TradeDirection, TradeSignal
+from app.services.symbol_registry import SymbolRegistry, symbol_registry
+
+# Setup states as small integer codes
+WAITING_FOR_TRIGGER = 0
+WAITING_FOR_ZSCORE = 1
+TRADE_EXECUTED = 2
+
+_SETUP_STATES = {
+    WAITING_FOR_TRIGGER: SetupState.WAITING_FOR_TRIGGER,
+    WAITING_FOR_ZSCORE: SetupState.WAITING_FOR_ZSCORE,
+    TRADE_EXECUTED: SetupState.TRADE_EXECUTED,
+}
+
+# Direction codes: +1 BUY, -1 SELL, 0 none
+_DIRECTIONS = {1: TradeDirection.BUY, -1: TradeDirection.SELL}
+
+BarInput = Union[Mapping[str, float], Sequence[float], np.ndarray]
+
+
+class UniverseEvents(NamedTuple):
+    """Rows that acted on one bar (indices into ``symbols``)"""
+    closed: np.ndarray
+    entries: np.ndarray
+    adds: np.ndarray
+    add_levels: np.ndarray  # grid level opened for each row in ``adds``
+
+
+class GoldBuyDipUniverse:
+    """
+    Struct-of-arrays state for one GoldBuyDipConfig across many symbols.
+
+    Call ``step`` once per bar close with one OHLC value per symbol (dicts by
+    symbol or vectors in ``symbols`` order). Symbols without a bar (missing key or
+    NaN close) are left untouched for that bar.
+    """
+
+    def __init__(self, config, symbols: Sequence[str], registry: Optional[SymbolRegistry] = None):
+        self.config = config
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.registry = registry or symbol_registry
+
+        n = len(self.symbols)
+        # Same buffer length as GoldBuyDipStrategy._max_candles. Buffers are time-major
+        # with twice that capacity: the window is rows [head - buffer_size, head), a bar
+        # is one row write and the tail is moved back to the start when capacity is hit
+        self.buffer_size = max(config.lookback_candles, config.zscore_period, config.atr_period) + 10
+        self._capacity = 2 * self.buffer_size
+        self._head = self.buffer_size
+        self._highs = np.full((self._capacity, n), np.nan)
+        self._lows = np.full((self._capacity, n), np.nan)
+        self._closes = np.full((self._capacity, n), np.nan)
+        self.bars = np.zeros(n, dtype=np.int64)
+
+        self.setup_state = np.full(n, WAITING_FOR_TRIGGER, dtype=np.int8)
+        self.trigger_direction = np.zeros(n, dtype=np.int8)
+        self.wait_count = np.zeros(n, dtype=np.int64)
+
+        max_levels = max(config.max_grid_trades, 1)
+        self.grid_depth = np.zeros(n, dtype=np.int64)
+        self.grid_price = np.zeros((n, max_levels))
+        self.grid_lots = np.zeros((n, max_levels))
+        self.point = np.array([self.registry.get(symbol).point for symbol in self.symbols])
+        self.level_lots = np.array([self._grid_lot_size(level) for level in range(max_levels)])
+
+    def _grid_lot_size(self, grid_level: int) -> float:
+        """GoldBuyDipStrategy.calculate_grid_lot_size"""
+        if grid_level == 0:
+            return self.config.lot_size
+        if self.config.use_progressive_lots:
+            return self.config.lot_size * (self.config.lot_progression_factor ** grid_level)
+        return self.config.lot_size * self.config.grid_lot_multiplier
+
+    def _as_vector(self, values: BarInput) -> np.ndarray:
+        if isinstance(values, Mapping):
+            vector = np.full(len(self.symbols), np.nan)
+            for symbol, value in values.items():
+                idx = self.index.get(symbol)
+                if idx is not None and value is not None:
+                    vector[idx] = value
+            return vector
+        vector = np.asarray(values, dtype=np.float64)
+        if vector.shape != (len(self.symbols),):
+            raise ValueError(f"Expected {len(self.symbols)} values, got shape {vector.shape}")
+        return vector
+
+    def warm_up(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray):
+        """Seed the buffers from history (bars x symbols matrices); no signals are evaluated"""
+        closes = np.asarray(closes, dtype=np.float64)
+        tail = min(len(closes), self.buffer_size)
+        self._head = self.buffer_size
+        for buffer, values in ((self._highs, highs), (self._lows, lows), (self._closes, closes)):
+            buffer[:] = np.nan
+            buffer[self.buffer_size - tail:self.buffer_size] = np.asarray(values, dtype=np.float64)[-tail:]
+        self.bars[:] = len(closes)
+
+    def window(self, field: str) -> np.ndarray:
+        """Current buffer of 'high', 'low' or 'close' as a (buffer_size, symbols) view"""
+        buffer = {"high": self._highs, "low": self._lows, "close": self._closes}[field]
+        return buffer[self._head - self.buffer_size:self._head]
+
+    def _append(self, active: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        size = self.buffer_size
+        buffers = ((self._highs, high), (self._lows, low), (self._closes, close))
+        if self._head == self._capacity:
+            for buffer, _ in buffers:
+                buffer[:size] = buffer[size:]
+            self._head = size
+        head = self._head
+        idle = np.flatnonzero(~active)
+        for buffer, values in buffers:
+            buffer[head] = values
+            if len(idle):
+                # Symbols without this bar keep their window: shift it along with the head
+                buffer[head - size + 1:head + 1, idle] = buffer[head - size:head, idle]
+        self._head = head + 1
+        self.bars[active] += 1
+
+    def _zscores(self, rows: np.ndarray) -> np.ndarray:
+        """calculate_zscore on each row's buffer (0 with too little data or no variance)"""
+        period = self.config.zscore_period
+        closes = self.window("close")
+        history = closes[-(period + 1):-1, rows]
+        mean = history.sum(axis=0) / period
+        std = np.sqrt(((history - mean) ** 2).sum(axis=0) / period)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.where(std == 0, 0.0, (closes[-1, rows] - mean) / std)
+        z[self.bars[rows] < period + 1] = 0.0
+        return z
+
+    def _atrs(self, rows: np.ndarray) -> np.ndarray:
+        """calculate_atr on each row's buffer (0.001 with too little data)"""
+        period = self.config.atr_period
+        highs = self.window("high")[-period:, rows]
+        lows = self.window("low")[-period:, rows]
+        prev_closes = self.window("close")[-(period + 1):-1, rows]
+        true_range = np.maximum(highs - lows, np.maximum(np.abs(highs - prev_closes), np.abs(lows - prev_closes)))
+        atr = true_range.sum(axis=0) / period
+        atr[self.bars[rows] < period + 2] = 0.001
+        return atr
+
+    def _take_profit(self, rows: np.ndarray) -> np.ndarray:
+        """Volume-weighted grid take profit per row (calculate_volume_weighted_take_profit)"""
+        lots = self.grid_lots[rows]
+        total_lots = lots.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = (self.grid_price[rows] * lots).sum(axis=1) / total_lots
+        direction = self.trigger_direction[rows]
+        if self.config.use_take_profit_percent:
+            return vwap * (1 + direction * self.config.take_profit_percent / 100)
+        return vwap + direction * (self.config.take_profit * self.point[rows])
+
+    def step(self, high: BarInput, low: BarInput, close: BarInput) -> List[Tuple[str, TradeSignal]]:
+        """Advance every symbol by one closed bar; returns (symbol, signal) for the symbols that fire"""
+        config = self.config
+        events = self.advance(self._as_vector(high), self._as_vector(low), self._as_vector(close))
+        fired: List[Tuple[str, TradeSignal]] = []
+        exit_reason = "Grid profit target reached" if config.use_grid_trading else "Single trade profit target reached"
+        for row in events.closed:
+            fired.append((self.symbols[row], self._signal("CLOSE_ALL", 0, exit_reason)))
+        for row in events.entries:
+            fired.append((self.symbols[row], self._signal(
+                _DIRECTIONS[int(self.trigger_direction[row])].value, config.lot_size,
+                f"Initial trade - Z-score confirmed (Magic: {config.magic_number})")))
+        for row, level in zip(events.adds, events.add_levels):
+            fired.append((self.symbols[row], self._signal(
+                _DIRECTIONS[int(self.trigger_direction[row])].value, self.level_lots[level],
+                f"Grid trade level {level + 1}/{config.max_grid_trades} (Magic: {config.magic_number})")))
+        return fired
+
+    def advance(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> UniverseEvents:
+        """
+        State update behind ``step`` on plain vectors, without building signals.
+
+        Used directly where rows are simulated paths rather than symbols (see
+        app.services.risk_of_ruin).
+        """
+        empty = np.empty(0, dtype=np.int64)
+        active = ~np.isnan(close)
+        rows = np.flatnonzero(active)
+        if len(rows) == 0:
+            return UniverseEvents(empty, empty, empty, empty)
+        self._append(active, high, low, close)
+        config = self.config
+        done = entries = adds = add_levels = empty
+
+        # Grid take profit
+        in_grid = rows[self.grid_depth[rows] > 0]
+        closed = np.zeros(len(self.symbols), dtype=bool)
+        if len(in_grid):
+            take_profit = self._take_profit(in_grid)
+            price = close[in_grid]
+            direction = self.trigger_direction[in_grid]
+            hit = ((direction == 1) & (price >= take_profit)) | ((direction == -1) & (price <= take_profit))
+            done = in_grid[hit]
+            closed[done] = True
+            self.setup_state[done] = WAITING_FOR_TRIGGER
+            self.grid_depth[done] = 0
+            self.grid_price[done] = 0.0
+            self.grid_lots[done] = 0.0
+        rows = rows[~closed[rows]]
+
+        state = self.setup_state[rows]
+        waiting = rows[state == WAITING_FOR_TRIGGER]
+        confirming = rows[state == WAITING_FOR_ZSCORE]
+        executed = rows[state == TRADE_EXECUTED]
+
+        # Percentage trigger: previous close against the range of the lookback before it
+        lookback = config.lookback_candles
+        waiting = waiting[self.bars[waiting] >= lookback + 2]
+        if len(waiting):
+            closes = self.window("close")
+            window = closes[-(lookback + 2):-2, waiting]
+            highest = window.max(axis=0)
+            lowest = window.min(axis=0)
+            current = closes[-2, waiting]
+            valid = (lowest > 0) & (highest > 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sell = valid & (((current - lowest) / lowest) * 100 >= config.percentage_threshold)
+                buy = valid & ~sell & (((current - highest) / highest) * 100 <= -config.percentage_threshold)
+            triggered = waiting[sell | buy]
+            self.trigger_direction[waiting[sell]] = -1
+            self.trigger_direction[waiting[buy]] = 1
+            self.setup_state[triggered] = WAITING_FOR_ZSCORE
+            self.wait_count[triggered] = 0
+
+        # Z-score confirmation or timeout
+        if len(confirming):
+            self.wait_count[confirming] += 1
+            z = self._zscores(confirming)
+            direction = self.trigger_direction[confirming]
+            confirmed = ((direction == -1) & (z >= config.zscore_threshold_sell)) | \
+                        ((direction == 1) & (z <= config.zscore_threshold_buy))
+            entries = confirming[confirmed]
+            self.setup_state[entries] = TRADE_EXECUTED
+            self.grid_depth[entries] = 1
+            self.grid_price[entries, 0] = close[entries]
+            self.grid_lots[entries, 0] = config.lot_size
+            expired = confirming[~confirmed & (self.wait_count[confirming] > config.zscore_wait_candles)]
+            self.setup_state[expired] = WAITING_FOR_TRIGGER
+            self.trigger_direction[expired] = 0
+
+        # Grid additions
+        if config.use_grid_trading and len(executed):
+            depth = self.grid_depth[executed]
+            executed = executed[(depth > 0) & (depth < config.max_grid_trades)]
+            if len(executed):
+                depth = self.grid_depth[executed]
+                last_price = self.grid_price[executed, depth - 1]
+                if config.use_grid_percent:
+                    spacing = last_price * (config.grid_percent / 100)
+                else:
+                    atr = self._atrs(executed)
+                    spacing = np.where(atr <= 0, 0.001, atr * config.grid_atr_multiplier)
+                # Price move against the grid: down for BUY grids, up for SELL grids
+                against = (last_price - close[executed]) * self.trigger_direction[executed]
+                hit = against >= spacing
+                adds = executed[hit]
+                add_levels = depth[hit]
+                self.grid_price[adds, add_levels] = close[adds]
+                self.grid_lots[adds, add_levels] = self.level_lots[add_levels]
+                self.grid_depth[adds] = add_levels + 1
+
+        return UniverseEvents(done, entries, adds, add_levels)
+
+    @staticmethod
+    def _signal(action: str, lot_size: float, reason: str) -> TradeSignal:
+        signal = TradeSignal(action=action, lot_size=float(lot_size), take_profit=None, reason=reason)
+        # Remove pairs trading attribute for Gold Buy Dip
+        signal.__dict__.pop('symbol2_trade', None)
+        return signal
+
+    def grid_status(self, symbol: str) -> Dict:
+        """GoldBuyDipStrategy.get_grid_status for one symbol"""
+        row = self.index[symbol]
+        depth = int(self.grid_depth[row])
+        if depth == 0:
+            return {"active": False}
+        lots = self.grid_lots[row, :depth]
+        prices = self.grid_price[row, :depth]
+        return {
+            "active": True,
+            "grid_level": depth,
+            "grid_direction": _DIRECTIONS[int(self.trigger_direction[row])].value,
+            "last_grid_price": float(prices[-1]),
+            "total_lots": float(lots.sum()),
+            "average_price": float((prices * lots).sum() / lots.sum()),
+        }
+
+    def setup_states(self) -> Dict[str, SetupState]:
+        return {symbol: _SETUP_STATES[int(code)] for symbol, code in zip(self.symbols, self.setup_state)}
@@ -0,0 +1,338 @@
+"""
+Vectorised data-quality filter for incoming bars.
+
+Bad bars used to reach ``add_candle`` / ``add_candle_data`` unchecked and only
+surfaced later as per-bar error paths (``check_percentage_trigger`` logging a
+non-positive low, ``calculate_hedge_ratio`` falling back to 1:1 on a broken ATR),
+or not at all (a duplicated or spiked bar silently shifting every indicator).
+``DataQualityFilter`` validates whole batches of bars (one bar is a batch of one)
+as NumPy columns before they are handed on, per stream (a symbol, or a
+``(symbol, timeframe)`` ring key):
+
+- bars with NaN / inf or non-positive prices are dropped
+- inverted bars (high < low) are swapped back and high / low are widened to
+  contain open and close
+- duplicate and out-of-order timestamps are dropped (the first bar seen for a
+  timestamp wins, since it may already have been traded on)
+- close spikes are dropped: a close more than ``spike_atr_multiple`` x ATR away
+  from the previous close that the next bar reverts from. The last bar of a
+  batch has no next bar yet, so a suspect last bar is held back and released
+  (one bar late) or dropped once the next bar arrives; a move the next bar
+  confirms is a real level shift and is kept
+- wicks longer than ``wick_atr_multiple`` x ATR beyond the body are clipped
+- gaps larger than ``max_missing_bars`` are counted (not filled: synthetic bars
+  would distort ATR and z-scores)
+
+The ATR is the mean true range of the previous ``atr_period`` accepted bars,
+carried between batches; spike and wick checks start once that much history has
+been seen. Every action is counted per stream (``stats()``).
+
+Typical use is at ingest, e.g. ``MarketDataBus(keys, quality_filter=DataQualityFilter())``,
+or on a history block before ``warm_up`` / a backtest feed:
+
+    clean = data_quality_filter.filter_arrays("XAUUSD", arrays)
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import OHLC_FIELDS, TIMESTAMP_NAIVE, arrays_to_candles, candles_to_arrays
+
+logger = lazy_logger(__name__)
+
+_NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+@dataclass(frozen=True)
+class QualityConfig:
+    """Thresholds for one stream"""
+    atr_period: int = 14
+    spike_atr_multiple: float = 10.0
+    wick_atr_multiple: float = 10.0
+    hold_suspect_bars: bool = True  # False: a suspect last bar of a batch is accepted
+    bar_seconds: Optional[int] = None  # bar interval for gap detection (None disables it)
+    max_missing_bars: int = 0
+
+
+@dataclass
+class QualityCounters:
+    """What the filter did to one stream"""
+    received: int = 0
+    accepted: int = 0
+    dropped_non_finite: int = 0
+    dropped_non_positive: int = 0
+    dropped_duplicate: int = 0
+    dropped_out_of_order: int = 0
+    dropped_spike: int = 0
+    repaired_inverted: int = 0
+    repaired_range: int = 0
+    repaired_wick: int = 0
+    held: int = 0
+    released: int = 0
+    gaps: int = 0
+    missing_bars: int = 0
+
+    @property
+    def dropped(self) -> int:
+        return (self.dropped_non_finite + self.dropped_non_positive + self.dropped_duplicate
+                + self.dropped_out_of_order + self.dropped_spike)
+
+    def as_dict(self) -> Dict[str, int]:
+        result = dataclasses.asdict(self)
+        result["dropped"] = self.dropped
+        return result
+
+
+@dataclass
+class _StreamState:
+    config: QualityConfig
+    counters: QualityCounters = field(default_factory=QualityCounters)
+    last_timestamp: Optional[int] = None
+    last_close: Optional[float] = None
+    true_ranges: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float64))
+    pending: Optional[Dict[str, np.ndarray]] = None  # held suspect bar, one-element columns
+    timestamp_kind: int = TIMESTAMP_NAIVE
+
+
+def _true_ranges(highs: np.ndarray, lows: np.ndarray, prev_closes: np.ndarray) -> np.ndarray:
+    return np.maximum(highs - lows, np.maximum(np.abs(highs - prev_closes), np.abs(lows - prev_closes)))
+
+
+def _empty(kind: int) -> Dict[str, Any]:
+    result: Dict[str, Any] = {name: np.empty(0, dtype=np.float64) for name in OHLC_FIELDS}
+    result["timestamp"] = np.empty(0, dtype=np.int64)
+    result["timestamp_kind"] = kind
+    return result
+
+
+class DataQualityFilter:
+    """
+    Per-stream bar validation and repair.
+
+    Thread-safe; streams are independent and keep their own ATR history, last
+    timestamp and held bar.
+    """
+
+    def __init__(self, config: Optional[QualityConfig] = None):
+        self.config = config or QualityConfig()
+        self._configs: Dict[Hashable, QualityConfig] = {}
+        self._streams: Dict[Hashable, _StreamState] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, stream: Hashable, config: QualityConfig):
+        """Use config for stream (e.g. its bar_seconds) instead of the default"""
+        with self._lock:
+            self._configs[stream] = config
+            if stream in self._streams:
+                self._streams[stream].config = config
+
+    def _state(self, stream: Hashable) -> _StreamState:
+        state = self._streams.get(stream)
+        if state is None:
+            state = _StreamState(self._configs.get(stream, self.config))
+            self._streams[stream] = state
+        return state
+
+    def filter_arrays(self, stream: Hashable, arrays: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Clean a batch of bars given as columns (see app.utilities.ohlc_arrays).
+
+        Returns new columns holding the accepted (possibly repaired) bars in order,
+        which may include a bar held back from the previous batch.
+        """
+        timestamps = np.asarray(arrays["timestamp"], dtype=np.int64)
+        columns = {name: np.asarray(arrays[name], dtype=np.float64) for name in OHLC_FIELDS}
+        with self._lock:
+            state = self._state(stream)
+            state.timestamp_kind = int(arrays.get("timestamp_kind", state.timestamp_kind))
+            state.counters.received += len(timestamps)
+            if state.pending is not None:
+                held = state.pending
+                state.pending = None
+                timestamps = np.concatenate((held["timestamp"], timestamps))
+                columns = {name: np.concatenate((held[name], columns[name])) for name in OHLC_FIELDS}
+                result = self._filter(stream, state, timestamps, columns, held=True)
+            else:
+                result = self._filter(stream, state, timestamps, columns, held=False)
+        result["timestamp_kind"] = state.timestamp_kind
+        return result
+
+    def filter_candles(self, stream: Hashable, candles: Sequence[Any], candle_cls: Any = None) -> List[Any]:
+        """filter_arrays for MarketData objects or RSI Pairs candle dicts"""
+        if not candles:
+            return []
+        result = self.filter_arrays(stream, candles_to_arrays(candles))
+        return arrays_to_candles(result, candle_cls or type(candles[0]))
+
+    def flush(self, stream: Hashable) -> Dict[str, Any]:
+        """Release a held bar unchecked (end of a backtest or of a history block)"""
+        with self._lock:
+            state = self._state(stream)
+            held = state.pending
+            state.pending = None
+            if held is None:
+                return _empty(state.timestamp_kind)
+            self._commit(state, held["timestamp"], held)
+            state.counters.released += 1
+            state.counters.accepted += 1
+            result = dict(held)
+        result["timestamp_kind"] = state.timestamp_kind
+        return result
+
+    def _filter(self, stream: Hashable, state: _StreamState, timestamps: np.ndarray,
+                columns: Dict[str, np.ndarray], held: bool) -> Dict[str, Any]:
+        config = state.config
+        counters = state.counters
+        before = counters.dropped
+
+        # Prices: finite and positive, else the bar is dropped
+        prices = np.stack([columns[name] for name in OHLC_FIELDS])
+        finite = np.isfinite(prices).all(axis=0)
+        positive = (prices > 0).all(axis=0)
+        counters.dropped_non_finite += int(np.count_nonzero(~finite))
+        counters.dropped_non_positive += int(np.count_nonzero(finite & ~positive))
+        keep = finite & positive
+
+        # Timestamps: strictly increasing after the last accepted bar
+        timestamps_kept = timestamps[keep]
+        seed = _NO_TIMESTAMP if state.last_timestamp is None else state.last_timestamp
+        previous = np.maximum.accumulate(np.concatenate(([seed], timestamps_kept)))[:-1]
+        duplicate = timestamps_kept == previous
+        late = timestamps_kept < previous
+        counters.dropped_duplicate += int(np.count_nonzero(duplicate))
+        counters.dropped_out_of_order += int(np.count_nonzero(late))
+        keep[np.flatnonzero(keep)[duplicate | late]] = False
+        if held and not keep[0]:
+            held = False
+
+        index = np.flatnonzero(keep)
+        timestamps = timestamps[index]
+        opens, highs, lows, closes = (prices[row, index] for row in range(4))
+
+        # Repairs: high/low swapped back, then widened to the body
+        inverted = highs < lows
+        if inverted.any():
+            highs, lows = np.where(inverted, lows, highs), np.where(inverted, highs, lows)
+            counters.repaired_inverted += int(np.count_nonzero(inverted))
+        top = np.maximum(opens, closes)
+        bottom = np.minimum(opens, closes)
+        outside = (highs < top) | (lows > bottom)
+        if outside.any():
+            highs = np.maximum(highs, top)
+            lows = np.minimum(lows, bottom)
+            counters.repaired_range += int(np.count_nonzero(outside))
+
+        n = len(closes)
+        if n:
+            first_prev = closes[0] if state.last_close is None else state.last_close
+            prev_closes = np.concatenate(([first_prev], closes[:-1]))
+            atr = self._atr_before(state, _true_ranges(highs, lows, prev_closes))
+            checked = atr > 0  # NaN until atr_period bars of history
+
+            # Close spikes: a jump the next bar reverts from
+            limit = config.spike_atr_multiple * atr
+            suspect = checked & (np.abs(closes - prev_closes) > limit)
+            reverted = np.zeros(n, dtype=bool)
+            reverted[:-1] = np.abs(closes[1:] - prev_closes[:-1]) <= limit[:-1]
+            spike = suspect & reverted
+            hold = config.hold_suspect_bars and bool(suspect[-1])
+            if held:
+                # The held bar is decided now: dropped as a spike or released
+                if spike[0]:
+                    counters.dropped_spike += 1
+                elif not (hold and n == 1):
+                    counters.released += 1
+            counters.dropped_spike += int(np.count_nonzero(spike[1:] if held else spike))
+
+            # Wicks beyond the body
+            wick_limit = config.wick_atr_multiple * atr
+            long_high = checked & (highs - top > wick_limit)
+            long_low = checked & (bottom - lows > wick_limit)
+            if long_high.any() or long_low.any():
+                highs = np.where(long_high, top, highs)
+                lows = np.where(long_low, bottom, lows)
+                counters.repaired_wick += int(np.count_nonzero(long_high | long_low))
+
+            out = ~spike
+            if hold:
+                out[-1] = False
+                if not (held and n == 1):
+                    counters.held += 1
+                state.pending = {
+                    "timestamp": timestamps[-1:].copy(), "open": opens[-1:].copy(), "high": highs[-1:].copy(),
+                    "low": lows[-1:].copy(), "close": closes[-1:].copy(),
+                }
+            index = np.flatnonzero(out)
+            timestamps = timestamps[index]
+            opens, highs, lows, closes = opens[index], highs[index], lows[index], closes[index]
+
+        result = {"timestamp": timestamps, "open": opens, "high": highs, "low": lows, "close": closes}
+        if len(timestamps):
+            self._count_gaps(state, timestamps)
+            self._commit(state, timestamps, result)
+        counters.accepted += len(timestamps)
+
+        dropped = counters.dropped - before
+        if dropped:
+            totals = {name: value for name, value in counters.as_dict().items() if name.startswith("dropped_") and value}
+            logger.warning(f"Data quality {stream}: dropped {dropped} bar(s) in this batch, totals {totals}")
+        return result
+
+    def _atr_before(self, state: _StreamState, true_ranges: np.ndarray) -> np.ndarray:
+        """ATR of the atr_period bars before each bar (NaN without enough history)"""
+        period = state.config.atr_period
+        history = np.concatenate((state.true_ranges, true_ranges))
+        sums = np.concatenate(([0.0], np.cumsum(history)))
+        end = len(state.true_ranges) + np.arange(len(true_ranges))
+        start = end - period
+        atr = np.full(len(true_ranges), np.nan)
+        enough = start >= 0
+        atr[enough] = (sums[end[enough]] - sums[start[enough]]) / period
+        return atr
+
+    def _count_gaps(self, state: _StreamState, timestamps: np.ndarray):
+        bar_seconds = state.config.bar_seconds
+        if not bar_seconds:
+            return
+        if state.last_timestamp is not None:
+            timestamps = np.concatenate(([state.last_timestamp], timestamps))
+        missing = np.diff(timestamps) // (bar_seconds * 1_000_000) - 1
+        gaps = missing > state.config.max_missing_bars
+        state.counters.gaps += int(np.count_nonzero(gaps))
+        state.counters.missing_bars += int(missing[gaps].sum())
+
+    def _commit(self, state: _StreamState, timestamps: np.ndarray, columns: Dict[str, np.ndarray]):
+        """Advance the stream past accepted bars: last timestamp / close and the ATR history"""
+        closes = columns["close"]
+        first_prev = closes[0] if state.last_close is None else state.last_close
+        prev_closes = np.concatenate(([first_prev], closes[:-1]))
+        true_ranges = _true_ranges(columns["high"], columns["low"], prev_closes)
+        state.true_ranges = np.concatenate((state.true_ranges, true_ranges))[-state.config.atr_period:]
+        state.last_timestamp = int(timestamps[-1])
+        state.last_close = float(closes[-1])
+
+    def stats(self, stream: Optional[Hashable] = None) -> Dict[Any, Dict[str, int]]:
+        """Counters of one stream, or of every stream keyed by stream"""
+        with self._lock:
+            if stream is not None:
+                state = self._streams.get(stream)
+                return state.counters.as_dict() if state else QualityCounters().as_dict()
+            return {key: state.counters.as_dict() for key, state in self._streams.items()}
+
+    def reset(self, stream: Optional[Hashable] = None):
+        """Forget a stream's history and counters (all streams when None)"""
+        with self._lock:
+            if stream is None:
+                self._streams.clear()
+            else:
+                self._streams.pop(stream, None)
+
+
+data_quality_filter = DataQualityFilter()
@@ -0,0 +1,243 @@
+"""
+Account equity and drawdown monitor shared by all strategy instances.
+
+``GoldBuyDipStrategy`` checks its MaxDrawdownPercent against account equity, which
+callers used to fetch and pass into every ``_process_market_data`` call, i.e. one
+account query per instance per bar. ``EquityMonitor`` queries the account once per
+cycle (``poll``) and publishes the result as an immutable ``EquitySnapshot`` that
+every instance reads in O(1) via ``latest``.
+
+When ``fetch`` also returns the account free margin, it is pushed to the attached
+``MarginService`` (``margin_service``) so grid margin checks do not read the
+account themselves.
+
+On each poll the monitor also updates, incrementally:
+
+- the portfolio peak equity and the drawdown from it
+- each registered strategy's drawdown from its initial balance (the rule of
+  ``GoldBuyDipStrategy._check_strategy_drawdown``) and its worst drawdown so far
+
+Strategies whose limit is exceeded (or all of them, when the optional portfolio
+limit is exceeded) receive a CLOSE_ALL trigger through ``request_close_all``; the
+strategy emits the CLOSE_ALL signal on its next bar.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from app.utilities.clock import Clock, system_clock
+from app.utilities.lazy_imports import OptionalModule, lazy_logger
+
+if TYPE_CHECKING:
+    from app.services.margin_service import MarginService
+
+logger = lazy_logger(__name__)
+
+_mt5 = OptionalModule("MetaTrader5")
+
+STRATEGY_DRAWDOWN_REASON = "Strategy maximum drawdown exceeded"
+PORTFOLIO_DRAWDOWN_REASON = "Portfolio maximum drawdown exceeded"
+
+
+@dataclass(frozen=True)
+class EquitySnapshot:
+    """Account state published once per poll; never modified after publication"""
+    version: int
+    timestamp: datetime
+    equity: float
+    balance: float
+    peak_equity: float
+    drawdown_pct: float  # portfolio drawdown from peak equity
+    strategy_drawdowns: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    triggered: Tuple[str, ...] = ()
+
+
+@dataclass
+class _Registration:
+    key: str
+    strategy: Any
+    max_drawdown_percent: Optional[float]
+    initial_balance: Optional[float]
+    max_drawdown_seen: float = 0.0
+    breached: bool = False
+
+
+def fetch_mt5_account() -> Optional[Tuple[float, ...]]:
+    """(equity, balance, free margin) from MT5 account_info, or None when unavailable"""
+    mt5 = _mt5.get()
+    if mt5 is None:
+        raise RuntimeError("MetaTrader5 module required") from _mt5.import_error
+    info = mt5.account_info()
+    if info is None:
+        return None
+    return float(info.equity), float(info.balance), float(info.margin_free)
+
+
+def strategy_key(strategy: Any) -> str:
+    """Default registration key: class, pair, timeframe and magic number"""
+    magic = strategy.get_magic_number() if hasattr(strategy, "get_magic_number") else id(strategy)
+    return f"{type(strategy).__name__}:{getattr(strategy, 'pair', '')}:{getattr(strategy, 'timeframe', '')}:{magic}"
+
+
+class EquityMonitor:
+    """
+    Polls account equity once per cycle and hands out immutable snapshots.
+
+    ``fetch`` returns ``(equity, balance)`` or ``(equity, balance, free_margin)``
+    (None when the account cannot be read, in which case the previous snapshot
+    stays current); it defaults to MT5 ``account_info``. The free margin is pushed
+    to ``margin_service`` when one is attached. ``max_portfolio_drawdown_percent``, when set, triggers
+    CLOSE_ALL on every registered strategy once equity falls that far below its peak.
+    """
+
+    def __init__(self, fetch: Optional[Callable[[], Optional[Tuple[float, ...]]]] = None,
+                 max_portfolio_drawdown_percent: Optional[float] = None, clock: Optional[Clock] = None,
+                 margin_service: Optional["MarginService"] = None):
+        self.fetch = fetch or fetch_mt5_account
+        self.margin_service = margin_service
+        self.max_portfolio_drawdown_percent = max_portfolio_drawdown_percent
+        self.clock = clock or system_clock
+        self._registrations: Dict[str, _Registration] = {}
+        self._lock = threading.Lock()
+        self._latest: Optional[EquitySnapshot] = None
+        self._peak_equity = 0.0
+        self._portfolio_breached = False
+        self._version = 0
+        self.polls = 0
+        self.fetch_failures = 0
+
+    @property
+    def latest(self) -> Optional[EquitySnapshot]:
+        """Most recent snapshot (None before the first successful poll)"""
+        return self._latest
+
+    def register(self, strategy: Any, key: Optional[str] = None, max_drawdown_percent: Optional[float] = None,
+                 initial_balance: Optional[float] = None) -> str:
+        """
+        Watch a strategy instance.
+
+        The limit defaults to ``strategy.config.max_drawdown_percent`` and the
+        baseline to ``strategy.state.initial_balance``, read on every poll so a later
+        ``set_initial_balance`` is picked up.
+        """
+        key = key or strategy_key(strategy)
+        if max_drawdown_percent is None:
+            max_drawdown_percent = getattr(getattr(strategy, "config", None), "max_drawdown_percent", None)
+        with self._lock:
+            existing = self._registrations.get(key)
+            if existing is not None and existing.strategy is not strategy:
+                raise ValueError(f"Equity monitor key {key!r} is already registered to another strategy")
+            self._registrations[key] = _Registration(key, strategy, max_drawdown_percent, initial_balance)
+        return key
+
+    def unregister(self, key: str) -> bool:
+        with self._lock:
+            return self._registrations.pop(key, None) is not None
+
+    def _baseline(self, registration: _Registration) -> float:
+        if registration.initial_balance is not None:
+            return registration.initial_balance
+        state = getattr(registration.strategy, "state", None)
+        return getattr(state, "initial_balance", 0) or 0
+
+    def strategy_drawdown(self, key: str) -> float:
+        """Drawdown % of a registered strategy in the latest snapshot (0 if unknown)"""
+        snapshot = self._latest
+        if snapshot is None:
+            return 0.0
+        return snapshot.strategy_drawdowns.get(key, 0.0)
+
+    def max_drawdown_seen(self, key: str) -> float:
+        registration = self._registrations.get(key)
+        return registration.max_drawdown_seen if registration else 0.0
+
+    def poll(self) -> Optional[EquitySnapshot]:
+        """
+        Read the account once, publish a new snapshot and push CLOSE_ALL triggers.
+
+        Returns the new snapshot, or None if the account could not be read.
+        """
+        self.polls += 1
+        try:
+            account = self.fetch()
+        except Exception as e:
+            logger.error(f"Error fetching account equity: {e}")
+            account = None
+        if account is None:
+            self.fetch_failures += 1
+            return None
+        equity, balance = account[0], account[1]
+        if len(account) > 2 and account[2] is not None and self.margin_service is not None:
+            self.margin_service.set_free_margin(account[2])
+
+        with self._lock:
+            registrations = list(self._registrations.values())
+            self._peak_equity = max(self._peak_equity, equity)
+            peak = self._peak_equity
+            portfolio_drawdown = (peak - equity) / peak * 100 if peak > 0 else 0.0
+            portfolio_breached = (
+                self.max_portfolio_drawdown_percent is not None
+                and portfolio_drawdown >= self.max_portfolio_drawdown_percent
+            )
+
+            drawdowns: Dict[str, float] = {}
+            triggers: List[Tuple[_Registration, str]] = []
+            newly_breached: List[_Registration] = []
+            for registration in registrations:
+                baseline = self._baseline(registration)
+                drawdown = (baseline - equity) / baseline * 100 if baseline > 0 else 0.0
+                drawdowns[registration.key] = drawdown
+                if drawdown > registration.max_drawdown_seen:
+                    registration.max_drawdown_seen = drawdown
+                breached = (registration.max_drawdown_percent is not None and baseline > 0
+                            and drawdown >= registration.max_drawdown_percent)
+                if breached and not registration.breached:
+                    newly_breached.append(registration)
+                registration.breached = breached
+                if portfolio_breached:
+                    triggers.append((registration, PORTFOLIO_DRAWDOWN_REASON))
+                elif breached:
+                    triggers.append((registration, STRATEGY_DRAWDOWN_REASON))
+
+            self._version += 1
+            snapshot = EquitySnapshot(
+                version=self._version,
+                timestamp=self.clock.now(),
+                equity=equity,
+                balance=balance,
+                peak_equity=peak,
+                drawdown_pct=portfolio_drawdown,
+                strategy_drawdowns=MappingProxyType(drawdowns),
+                triggered=tuple(registration.key for registration, _ in triggers),
+            )
+            self._latest = snapshot
+            portfolio_newly_breached = portfolio_breached and not self._portfolio_breached
+            self._portfolio_breached = portfolio_breached
+
+        # Log when a limit is crossed; triggers are re-sent every poll while it stays crossed
+        if portfolio_newly_breached:
+            logger.critical(f"PORTFOLIO DRAWDOWN LIMIT EXCEEDED: {portfolio_drawdown:.2f}% >= {self.max_portfolio_drawdown_percent}%")
+        for registration in newly_breached:
+            logger.critical(f"STRATEGY DRAWDOWN LIMIT EXCEEDED ({registration.key}): "
+                            f"{drawdowns[registration.key]:.2f}% >= {registration.max_drawdown_percent}%")
+        for registration, reason in triggers:
+            request = getattr(registration.strategy, "request_close_all", None)
+            if request is None:
+                logger.warning(f"Strategy {registration.key} cannot receive CLOSE_ALL triggers")
+                continue
+            try:
+                request(reason)
+            except Exception as e:
+                logger.error(f"Error sending CLOSE_ALL trigger to {registration.key}: {e}")
+        return snapshot
+
+    def reset_peak(self):
+        """Restart portfolio drawdown tracking from the next poll (e.g. after a deposit)"""
+        with self._lock:
+            self._peak_equity = 0.0
+            self._portfolio_breached = False
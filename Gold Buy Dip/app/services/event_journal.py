@@ -0,0 +1,345 @@
+"""
+Append-only, memory-mapped event journal of strategy signals and state changes.
+
+Setup state transitions (WAITING_FOR_TRIGGER -> WAITING_FOR_ZSCORE ->
+TRADE_EXECUTED), RSI 6 Trades side resets and every ``TradeSignal`` used to be
+visible only as log lines. A strategy with ``journal`` set records them as
+fixed-size binary records in one file per strategy instance:
+
+    header (64 bytes)   magic "EVJL", version, record size, timestamp kind,
+                        created (ns), name, record count at offset 56
+    records (48 bytes)  int64 timestamp      bar time, epoch us (app.utilities.ohlc_arrays)
+                        int64 recorded_ns    wall clock when written
+                        uint8 kind           EVENT_STATE / EVENT_SIGNAL / EVENT_SIDE_RESET
+                        uint8 code           new state, signal action or side
+                        uint8 previous       previous state (EVENT_STATE)
+                        uint8 flags
+                        int16 count          open grid trades / expected side trades
+                        2 bytes padding
+                        float64 price, volume, value
+
+The writer packs a record straight into the mapped file and then bumps the
+count, so a reader never sees a half-written record. Bars without events cost
+the strategy one ``is None`` check and an event about half a microsecond
+(``benchmark()``). The file doubles when full.
+
+``JournalReader`` maps the file as a NumPy structured array: filtering millions
+of events is a vectorised mask, and ``events()`` decodes rows for replay.
+
+    journal = open_strategy_journal(strategy, "journals")
+    ...
+    reader = JournalReader(journal.path)
+    signals = reader.select(kind=EVENT_SIGNAL)
+"""
+
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import re
+import struct
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import TIMESTAMP_NAIVE, datetime_to_us, us_to_datetime
+
+logger = lazy_logger(__name__)
+
+JOURNAL_MAGIC = b"EVJL"
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".evj"
+
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<4sHHBxxxq32s")
+_COUNT = struct.Struct("<Q")
+_COUNT_OFFSET = 56
+_RECORD = struct.Struct("<qqBBBBhxxddd")
+_RECORD_SIZE = _RECORD.size
+
+RECORD_DTYPE = np.dtype({
+    "names": ["timestamp", "recorded_ns", "kind", "code", "previous", "flags", "count", "price", "volume", "value"],
+    "formats": ["<i8", "<i8", "u1", "u1", "u1", "u1", "<i2", "<f8", "<f8", "<f8"],
+    "offsets": [0, 8, 16, 17, 18, 19, 20, 24, 32, 40],
+    "itemsize": _RECORD.size,
+})
+
+EVENT_STATE = 1
+EVENT_SIGNAL = 2
+EVENT_SIDE_RESET = 3
+
+EVENT_NAMES = {EVENT_STATE: "STATE", EVENT_SIGNAL: "SIGNAL", EVENT_SIDE_RESET: "SIDE_RESET"}
+
+# Codes for enum / string values; 0 is "none or unknown"
+STATE_CODES = {"WAITING_FOR_TRIGGER": 1, "WAITING_FOR_ZSCORE": 2, "TRADE_EXECUTED": 3}
+ACTION_CODES = {"BUY": 1, "SELL": 2, "CLOSE_ALL": 3, "CLOSE_BUY": 4, "CLOSE_SELL": 5}
+
+_CODE_NAMES = {
+    EVENT_STATE: {code: name for name, code in STATE_CODES.items()},
+    EVENT_SIGNAL: {code: name for name, code in ACTION_CODES.items()},
+    EVENT_SIDE_RESET: {code: name for name, code in ACTION_CODES.items()},
+}
+
+_NAN = math.nan
+
+
+class JournalError(Exception):
+    """Raised for files that are not event journals"""
+
+
+def _code(table: Dict[str, int], value: Any) -> int:
+    return table.get(getattr(value, "value", value), 0)
+
+
+def _timestamp_us(value: Any) -> int:
+    if value is None:
+        return 0
+    return datetime_to_us(value) if isinstance(value, datetime) else int(value)
+
+
+def _read_header(buffer: Any) -> Dict[str, Any]:
+    if len(buffer) < HEADER_SIZE:
+        raise JournalError("File too short for a journal header")
+    magic, version, record_size, kind, created_ns, name = _HEADER.unpack_from(buffer, 0)
+    if magic != JOURNAL_MAGIC:
+        raise JournalError("Not an event journal")
+    if version != JOURNAL_VERSION or record_size != _RECORD.size:
+        raise JournalError(f"Unsupported journal version {version} / record size {record_size}")
+    (count,) = _COUNT.unpack_from(buffer, _COUNT_OFFSET)
+    return {"timestamp_kind": kind, "created_ns": created_ns, "name": name.rstrip(b"\0").decode(), "count": count}
+
+
+class EventJournal:
+    """
+    Single-writer journal file; reopening an existing file appends to it.
+
+    Not thread-safe: one journal per strategy instance, written from the thread
+    that runs the strategy.
+    """
+
+    def __init__(self, path: str, capacity: int = 65536, name: str = "", timestamp_kind: int = TIMESTAMP_NAIVE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        # Bound once: the hot path is two pack_into calls and a clock read
+        self._pack_record = _RECORD.pack_into
+        self._pack_count = _COUNT.pack_into
+        self._clock_ns = time.time_ns
+        self._file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            size = os.fstat(self._file.fileno()).st_size
+            self._mm = mmap.mmap(self._file.fileno(), size)
+            header = _read_header(self._mm)
+            self.name = header["name"]
+            self.timestamp_kind = header["timestamp_kind"]
+            self._count = header["count"]
+            self._capacity = (size - HEADER_SIZE) // _RECORD.size
+        else:
+            self.name = name
+            self.timestamp_kind = timestamp_kind
+            self._count = 0
+            self._capacity = max(int(capacity), 1)
+            self._file.truncate(HEADER_SIZE + self._capacity * _RECORD.size)
+            self._mm = mmap.mmap(self._file.fileno(), 0)
+            _HEADER.pack_into(self._mm, 0, JOURNAL_MAGIC, JOURNAL_VERSION, _RECORD.size, timestamp_kind,
+                              time.time_ns(), name.encode()[:32])
+            _COUNT.pack_into(self._mm, _COUNT_OFFSET, 0)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "EventJournal":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _grow(self):
+        """Double the record capacity (remaps the file)"""
+        self._capacity *= 2
+        self._mm.flush()
+        self._mm.close()
+        self._file.truncate(HEADER_SIZE + self._capacity * _RECORD.size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def append(self, kind: int, timestamp_us: int = 0, code: int = 0, previous: int = 0, count: int = 0,
+               price: float = _NAN, volume: float = _NAN, value: float = _NAN, flags: int = 0):
+        """Write one raw record (codes already resolved)"""
+        n = self._count
+        if n == self._capacity:
+            self._grow()
+        mm = self._mm
+        self._pack_record(mm, HEADER_SIZE + n * _RECORD_SIZE, timestamp_us, self._clock_ns(), kind, code, previous,
+                          flags, count, price, volume, value)
+        # The record is complete before it is counted
+        n += 1
+        self._count = n
+        self._pack_count(mm, _COUNT_OFFSET, n)
+
+    def record_state(self, timestamp: Any, previous: Any, state: Any, price: float = _NAN, count: int = 0):
+        """A setup state transition (SetupState members or their names)"""
+        self.append(EVENT_STATE, _timestamp_us(timestamp), _code(STATE_CODES, state), _code(STATE_CODES, previous),
+                    count, price)
+
+    def record_signal(self, timestamp: Any, signal: Any, price: float = _NAN, count: int = 0):
+        """A TradeSignal; price is the signal's entry price when it has one"""
+        entry_price = getattr(signal, "entry_price", None)
+        take_profit = getattr(signal, "take_profit", None)
+        self.append(EVENT_SIGNAL, _timestamp_us(timestamp), _code(ACTION_CODES, signal.action), 0, count,
+                    price if entry_price is None else entry_price, signal.lot_size or 0.0,
+                    _NAN if take_profit is None else take_profit)
+
+    def record_side_reset(self, timestamp: Any, side: str, first_price: float = _NAN, count: int = 0):
+        """RSI 6 Trades basket side ("BUY" / "SELL") reset; count is the expected trades before it"""
+        self.append(EVENT_SIDE_RESET, _timestamp_us(timestamp), _code(ACTION_CODES, side), 0, count, first_price)
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        if self._mm.closed:
+            return
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+
+
+def journal_path(directory: str, strategy: Any) -> str:
+    """File for one strategy instance: <strategy_name>_<pair>_<timeframe>.evj"""
+    parts = (getattr(strategy, "strategy_name", type(strategy).__name__), getattr(strategy, "pair", ""),
+             getattr(strategy, "timeframe", ""))
+    name = "_".join(str(part) for part in parts if part)
+    return os.path.join(directory, re.sub(r"[^A-Za-z0-9._-]+", "-", name) + JOURNAL_SUFFIX)
+
+
+def open_strategy_journal(strategy: Any, directory: str, capacity: int = 65536) -> EventJournal:
+    """Open (or continue) the journal of a strategy instance and attach it as ``strategy.journal``"""
+    path = journal_path(directory, strategy)
+    journal = EventJournal(path, capacity, name=os.path.basename(path)[:-len(JOURNAL_SUFFIX)])
+    strategy.journal = journal
+    return journal
+
+
+class JournalEvent(NamedTuple):
+    """One decoded record"""
+    timestamp: Any
+    recorded_ns: int
+    kind: str
+    code: Optional[str]
+    previous: Optional[str]
+    count: int
+    price: float
+    volume: float
+    value: float
+
+
+class JournalReader:
+    """Read-only structured-array view of a journal (safe while the writer appends)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm: Optional[mmap.mmap] = None
+        self.records = np.empty(0, dtype=RECORD_DTYPE)
+        self.refresh()
+
+    def refresh(self) -> int:
+        """Pick up records appended since opening; returns the record count"""
+        size = os.fstat(self._file.fileno()).st_size
+        if self._mm is None or len(self._mm) != size:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+            if self._mm is not None:
+                self._mm.close()
+            self._mm = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        header = _read_header(self._mm)
+        self.name = header["name"]
+        self.timestamp_kind = header["timestamp_kind"]
+        count = min(header["count"], (size - HEADER_SIZE) // _RECORD.size)
+        self.records = np.frombuffer(self._mm, dtype=RECORD_DTYPE, count=count, offset=HEADER_SIZE)
+        return count
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def select(self, kind: Optional[int] = None, code: Optional[Any] = None, start: Any = None,
+               stop: Any = None) -> np.ndarray:
+        """Records of one kind / code within [start, stop) bar time, as a structured array"""
+        records = self.records
+        mask = np.ones(len(records), dtype=bool)
+        if kind is not None:
+            mask &= records["kind"] == kind
+        if code is not None:
+            if not isinstance(code, (int, np.integer)):
+                code = _code(STATE_CODES if kind == EVENT_STATE else ACTION_CODES, code)
+            mask &= records["code"] == code
+        if start is not None:
+            mask &= records["timestamp"] >= _timestamp_us(start)
+        if stop is not None:
+            mask &= records["timestamp"] < _timestamp_us(stop)
+        return records[mask]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of records per event kind"""
+        totals = np.bincount(self.records["kind"], minlength=max(EVENT_NAMES) + 1)
+        return {name: int(totals[kind]) for kind, name in EVENT_NAMES.items()}
+
+    def events(self, records: Optional[np.ndarray] = None) -> Iterator[JournalEvent]:
+        """Decode records (all by default) for replay, oldest first"""
+        records = self.records if records is None else records
+        kind_of_timestamp = self.timestamp_kind
+        for row in records.tolist():
+            timestamp, recorded_ns, kind, code, previous, _, count, price, volume, value = row
+            names = _CODE_NAMES.get(kind, {})
+            yield JournalEvent(
+                us_to_datetime(timestamp, kind_of_timestamp), recorded_ns, EVENT_NAMES.get(kind, str(kind)),
+                names.get(code), names.get(previous) if kind == EVENT_STATE else None, count, price, volume, value,
+            )
+
+    def close(self):
+        self.records = np.empty(0, dtype=RECORD_DTYPE)
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def benchmark(events: int = 1_000_000, directory: Optional[str] = None) -> Dict[str, float]:
+    """Append cost per event and reader scan rate on a scratch journal"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory(dir=directory) as scratch:
+        path = os.path.join(scratch, "bench" + JOURNAL_SUFFIX)
+        journal = EventJournal(path, capacity=1024)
+        append = journal.append
+        started = time.perf_counter()
+        for i in range(events // 2):
+            append(EVENT_SIGNAL, i, 1, 0, 1, 2000.0, 0.1, 2010.0)
+            append(EVENT_SIGNAL, i, 3, 0, 0, 2010.0, 0.0, _NAN)
+        append_seconds = time.perf_counter() - started
+        events = len(journal)
+        journal.close()
+
+        reader = JournalReader(path)
+        started = time.perf_counter()
+        buys = reader.select(kind=EVENT_SIGNAL, code="BUY")
+        volume = float(buys["volume"].sum())
+        scan_seconds = time.perf_counter() - started
+        reader.close()
+    return {
+        "events": events,
+        "append_ns_per_event": append_seconds / events * 1e9,
+        "scan_events_per_second": events / scan_seconds if scan_seconds else math.inf,
+        "selected": len(buys),
+        "selected_volume": volume,
+    }
+
+
+if __name__ == "__main__":
+    for key, value in benchmark().items():
+        print(f"{key}: {value:,.1f}")
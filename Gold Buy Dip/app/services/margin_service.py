@@ -0,0 +1,265 @@
+"""
+Shared margin pre-check with a per-symbol margin-per-lot cache.
+
+Each ``GoldBuyDipStrategy`` used to carry its own ``MT5MarginValidator``, and when
+a grid scales in quickly every check can be a broker round-trip. ``MarginService``
+is shared by all instances and caches the margin required for one lot per
+(symbol, side), as returned by MT5 ``order_calc_margin``. A cached value is
+reused while the price stays within ``price_move_threshold`` of the price it was
+computed at and it is younger than ``max_age_seconds``; it is scaled linearly with
+price in between (margin is proportional to price for FX, metals and CFDs).
+
+Free margin is cached the same way: a reading is reused for ``max_age_seconds``
+(or replaced earlier when the equity monitor pushes the one from its account poll
+through ``set_free_margin``), and approved orders are deducted from it until the
+next reading. With warm caches, "can I add N lots at grid level k" is answered
+locally, and ``validate_batch`` checks every pending signal of a cycle against one
+free margin reading, each approved order consuming margin for the ones after it.
+
+When the calculator cannot answer, the margin is estimated from the symbol's
+contract size; estimates are not cached, so the broker is asked again next time.
+
+Cache keys are upper-cased, but MT5 is always asked with the caller's spelling
+(broker suffixes such as ``XAUUSDm`` are case sensitive). Without the
+MetaTrader5 module (backtests, research) there is no account to check against:
+unless the caller passes ``free_margin`` explicitly, checks are approved with
+``reason`` saying so. With MT5 present, a failed free margin read still rejects.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.services.symbol_registry import SymbolRegistry, symbol_registry
+from app.utilities.lazy_imports import OptionalModule, lazy_logger
+
+logger = lazy_logger(__name__)
+
+_mt5 = OptionalModule("MetaTrader5")
+
+
+@dataclass(frozen=True)
+class MarginRequest:
+    """One pending order to check"""
+    symbol: str
+    side: str  # "BUY" or "SELL"
+    lots: float
+    price: float
+    key: Optional[str] = None  # caller's reference, e.g. strategy key and grid level
+
+
+@dataclass(frozen=True)
+class MarginCheck:
+    """Result of a margin pre-check"""
+    approved: bool
+    required_margin: float
+    free_margin: float
+    margin_per_lot: Optional[float]
+    cached: bool
+    key: Optional[str] = None
+    reason: str = ""
+
+
+@dataclass
+class _CacheEntry:
+    margin_per_lot: float
+    price: float
+    computed_at: float
+
+
+def mt5_margin_per_lot(symbol: str, side: str, price: float) -> Optional[float]:
+    """Margin for 1 lot from MT5 order_calc_margin, or None when MT5 cannot answer"""
+    mt5 = _mt5.get()
+    if mt5 is None:
+        return None
+    order_type = mt5.ORDER_TYPE_BUY if side == "BUY" else mt5.ORDER_TYPE_SELL
+    margin = mt5.order_calc_margin(order_type, symbol, 1.0, price)
+    return float(margin) if margin is not None else None
+
+
+def mt5_free_margin() -> Optional[float]:
+    """Account free margin from MT5 account_info, or None when unavailable"""
+    mt5 = _mt5.get()
+    if mt5 is None:
+        return None
+    info = mt5.account_info()
+    return float(info.margin_free) if info is not None else None
+
+
+class MarginService:
+    """
+    Margin-per-lot cache and pre-check shared by all strategy instances.
+
+    ``calculator(symbol, side, price)`` returns the margin for one lot (default:
+    MT5 order_calc_margin). When it cannot answer, the margin is estimated from
+    the symbol registry as ``contract_size * price / leverage``. ``free_margin()``
+    reads the account free margin (default: MT5 account_info). ``safety_factor``
+    scales the required margin before comparing it with free margin.
+    """
+
+    def __init__(self, calculator: Optional[Callable[[str, str, float], Optional[float]]] = None,
+                 free_margin: Optional[Callable[[], Optional[float]]] = None,
+                 price_move_threshold: float = 0.005, max_age_seconds: float = 60.0,
+                 safety_factor: float = 1.0, leverage: float = 100.0,
+                 registry: Optional[SymbolRegistry] = None):
+        self.calculator = calculator or mt5_margin_per_lot
+        self.free_margin = free_margin or mt5_free_margin
+        self.price_move_threshold = price_move_threshold
+        self.max_age_seconds = max_age_seconds
+        self.safety_factor = safety_factor
+        self.leverage = leverage
+        self.registry = registry or symbol_registry
+        self._cache: Dict[Tuple[str, str], _CacheEntry] = {}
+        self._free_margin: Optional[float] = None
+        self._free_margin_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.estimates = 0
+        self.calculator_errors = 0
+        self.free_margin_reads = 0
+
+    def _estimate(self, symbol: str, price: float) -> float:
+        return self.registry.get(symbol).contract_size * price / self.leverage
+
+    def _fetch(self, symbol: str, side: str, price: float) -> Optional[float]:
+        try:
+            margin = self.calculator(symbol, side, price)
+        except Exception as e:
+            logger.error(f"Error calculating margin for {symbol} {side}: {e}")
+            self.calculator_errors += 1
+            return None
+        return margin if margin is not None and margin > 0 else None
+
+    def margin_per_lot(self, symbol: str, side: str, price: float) -> Tuple[float, bool]:
+        """Margin for 1 lot at ``price`` and whether it came from the cache"""
+        key = (symbol.upper(), side)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if (
+                entry is not None
+                and now - entry.computed_at < self.max_age_seconds
+                and abs(price - entry.price) <= self.price_move_threshold * entry.price
+            ):
+                self.hits += 1
+                return entry.margin_per_lot * price / entry.price, True
+            self.misses += 1
+
+        # Broker call outside the lock so other symbols are not blocked
+        margin = self._fetch(symbol, side, price)
+        if margin is None:
+            self.estimates += 1
+            return self._estimate(symbol, price), False
+        with self._lock:
+            self._cache[key] = _CacheEntry(margin, price, now)
+        return margin, False
+
+    def required_margin(self, symbol: str, side: str, lots: float, price: float) -> float:
+        margin, _ = self.margin_per_lot(symbol, side, price)
+        return margin * lots * self.safety_factor
+
+    def can_add(self, symbol: str, side: str, lots: float, price: float,
+                free_margin: Optional[float] = None, key: Optional[str] = None) -> MarginCheck:
+        """Whether ``lots`` more can be opened; free margin is read from the account if not given"""
+        return self.validate_batch([MarginRequest(symbol, side, lots, price, key)], free_margin)[0]
+
+    def set_free_margin(self, free_margin: float):
+        """Publish a fresh free margin reading, e.g. from the equity monitor's account poll"""
+        with self._lock:
+            self._free_margin = float(free_margin)
+            self._free_margin_at = time.monotonic()
+
+    def current_free_margin(self) -> Optional[float]:
+        """Free margin, read from the account only when the cached reading is older than max_age_seconds"""
+        with self._lock:
+            if self._free_margin is not None and time.monotonic() - self._free_margin_at < self.max_age_seconds:
+                return self._free_margin
+        self.free_margin_reads += 1
+        try:
+            free_margin = self.free_margin()
+        except Exception as e:
+            logger.error(f"Error reading free margin: {e}")
+            return None
+        if free_margin is not None:
+            self.set_free_margin(free_margin)
+        return free_margin
+
+    def _consume_free_margin(self, used: float):
+        """Deduct approved orders from the cached reading until the next one"""
+        with self._lock:
+            if self._free_margin is not None:
+                self._free_margin -= used
+
+    def validate_batch(self, requests: Sequence[MarginRequest], free_margin: Optional[float] = None) -> List[MarginCheck]:
+        """
+        Check all pending orders of a cycle against one free margin reading.
+
+        Orders are checked in the given order; each approved order reduces the
+        free margin left for the following ones. Without an explicit
+        ``free_margin`` the cached reading is used and approved orders are
+        deducted from it.
+        """
+        explicit = free_margin is not None
+        if free_margin is None:
+            free_margin = self.current_free_margin()
+        if free_margin is None and self.free_margin is mt5_free_margin and _mt5.get() is None:
+            return [
+                MarginCheck(True, 0.0, 0.0, None, False, request.key, "MetaTrader5 unavailable; margin not checked")
+                for request in requests
+            ]
+        if free_margin is None:
+            logger.warning("Free margin unavailable; rejecting margin checks")
+            return [
+                MarginCheck(False, 0.0, 0.0, None, False, request.key, "Free margin unavailable")
+                for request in requests
+            ]
+
+        remaining = free_margin
+        results = []
+        for request in requests:
+            per_lot, cached = self.margin_per_lot(request.symbol, request.side, request.price)
+            required = per_lot * request.lots * self.safety_factor
+            approved = required <= remaining
+            reason = "" if approved else f"Required margin {required:.2f} exceeds free margin {remaining:.2f}"
+            results.append(MarginCheck(approved, required, remaining, per_lot, cached, request.key, reason))
+            if approved:
+                remaining -= required
+        if not explicit and remaining < free_margin:
+            self._consume_free_margin(free_margin - remaining)
+        return results
+
+    def warm(self, symbols: Sequence[Tuple[str, float]]):
+        """Pre-fill the cache for (symbol, price) pairs on both sides, e.g. at startup"""
+        for symbol, price in symbols:
+            for side in ("BUY", "SELL"):
+                self.margin_per_lot(symbol, side, price)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Drop cached values for one symbol, or all of them and the free margin reading (e.g. after a leverage change)"""
+        with self._lock:
+            if symbol is None:
+                self._cache.clear()
+                self._free_margin = None
+            else:
+                for key in [key for key in self._cache if key[0] == symbol.upper()]:
+                    del self._cache[key]
+
+    def stats(self) -> Dict[str, float]:
+        """Cache counters for status endpoints"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "estimates": self.estimates,
+            "calculator_errors": self.calculator_errors,
+            "free_margin_reads": self.free_margin_reads,
+            "cached_symbols": len(self._cache),
+        }
+
+
+margin_service = MarginService()
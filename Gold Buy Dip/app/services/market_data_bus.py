@@ -0,0 +1,399 @@
+"""
+Shared-memory market data bus for running strategies across processes.
+
+One process (the publisher) writes every closed bar into a ring buffer per
+symbol/timeframe inside a single ``multiprocessing.shared_memory`` block. Worker
+processes attach to the block once and read bars in place; candles are never
+pickled per worker. ``ShardSupervisor`` spreads strategy instances over worker
+processes, wakes them with tiny "ring updated" messages and collects the signals
+they produce on one result queue.
+
+Ring layout (all little-endian, one ring after another in the block):
+
+    int64 seq                      number of bars ever written to the ring
+    int64 timestamp[capacity]      epoch microseconds (see app.utilities.ohlc_arrays)
+    float64 open/high/low/close[capacity]
+
+Each ring has a single writer. The bar is written before ``seq`` is bumped, so a
+reader that sees ``seq`` sees the complete bar. A reader that falls more than
+``capacity`` bars behind skips the overwritten bars and logs it.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import queue
+import uuid
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.catch_up import CatchUpRunner
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import OHLC_FIELDS, TIMESTAMP_NAIVE, candles_to_arrays, datetime_to_us, us_to_datetime
+
+if TYPE_CHECKING:
+    from app.services.data_quality import DataQualityFilter
+
+logger = lazy_logger(__name__)
+
+RingKey = Tuple[str, str]  # (symbol, timeframe)
+
+_HEADER_BYTES = 8
+_COLUMN_COUNT = 1 + len(OHLC_FIELDS)
+
+
+@dataclass(frozen=True)
+class BusLayout:
+    """Everything a process needs to attach to a bus; small and picklable"""
+    shm_name: str
+    keys: Tuple[RingKey, ...]
+    capacity: int
+    timestamp_kind: int = TIMESTAMP_NAIVE
+
+    @property
+    def ring_bytes(self) -> int:
+        return _HEADER_BYTES + _COLUMN_COUNT * 8 * self.capacity
+
+    @property
+    def total_bytes(self) -> int:
+        return self.ring_bytes * len(self.keys)
+
+    def index(self, symbol: str, timeframe: str) -> int:
+        return self.keys.index((symbol, timeframe))
+
+
+class _Ring:
+    """NumPy views over one ring inside the shared block"""
+
+    def __init__(self, buf: memoryview, offset: int, capacity: int):
+        self.capacity = capacity
+        self.seq = np.ndarray((1,), dtype="<i8", buffer=buf, offset=offset)
+        offset += _HEADER_BYTES
+        self.timestamp = np.ndarray((capacity,), dtype="<i8", buffer=buf, offset=offset)
+        offset += 8 * capacity
+        self.columns = {}
+        for name in OHLC_FIELDS:
+            self.columns[name] = np.ndarray((capacity,), dtype="<f8", buffer=buf, offset=offset)
+            offset += 8 * capacity
+
+
+class _BusView:
+    def __init__(self, layout: BusLayout, shm: shared_memory.SharedMemory):
+        self.layout = layout
+        self._shm = shm
+        self.rings = [_Ring(shm.buf, i * layout.ring_bytes, layout.capacity) for i in range(len(layout.keys))]
+
+    def seq(self, ring: int) -> int:
+        return int(self.rings[ring].seq[0])
+
+    def close(self):
+        self.rings = []
+        self._shm.close()
+
+
+class MarketDataBus(_BusView):
+    """
+    Publisher side: owns the shared block and writes closed bars.
+
+    With a ``quality_filter`` (app.services.data_quality) every published bar or
+    block is validated per ring first; rejected bars never reach the workers.
+    """
+
+    def __init__(self, keys: Sequence[RingKey], capacity: int = 2048, timestamp_kind: int = TIMESTAMP_NAIVE,
+                 name: Optional[str] = None, quality_filter: Optional["DataQualityFilter"] = None):
+        keys = tuple((str(symbol), str(timeframe)) for symbol, timeframe in keys)
+        if len(set(keys)) != len(keys):
+            raise ValueError("Duplicate symbol/timeframe keys")
+        name = name or f"mdbus_{uuid.uuid4().hex[:12]}"
+        layout = BusLayout(name, keys, capacity, timestamp_kind)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(layout.total_bytes, 1))
+        super().__init__(layout, shm)
+        self._index = {key: i for i, key in enumerate(keys)}
+        self.quality_filter = quality_filter
+        for ring in self.rings:
+            ring.seq[0] = 0
+
+    def publish(self, symbol: str, timeframe: str, candle: Any) -> int:
+        """Append one closed bar; returns the ring index (for ShardSupervisor.notify)"""
+        if self.quality_filter is not None:
+            return self.publish_arrays(symbol, timeframe, candles_to_arrays([candle]))
+        ring_idx = self._index[(symbol, timeframe)]
+        ring = self.rings[ring_idx]
+        seq = int(ring.seq[0])
+        pos = seq % ring.capacity
+
+        ts = candle.timestamp
+        ring.timestamp[pos] = datetime_to_us(ts) if hasattr(ts, "tzinfo") else int(ts)
+        ring.columns["open"][pos] = candle.open
+        ring.columns["high"][pos] = candle.high
+        ring.columns["low"][pos] = candle.low
+        ring.columns["close"][pos] = candle.close
+        # Publish the bar only after it is fully written
+        ring.seq[0] = seq + 1
+        return ring_idx
+
+    def publish_arrays(self, symbol: str, timeframe: str, arrays: Dict[str, Any]) -> int:
+        """Append a block of bars given as columns (see app.utilities.ohlc_arrays)"""
+        ring_idx = self._index[(symbol, timeframe)]
+        if self.quality_filter is not None:
+            arrays = self.quality_filter.filter_arrays((symbol, timeframe), arrays)
+        ring = self.rings[ring_idx]
+        total = len(arrays["timestamp"])
+        # Only the newest `capacity` bars can survive; older ones are counted but not written
+        timestamps = np.asarray(arrays["timestamp"], dtype=np.int64)[-ring.capacity:]
+        n = len(timestamps)
+        seq = int(ring.seq[0])
+        positions = (seq + total - n + np.arange(n)) % ring.capacity
+        ring.timestamp[positions] = timestamps
+        for name in OHLC_FIELDS:
+            ring.columns[name][positions] = np.asarray(arrays[name], dtype=np.float64)[-ring.capacity:]
+        ring.seq[0] = seq + total
+        return ring_idx
+
+    def unlink(self):
+        """Close and free the shared block (publisher only)"""
+        shm = self._shm
+        self.close()
+        shm.unlink()
+
+
+class BusReader(_BusView):
+    """Worker side: attaches to a bus and reads bars in place"""
+
+    def __init__(self, layout: BusLayout):
+        # Workers started by ShardSupervisor share the publisher's resource tracker,
+        # so attaching here does not make the block disappear when a worker exits
+        super().__init__(layout, shared_memory.SharedMemory(name=layout.shm_name))
+
+    def arrays(self, ring: int, start: Optional[int] = None, stop: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Columns for bars [start, stop) by sequence number, oldest first.
+
+        Defaults to everything still in the ring. Contiguous ranges are zero-copy
+        views; ranges that wrap around the ring end are copied.
+        """
+        r = self.rings[ring]
+        seq = self.seq(ring)
+        stop = seq if stop is None else min(stop, seq)
+        oldest = max(0, seq - r.capacity)
+        start = oldest if start is None else max(start, oldest)
+        count = max(0, stop - start)
+        first = start % r.capacity
+
+        if first + count <= r.capacity:
+            index: Any = slice(first, first + count)
+        else:
+            index = np.r_[first:r.capacity, 0:first + count - r.capacity]
+        result = {"timestamp": r.timestamp[index], "timestamp_kind": self.layout.timestamp_kind}
+        for name in OHLC_FIELDS:
+            result[name] = r.columns[name][index]
+        return result
+
+    def candles(self, ring: int, start: int, stop: int, candle_cls: Any) -> Iterator[Any]:
+        """Materialise bars [start, stop) as candle_cls objects, skipping overwritten ones"""
+        r = self.rings[ring]
+        oldest = max(0, self.seq(ring) - r.capacity)
+        if start < oldest:
+            logger.warning(f"Reader fell behind on {self.layout.keys[ring]}: skipped {oldest - start} bars")
+            start = oldest
+        kind = self.layout.timestamp_kind
+        for seq in range(start, stop):
+            pos = seq % r.capacity
+            yield candle_cls(
+                timestamp=us_to_datetime(int(r.timestamp[pos]), kind),
+                open=float(r.columns["open"][pos]),
+                high=float(r.columns["high"][pos]),
+                low=float(r.columns["low"][pos]),
+                close=float(r.columns["close"][pos]),
+            )
+
+
+@dataclass
+class StrategySpec:
+    """
+    How a worker builds one strategy instance.
+
+    ``factory`` must be picklable by reference (a class or module-level function,
+    e.g. GoldBuyDipStrategy); it is called as ``factory(*args, **kwargs)`` inside the
+    worker. ``process_kwargs`` are passed to every ``_process_market_data`` call.
+    With ``max_backlog`` set, more than that many bars queued for the strategy are
+    coalesced: the stale ones are fast-forwarded and only the newest is evaluated
+    (app.services.catch_up).
+    """
+    key: str
+    symbol: str
+    timeframe: str
+    factory: Callable[..., Any]
+    args: tuple = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    process_kwargs: Dict[str, Any] = field(default_factory=dict)
+    warm_up: bool = True
+    max_backlog: Optional[int] = None
+
+
+@dataclass
+class WorkerSignal:
+    """A signal (or error, or catch-up report) coming back from a worker"""
+    strategy_key: str
+    symbol: str
+    timeframe: str
+    timestamp: Any
+    signal: Any = None
+    error: Optional[str] = None
+    coalesced: int = 0  # bars fast-forwarded without evaluation (report only, signal is None)
+
+
+def _worker_main(layout: BusLayout, specs: List[StrategySpec], control: Any, results: Any,
+                 candle_cls: Any):
+    """Worker process loop: wait for ring updates, feed new bars to the shard's strategies"""
+    reader = BusReader(layout)
+    runners: Dict[str, CatchUpRunner] = {}
+    by_ring: Dict[int, List[StrategySpec]] = {}
+    cursors: Dict[int, int] = {}
+
+    for spec in specs:
+        ring = layout.index(spec.symbol, spec.timeframe)
+        try:
+            strategy = spec.factory(*spec.args, **spec.kwargs)
+            if spec.warm_up and hasattr(strategy, "warm_up") and reader.seq(ring):
+                # Seed buffers from the ring in one call instead of replaying history
+                strategy.warm_up(reader.arrays(ring))
+        except Exception as e:
+            results.put(WorkerSignal(spec.key, spec.symbol, spec.timeframe, None, error=f"init failed: {e!r}"))
+            continue
+        runners[spec.key] = CatchUpRunner(strategy, spec.max_backlog, spec.process_kwargs, spec.key)
+        by_ring.setdefault(ring, []).append(spec)
+        cursors.setdefault(ring, reader.seq(ring))
+
+    try:
+        while True:
+            message = control.get()
+            if message is None:
+                break
+            rings = by_ring.keys() if message == "all" else [r for r in message if r in by_ring]
+            for ring in rings:
+                stop = reader.seq(ring)
+                candles = list(reader.candles(ring, cursors[ring], stop, candle_cls))
+                cursors[ring] = stop
+                if not candles:
+                    continue
+                for spec in by_ring[ring]:
+                    runner = runners[spec.key]
+                    coalesced = runner.stats.coalesced
+
+                    def on_error(candle: Any, error: Exception, spec: StrategySpec = spec):
+                        results.put(WorkerSignal(spec.key, spec.symbol, spec.timeframe, candle.timestamp,
+                                                 error=repr(error)))
+
+                    for candle, signal in runner.process(candles, on_error):
+                        results.put(WorkerSignal(spec.key, spec.symbol, spec.timeframe, candle.timestamp, signal))
+                    if runner.stats.coalesced > coalesced:
+                        results.put(WorkerSignal(spec.key, spec.symbol, spec.timeframe, candles[-1].timestamp,
+                                                 coalesced=runner.stats.coalesced - coalesced))
+    finally:
+        reader.close()
+
+
+class ShardSupervisor:
+    """
+    Runs strategy instances in ``n_workers`` processes fed from a MarketDataBus.
+
+    Strategies on the same symbol/timeframe are kept in the same shard where
+    possible so each bar is read once per worker.
+    """
+
+    def __init__(self, layout: BusLayout, specs: Sequence[StrategySpec], n_workers: Optional[int] = None,
+                 candle_cls: Any = None, start_method: str = "spawn"):
+        keys = [spec.key for spec in specs]
+        if len(set(keys)) != len(keys):
+            raise ValueError("Strategy keys must be unique")
+        self.layout = layout
+        self.specs = list(specs)
+        self.n_workers = max(1, min(n_workers or mp.cpu_count(), len(self.specs) or 1))
+        self.candle_cls = candle_cls
+        self._ctx = mp.get_context(start_method)
+        self.results = self._ctx.Queue()
+        self.coalesced: Dict[str, int] = {}  # bars coalesced per strategy key (from catch-up reports)
+        self._controls: List[Any] = []
+        self._workers: List[Any] = []
+        self._rings_of_worker: List[set] = []
+        self.shards = self._assign_shards()
+
+    def _assign_shards(self) -> List[List[StrategySpec]]:
+        """Group specs by ring, then place groups on the least loaded worker"""
+        groups: Dict[RingKey, List[StrategySpec]] = {}
+        for spec in self.specs:
+            groups.setdefault((spec.symbol, spec.timeframe), []).append(spec)
+
+        shards: List[List[StrategySpec]] = [[] for _ in range(self.n_workers)]
+        for _, group in sorted(groups.items(), key=lambda item: -len(item[1])):
+            if len(group) > len(self.specs) / self.n_workers:
+                # Very large group: split it rather than overload one worker
+                for spec in group:
+                    min(shards, key=len).append(spec)
+            else:
+                min(shards, key=len).extend(group)
+        return [shard for shard in shards if shard]
+
+    def start(self):
+        candle_cls = self.candle_cls
+        if candle_cls is None:
+            from app.models.trading_models import MarketData
+            candle_cls = MarketData
+
+        for i, shard in enumerate(self.shards):
+            control = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=_worker_main, args=(self.layout, shard, control, self.results, candle_cls),
+                name=f"strategy-shard-{i}", daemon=True,
+            )
+            process.start()
+            self._controls.append(control)
+            self._workers.append(process)
+            self._rings_of_worker.append({self.layout.index(s.symbol, s.timeframe) for s in shard})
+        logger.info(f"Started {len(self._workers)} strategy shards for {len(self.specs)} strategies")
+
+    def notify(self, rings: Optional[Sequence[int]] = None):
+        """Wake the workers that run strategies on the given rings (all when None)"""
+        for control, own in zip(self._controls, self._rings_of_worker):
+            if rings is None:
+                control.put("all")
+            else:
+                touched = [r for r in rings if r in own]
+                if touched:
+                    control.put(touched)
+
+    def drain(self, timeout: float = 0.0, expected: Optional[int] = None) -> List[WorkerSignal]:
+        """
+        Collect signals from the result queue.
+
+        Returns what is available now, waiting up to ``timeout`` seconds for the
+        first item (or, with ``expected``, until that many items arrived).
+        """
+        items: List[WorkerSignal] = []
+        block = timeout > 0
+        while expected is None or len(items) < expected:
+            try:
+                item = self.results.get(block=block, timeout=timeout if block else None)
+            except queue.Empty:
+                break
+            if item.coalesced:
+                self.coalesced[item.strategy_key] = self.coalesced.get(item.strategy_key, 0) + item.coalesced
+            items.append(item)
+            if expected is None:
+                block = False
+        return items
+
+    def stop(self, timeout: float = 5.0):
+        for control in self._controls:
+            control.put(None)
+        for process in self._workers:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._controls.clear()
+        self._workers.clear()
+        self._rings_of_worker.clear()
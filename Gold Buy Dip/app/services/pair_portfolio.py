@@ -0,0 +1,219 @@
+"""
+Vectorised exit evaluation for a book of open pair trades.
+
+``RSIPairsStrategy.check_exit_conditions`` prices one pair trade at a time through
+two scalar ``calculate_pnl_usd`` calls. ``PairTradeBook`` keeps every open leg in
+NumPy columns (entry price, lots, direction, pip size, pip value) and, on each
+price update, computes all trades' USD P&L and their PROFIT_TARGET / STOP_LOSS /
+TIME_LIMIT status in one pass, returning only the trades that must close.
+
+P&L uses the same formula and operation order as ``calculate_pnl_usd``
+(pips = price move / pip size, times pip value for the leg's lots), so results
+match the scalar path exactly.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.indicators.spread import LEG_DIRECTIONS
+from app.services.symbol_registry import SymbolRegistry, symbol_registry
+from app.utilities.clock import Clock, system_clock
+from app.utilities.ohlc_arrays import datetime_to_us
+
+EXIT_NONE = 0
+EXIT_PROFIT_TARGET = 1
+EXIT_STOP_LOSS = 2
+EXIT_TIME_LIMIT = 3
+
+EXIT_REASONS = {
+    EXIT_PROFIT_TARGET: "PROFIT_TARGET",
+    EXIT_STOP_LOSS: "STOP_LOSS",
+    EXIT_TIME_LIMIT: "TIME_LIMIT",
+}
+
+
+class PairTradeBook:
+    """
+    Open pair trades stored column-wise.
+
+    Rows are trades, columns 0/1 are leg 1 / leg 2. Closed rows are recycled, and
+    the arrays double in size when the book is full.
+    """
+
+    def __init__(self, profit_target_usd: float, stop_loss_usd: float, max_trade_hours: float,
+                 capacity: int = 64, registry: Optional[SymbolRegistry] = None, clock: Optional[Clock] = None):
+        self.profit_target_usd = profit_target_usd
+        self.stop_loss_usd = stop_loss_usd
+        self.max_trade_hours = max_trade_hours
+        self.registry = registry or symbol_registry
+        self.clock = clock or system_clock
+
+        self._symbols: List[str] = []
+        self._symbol_index: Dict[str, int] = {}
+        self._row_of: Dict[Hashable, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self.trade_ids = np.empty(capacity, dtype=object)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.symbol_idx = np.zeros((capacity, 2), dtype=np.int64)
+        self.entry_price = np.zeros((capacity, 2), dtype=np.float64)
+        self.lots = np.zeros((capacity, 2), dtype=np.float64)
+        self.direction = np.zeros((capacity, 2), dtype=np.float64)  # +1 long, -1 short per leg
+        self.pip_size = np.ones((capacity, 2), dtype=np.float64)
+        self.pip_value = np.zeros((capacity, 2), dtype=np.float64)  # USD per pip for the leg's lots
+        self.entry_time_us = np.zeros(capacity, dtype=np.int64)
+        self.profit_target = np.zeros(capacity, dtype=np.float64)
+        self.stop_loss = np.zeros(capacity, dtype=np.float64)
+        self.max_hours = np.zeros(capacity, dtype=np.float64)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in (
+            "trade_ids", "active", "symbol_idx", "entry_price", "lots", "direction", "pip_size",
+            "pip_value", "entry_time_us", "profit_target", "stop_loss", "max_hours",
+        )}
+        size = len(self.active)
+        self._allocate(size * 2)
+        for name, values in old.items():
+            getattr(self, name)[:size] = values
+
+    def _symbol(self, symbol: str) -> int:
+        idx = self._symbol_index.get(symbol)
+        if idx is None:
+            idx = len(self._symbols)
+            self._symbols.append(symbol)
+            self._symbol_index[symbol] = idx
+        return idx
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def __contains__(self, trade_id: Hashable) -> bool:
+        return trade_id in self._row_of
+
+    def open_trade(self, trade_id: Hashable, symbol1: str, symbol2: str, trade_direction: str,
+                   lot_size_s1: float, lot_size_s2: float, entry_price_s1: float, entry_price_s2: float,
+                   entry_time: datetime, profit_target_usd: Optional[float] = None,
+                   stop_loss_usd: Optional[float] = None, max_trade_hours: Optional[float] = None):
+        """
+        Add a pair trade.
+
+        trade_direction is an RSIPairsStrategy trade type: 'long'/'short' (both legs
+        the same way) or 'long_spread'/'short_spread' (opposite legs).
+        """
+        if trade_id in self._row_of:
+            raise ValueError(f"Trade {trade_id!r} is already open")
+        if trade_direction not in LEG_DIRECTIONS:
+            raise ValueError(f"Unknown trade direction: {trade_direction}")
+
+        free = np.flatnonzero(~self.active)
+        if len(free) == 0:
+            self._grow()
+            free = np.flatnonzero(~self.active)
+        row = int(free[0])
+
+        spec1 = self.registry.get(symbol1)
+        spec2 = self.registry.get(symbol2)
+        self.trade_ids[row] = trade_id
+        self.active[row] = True
+        self.symbol_idx[row] = (self._symbol(symbol1), self._symbol(symbol2))
+        self.entry_price[row] = (entry_price_s1, entry_price_s2)
+        self.lots[row] = (lot_size_s1, lot_size_s2)
+        self.direction[row] = [1.0 if leg == "long" else -1.0 for leg in LEG_DIRECTIONS[trade_direction]]
+        self.pip_size[row] = (spec1.pip_size, spec2.pip_size)
+        self.pip_value[row] = (spec1.pip_value * lot_size_s1, spec2.pip_value * lot_size_s2)
+        self.entry_time_us[row] = datetime_to_us(entry_time)
+        self.profit_target[row] = self.profit_target_usd if profit_target_usd is None else profit_target_usd
+        self.stop_loss[row] = self.stop_loss_usd if stop_loss_usd is None else stop_loss_usd
+        self.max_hours[row] = self.max_trade_hours if max_trade_hours is None else max_trade_hours
+        self._row_of[trade_id] = row
+
+    def open_from_strategy(self, strategy: Any, trade_id: Optional[Hashable] = None) -> Hashable:
+        """Add the open trade of an RSIPairsStrategy, using its config thresholds"""
+        state = strategy.state
+        if not state.in_trade or not state.entry_time:
+            raise ValueError("Strategy has no open trade")
+        trade_id = trade_id if trade_id is not None else f"{strategy.symbol1}/{strategy.symbol2}@{state.entry_time.isoformat()}"
+        self.open_trade(
+            trade_id, strategy.symbol1, strategy.symbol2, state.trade_direction,
+            state.lot_size_s1, state.lot_size_s2, state.entry_price_s1, state.entry_price_s2,
+            state.entry_time,
+            profit_target_usd=strategy.config.profit_target_usd,
+            stop_loss_usd=strategy.config.stop_loss_usd,
+            max_trade_hours=strategy.config.max_trade_hours,
+        )
+        return trade_id
+
+    def close_trade(self, trade_id: Hashable) -> bool:
+        """Remove a trade from the book; returns False if it was not open"""
+        row = self._row_of.pop(trade_id, None)
+        if row is None:
+            return False
+        self.active[row] = False
+        self.trade_ids[row] = None
+        return True
+
+    def refresh_pip_values(self):
+        """Re-read pip values from the registry after a tick value refresh"""
+        for trade_id, row in self._row_of.items():
+            for leg in (0, 1):
+                spec = self.registry.get(self._symbols[self.symbol_idx[row, leg]])
+                self.pip_size[row, leg] = spec.pip_size
+                self.pip_value[row, leg] = spec.pip_value * self.lots[row, leg]
+
+    def mark_to_market(self, prices: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        USD P&L of every open trade at the given prices.
+
+        Returns ``(rows, leg_pnl)`` where leg_pnl has shape (len(rows), 2). Symbols
+        missing from ``prices`` keep their entry price (zero P&L for that leg).
+        """
+        rows = np.flatnonzero(self.active)
+        price_table = np.full(len(self._symbols), np.nan)
+        for symbol, idx in self._symbol_index.items():
+            price = prices.get(symbol)
+            if price is not None:
+                price_table[idx] = price
+
+        entry = self.entry_price[rows]
+        current = price_table[self.symbol_idx[rows]]
+        current = np.where(np.isnan(current), entry, current)
+
+        # Same order of operations as calculate_pnl_usd: pips first, then pip value
+        move = (current - entry) * self.direction[rows]
+        pips = move / self.pip_size[rows]
+        return rows, pips * self.pip_value[rows]
+
+    def evaluate(self, prices: Dict[str, float], now: Optional[datetime] = None) -> List[Tuple[Hashable, str, float, float, float]]:
+        """
+        Trades that hit an exit this update, as ``(trade_id, reason, total_pnl, s1_pnl, s2_pnl)``.
+
+        Reasons are checked in the same priority as check_exit_conditions: profit
+        target, then stop loss, then time limit. The book is not modified; call
+        close_trade for the trades you actually close.
+        """
+        if not self._row_of:
+            return []
+
+        rows, leg_pnl = self.mark_to_market(prices)
+        total = leg_pnl[:, 0] + leg_pnl[:, 1]
+
+        now_us = datetime_to_us(now or self.clock.now())
+        # timedelta.total_seconds() / 3600, as in check_exit_conditions
+        hours = (now_us - self.entry_time_us[rows]) / 1e6 / 3600
+        status = np.select(
+            [total >= self.profit_target[rows], total <= self.stop_loss[rows], hours >= self.max_hours[rows]],
+            [EXIT_PROFIT_TARGET, EXIT_STOP_LOSS, EXIT_TIME_LIMIT],
+            default=EXIT_NONE,
+        )
+
+        hits = np.flatnonzero(status != EXIT_NONE)
+        return [
+            (self.trade_ids[rows[i]], EXIT_REASONS[int(status[i])],
+             float(total[i]), float(leg_pnl[i, 0]), float(leg_pnl[i, 1]))
+            for i in hits
+        ]
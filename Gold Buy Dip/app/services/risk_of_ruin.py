@@ -0,0 +1,420 @@
+"""
+Monte-Carlo risk of ruin for the martingale / grid baskets.
+
+RSI 6 Trades scales a basket by ``martingale_multiplier`` up to ``max_trades`` and
+Gold Buy Dip scales its grid by ``lot_progression_factor`` (or
+``grid_lot_multiplier``) up to ``max_grid_trades``. A single historical backtest
+shows one path of what that does to an account; this module shows the
+distribution.
+
+``ResampledMarket`` builds synthetic bars by block bootstrap of historical bars
+(close-to-close log return plus the bar's high / low relative to its close, so
+intra-bar ranges and short-range autocorrelation are kept). Paths are generated
+bar by bar alongside the simulation, so memory is O(paths), not O(paths x bars).
+
+The basket state machines run over all paths at once:
+
+- ``GoldGridSim`` drives ``GoldBuyDipUniverse`` (app.services.cross_sectional)
+  with one row per path, i.e. the production Gold Buy Dip bar rules
+- ``RSI6BasketSim`` is a vectorised copy of RSI6TradesStrategy's bar logic
+  (exits, zone permissions, first entries, martingale scaling, in that order and
+  one action per bar), using Wilder RSI / ATR updated incrementally per path and
+  a single timeframe for the LTF and HTF RSI
+
+``simulate`` tracks every path's equity (balance plus floating P&L, P&L in the
+quote currency), basket exposure and drawdown, and stops a path once equity falls
+to the ruin level. ``compare_configs`` runs several configs on the same
+resampled bars (common random numbers) so their differences are not noise.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.cross_sectional import GoldBuyDipUniverse
+from app.services.symbol_registry import SymbolRegistry, symbol_registry
+from app.utilities.lazy_imports import lazy_logger
+
+logger = lazy_logger(__name__)
+
+
+def _config_value(config: Any, name: str, default: Any = None) -> Any:
+    """Attribute of a config object, or key of a dict config (RSI6 takes dicts)"""
+    if isinstance(config, dict):
+        return config.get(name, default)
+    return getattr(config, name, default)
+
+
+class ResampledMarket:
+    """
+    Block-bootstrapped bars for ``n_paths`` paths.
+
+    ``highs``/``lows``/``closes`` are the historical bars. Every ``block_size``
+    bars each path jumps to an independent random position in the history
+    (``block_size=1`` is a plain i.i.d. bootstrap). All paths start from
+    ``start_price`` (default: the last historical close).
+    """
+
+    def __init__(self, highs: Sequence[float], lows: Sequence[float], closes: Sequence[float],
+                 n_paths: int = 10000, block_size: int = 24, start_price: Optional[float] = None,
+                 seed: Optional[int] = None):
+        closes = np.asarray(closes, dtype=np.float64)
+        if len(closes) < block_size + 1:
+            raise ValueError("Need more history than one block")
+        self.log_returns = np.diff(np.log(closes))
+        self.log_high = np.log(np.asarray(highs, dtype=np.float64)[1:] / closes[1:])
+        self.log_low = np.log(np.asarray(lows, dtype=np.float64)[1:] / closes[1:])
+        self.n_paths = n_paths
+        self.block_size = block_size
+        self.start_price = float(closes[-1]) if start_price is None else start_price
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        """Restart all paths (same seed -> same bars)"""
+        self.rng = np.random.default_rng(self.seed)
+        self.log_close = np.full(self.n_paths, np.log(self.start_price))
+        self.position = np.zeros(self.n_paths, dtype=np.int64)
+        self.bar = 0
+
+    def step(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Next (high, low, close) vector for every path"""
+        size = len(self.log_returns)
+        if self.bar % self.block_size == 0:
+            self.position = self.rng.integers(0, size - self.block_size + 1, self.n_paths)
+        idx = self.position
+        self.log_close += self.log_returns[idx]
+        close = np.exp(self.log_close)
+        high = close * np.exp(self.log_high[idx])
+        low = close * np.exp(self.log_low[idx])
+        self.position = idx + 1
+        self.bar += 1
+        return high, low, close
+
+
+class WilderRSI:
+    """Per-path Wilder RSI updated one bar at a time (kernels.calculate_rsi_series)"""
+
+    def __init__(self, n_paths: int, period: int):
+        self.period = period
+        self.bars = 0
+        self.prev_close = np.zeros(n_paths)
+        self.avg_gain = np.zeros(n_paths)
+        self.avg_loss = np.zeros(n_paths)
+        self.value = np.full(n_paths, np.nan)
+
+    def update(self, close: np.ndarray) -> np.ndarray:
+        if self.bars > 0:
+            change = close - self.prev_close
+            gain = np.maximum(change, 0.0)
+            loss = np.maximum(-change, 0.0)
+            if self.bars <= self.period:
+                self.avg_gain += gain / self.period
+                self.avg_loss += loss / self.period
+            else:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+            if self.bars >= self.period:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    rsi = 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+                rsi = np.where(self.avg_loss == 0, 100.0, rsi)
+                rsi = np.where(self.avg_gain == 0, 0.0, rsi)
+                self.value = np.where((self.avg_gain == 0) & (self.avg_loss == 0), 50.0, rsi)
+        self.prev_close = close
+        self.bars += 1
+        return self.value
+
+
+class WilderATR:
+    """Per-path Wilder ATR updated one bar at a time (kernels.calculate_atr_series)"""
+
+    def __init__(self, n_paths: int, period: int):
+        self.period = period
+        self.bars = 0
+        self.prev_close = np.zeros(n_paths)
+        self.value = np.zeros(n_paths)
+
+    def update(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        if self.bars > 0:
+            true_range = np.maximum(high - low, np.maximum(np.abs(high - self.prev_close), np.abs(low - self.prev_close)))
+            if self.bars <= self.period:
+                self.value = self.value + true_range / self.period
+            else:
+                self.value = (self.value * (self.period - 1) + true_range) / self.period
+        self.prev_close = close
+        self.bars += 1
+        return self.value if self.bars > self.period else np.zeros_like(close)
+
+
+class RSI6BasketSim:
+    """
+    RSI6TradesStrategy's buy and sell baskets for every path.
+
+    Side arrays have shape (2, n_paths): row 0 is the BUY basket, row 1 the SELL
+    basket. RSI and ATR values are those of the last closed bar, as with
+    ``wait_for_candle_close``.
+    """
+
+    BUY, SELL = 0, 1
+    _DIRECTION = np.array([[1.0], [-1.0]])
+
+    def __init__(self, config: Any, n_paths: int):
+        self.config = config
+        self.rsi_period = _config_value(config, "rsi_period", 14)
+        self.overbought = _config_value(config, "rsi_overbought", 70)
+        self.oversold = _config_value(config, "rsi_oversold", 30)
+        self.initial_lot = _config_value(config, "initial_lot", 0.1)
+        self.multiplier = _config_value(config, "martingale_multiplier", 2.0)
+        self.max_trades = _config_value(config, "max_trades", 10)
+        self.allow_both = _config_value(config, "allow_both_directions", True)
+        atr_grid_period = _config_value(config, "atr_grid_period", 10)
+        atr_tp_period = _config_value(config, "atr_tp_period", 10)
+        self.min_bars = max(self.rsi_period, atr_grid_period, atr_tp_period) + 10
+
+        self.rsi = WilderRSI(n_paths, self.rsi_period)
+        self.atr_grid = WilderATR(n_paths, atr_grid_period)
+        self.atr_tp = WilderATR(n_paths, atr_tp_period)
+        self._prev = (np.full(n_paths, np.nan), np.zeros(n_paths), np.zeros(n_paths))
+        self.bars = 0
+
+        shape = (2, n_paths)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.next_index = np.ones(shape, dtype=np.int64)
+        self.zone_used = np.zeros(shape, dtype=bool)
+        self.first_price = np.zeros(shape)
+        self.grid_step = np.zeros(shape)
+        self.tp_distance = np.zeros(shape)
+        self.last_price = np.zeros(shape)
+        self.last_lot = np.zeros(shape)
+        self.lots = np.zeros(shape)
+        self.price_lots = np.zeros(shape)
+
+    def exposure(self) -> np.ndarray:
+        return self.lots.sum(axis=0)
+
+    def floating(self, close: np.ndarray) -> np.ndarray:
+        """Open P&L in price units x lots (multiply by contract size for money)"""
+        return ((close * self.lots - self.price_lots) * self._DIRECTION).sum(axis=0)
+
+    def _close(self, side: int, rows: np.ndarray, close: np.ndarray) -> np.ndarray:
+        pnl = (close[rows] * self.lots[side, rows] - self.price_lots[side, rows]) * self._DIRECTION[side, 0]
+        for array, value in ((self.count, 0), (self.next_index, 1), (self.zone_used, False), (self.first_price, 0.0),
+                             (self.grid_step, 0.0), (self.tp_distance, 0.0), (self.last_price, 0.0),
+                             (self.last_lot, 0.0), (self.lots, 0.0), (self.price_lots, 0.0)):
+            array[side, rows] = value
+        return pnl
+
+    def _open(self, side: int, rows: np.ndarray, close: np.ndarray, lots: np.ndarray):
+        self.count[side, rows] += 1
+        self.last_price[side, rows] = close[rows]
+        self.last_lot[side, rows] = lots
+        self.lots[side, rows] += lots
+        self.price_lots[side, rows] += lots * close[rows]
+
+    def step(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, active: np.ndarray) -> np.ndarray:
+        """Advance one bar; returns the realised P&L (price units x lots) per path"""
+        rsi_closed, atr_grid, atr_tp = self._prev
+        self._prev = (self.rsi.update(close).copy(), self.atr_grid.update(high, low, close).copy(),
+                      self.atr_tp.update(high, low, close).copy())
+        self.bars += 1
+        realised = np.zeros(len(close))
+        if self.bars < self.min_bars:
+            return realised
+        ready = active & ~np.isnan(rsi_closed)
+        count = self.count
+        direction = self._DIRECTION
+
+        # 1. Exits: retrace to first entry, else ATR take profit from VWAP; SELL checked first
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vwap = self.price_lots / self.lots
+        retrace = (count > 1) & (self.first_price > 0) & ((close - self.first_price) * direction >= 0)
+        take_profit = (count < self.max_trades) & (self.tp_distance > 0) & ((close - vwap) * direction >= self.tp_distance)
+        exit_side = ready & (count > 0) & (retrace | take_profit)
+        close_sell = np.flatnonzero(exit_side[self.SELL])
+        close_buy = np.flatnonzero(exit_side[self.BUY] & ~exit_side[self.SELL])
+        realised[close_sell] += self._close(self.SELL, close_sell, close)
+        realised[close_buy] += self._close(self.BUY, close_buy, close)
+        acted = exit_side[self.SELL] | exit_side[self.BUY]
+        ready = ready & ~acted
+
+        # 2. Zone permissions reset once RSI leaves the zone
+        self.zone_used[self.SELL] &= ~(ready & (rsi_closed < self.overbought))
+        self.zone_used[self.BUY] &= ~(ready & (rsi_closed > self.oversold))
+
+        # 3. First entries: SELL before BUY, at most one per bar
+        can_sell = ready & (count[self.SELL] == 0) & ~self.zone_used[self.SELL] & (rsi_closed >= self.overbought)
+        can_buy = ready & (count[self.BUY] == 0) & ~self.zone_used[self.BUY] & (rsi_closed <= self.oversold)
+        if not self.allow_both:
+            can_sell &= count[self.BUY] == 0
+            can_buy &= count[self.SELL] == 0
+        can_buy &= ~can_sell
+        for side, mask in ((self.SELL, can_sell), (self.BUY, can_buy)):
+            rows = np.flatnonzero(mask)
+            self.zone_used[side, rows] = True
+            self.next_index[side, rows] = 1
+            self.first_price[side, rows] = close[rows]
+            self.grid_step[side, rows] = atr_grid[rows]
+            self.tp_distance[side, rows] = atr_tp[rows]
+            self._open(side, rows, close, np.full(len(rows), self.initial_lot))
+        ready = ready & ~(can_sell | can_buy)
+
+        # 4. Martingale scaling at first price +/- next_index * ATR grid, beyond the last entry
+        target = self.first_price - direction * self.next_index * self.grid_step
+        scale = (ready & (count > 0) & (count < self.max_trades) & (self.first_price > 0) & (self.grid_step > 0)
+                 & ((close - target) * direction <= 0) & ((close - self.last_price) * direction < 0))
+        scale[self.BUY] &= ~scale[self.SELL]
+        for side in (self.SELL, self.BUY):
+            rows = np.flatnonzero(scale[side])
+            base = np.where(self.last_lot[side, rows] > 0, self.last_lot[side, rows], self.initial_lot)
+            self._open(side, rows, close, base * self.multiplier)
+            self.next_index[side, rows] = self.count[side, rows]
+        return realised
+
+    def halt(self, rows: np.ndarray, close: np.ndarray) -> np.ndarray:
+        """Close everything on the given paths (stop-out); returns the realised P&L"""
+        return self._close(self.BUY, rows, close) + self._close(self.SELL, rows, close)
+
+
+class GoldGridSim:
+    """Gold Buy Dip grids for every path, using the cross-sectional universe"""
+
+    def __init__(self, config: Any, n_paths: int, symbol: str = "XAUUSD", registry: Optional[SymbolRegistry] = None):
+        self.universe = GoldBuyDipUniverse(config, [symbol] * n_paths, registry)
+
+    def exposure(self) -> np.ndarray:
+        return self.universe.grid_lots.sum(axis=1)
+
+    def floating(self, close: np.ndarray) -> np.ndarray:
+        universe = self.universe
+        return ((close[:, None] - universe.grid_price) * universe.grid_lots).sum(axis=1) * universe.trigger_direction
+
+    def step(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, active: np.ndarray) -> np.ndarray:
+        # The universe clears a grid when it closes, so take its P&L first. Ruined paths
+        # keep stepping (skipping them would cost a buffer copy per bar) but are ignored
+        before = self.floating(close)
+        events = self.universe.advance(high, low, close)
+        realised = np.zeros(len(close))
+        realised[events.closed] = before[events.closed]
+        return np.where(active, realised, 0.0)
+
+    def halt(self, rows: np.ndarray, close: np.ndarray) -> np.ndarray:
+        universe = self.universe
+        pnl = self.floating(close)[rows]
+        universe.grid_depth[rows] = 0
+        universe.grid_price[rows] = 0.0
+        universe.grid_lots[rows] = 0.0
+        return pnl
+
+
+@dataclass
+class RiskReport:
+    """Per-path outcomes of one simulated config"""
+    name: str
+    capital: float
+    bars: int
+    final_equity: np.ndarray
+    max_exposure: np.ndarray  # largest total open lots
+    max_drawdown: np.ndarray  # worst peak-to-trough equity drop, account currency
+    max_drawdown_pct: np.ndarray
+    ruined: np.ndarray
+    ruin_bar: np.ndarray  # -1 if never ruined
+    seconds: float = 0.0
+
+    @property
+    def ruin_probability(self) -> float:
+        return float(self.ruined.mean())
+
+    def summary(self, percentiles: Sequence[float] = (50, 95, 99)) -> Dict[str, Any]:
+        """Ruin probability plus percentiles of exposure, drawdown and final equity"""
+        def _dist(values: np.ndarray) -> Dict[str, float]:
+            dist = {f"p{int(p)}": float(np.percentile(values, p)) for p in percentiles}
+            dist["max"] = float(values.max())
+            return dist
+
+        return {
+            "name": self.name,
+            "paths": len(self.final_equity),
+            "bars": self.bars,
+            "ruin_probability": self.ruin_probability,
+            "max_exposure_lots": _dist(self.max_exposure),
+            "max_drawdown": _dist(self.max_drawdown),
+            "max_drawdown_pct": _dist(self.max_drawdown_pct),
+            "final_equity": _dist(self.final_equity),
+            "median_ruin_bar": float(np.median(self.ruin_bar[self.ruined])) if self.ruined.any() else None,
+            "seconds": self.seconds,
+        }
+
+
+def simulate(sim: Any, market: ResampledMarket, bars: int, capital: float, contract_size: float,
+             ruin_equity: float = 0.0, name: str = "") -> RiskReport:
+    """
+    Run a basket sim over ``bars`` resampled bars.
+
+    Equity is ``capital`` plus realised and floating P&L times ``contract_size``
+    (P&L in the quote currency, e.g. USD for XAUUSD / EURUSD). A path is ruined,
+    closed out and stopped when equity falls to ``ruin_equity`` or below.
+    """
+    started = time.perf_counter()
+    n = market.n_paths
+    balance = np.full(n, float(capital))
+    peak = balance.copy()
+    max_drawdown = np.zeros(n)
+    max_drawdown_pct = np.zeros(n)
+    max_exposure = np.zeros(n)
+    ruined = np.zeros(n, dtype=bool)
+    ruin_bar = np.full(n, -1, dtype=np.int64)
+    equity = balance.copy()
+
+    for bar in range(bars):
+        high, low, close = market.step()
+        active = ~ruined
+        balance += sim.step(high, low, close, active) * contract_size
+        np.maximum(max_exposure, np.where(active, sim.exposure(), 0.0), out=max_exposure)
+        equity = np.where(active, balance + sim.floating(close) * contract_size, equity)
+
+        np.maximum(peak, equity, out=peak)
+        drawdown = peak - equity
+        np.maximum(max_drawdown, drawdown, out=max_drawdown)
+        np.maximum(max_drawdown_pct, drawdown / peak * 100, out=max_drawdown_pct)
+
+        busted = np.flatnonzero(active & (equity <= ruin_equity))
+        if len(busted):
+            balance[busted] += sim.halt(busted, close) * contract_size
+            equity[busted] = balance[busted]
+            ruined[busted] = True
+            ruin_bar[busted] = bar
+
+    return RiskReport(name, capital, bars, equity, max_exposure, max_drawdown, max_drawdown_pct,
+                      ruined, ruin_bar, time.perf_counter() - started)
+
+
+def compare_configs(configs: Dict[str, Tuple[str, Any]], highs: Sequence[float], lows: Sequence[float],
+                    closes: Sequence[float], symbol: str, capital: float, n_paths: int = 10000,
+                    bars: int = 2000, block_size: int = 24, ruin_equity: float = 0.0, seed: int = 0,
+                    registry: Optional[SymbolRegistry] = None) -> Dict[str, RiskReport]:
+    """
+    Risk reports for several configs on the same resampled paths.
+
+    ``configs`` maps a name to ``("gold", GoldBuyDipConfig)`` or
+    ``("rsi6", RSI6TradesConfig or dict)``.
+    """
+    registry = registry or symbol_registry
+    contract_size = registry.get(symbol).contract_size
+    market = ResampledMarket(highs, lows, closes, n_paths, block_size, seed=seed)
+    reports = {}
+    for name, (kind, config) in configs.items():
+        market.reset()
+        if kind == "gold":
+            sim = GoldGridSim(config, n_paths, symbol, registry)
+        elif kind == "rsi6":
+            sim = RSI6BasketSim(config, n_paths)
+        else:
+            raise ValueError(f"Unknown strategy kind: {kind}")
+        reports[name] = simulate(sim, market, bars, capital, contract_size, ruin_equity, name)
+        logger.info(f"Risk of ruin {name}: {reports[name].ruin_probability:.2%} over {n_paths} paths "
+                    f"({reports[name].seconds:.1f}s)")
+    return reports
@@ -0,0 +1,254 @@
+"""
+Binary snapshot / restore of strategy state for fast warm restarts.
+
+Each strategy exposes ``snapshot_state()`` (a dict of plain values plus NumPy
+arrays for its candle buffers) and ``restore_state(snapshot)``. This module turns
+that dict into a compact binary file and back:
+
+    header   = magic "SSNP", format version, crc32 of the body
+    body     = zlib( section* )
+    section  = name, kind, payload   (kind 0: JSON state, kind 1: ndarray)
+
+Candle buffers travel as raw ndarray bytes, everything else (setup state, grid
+trades, side states, open positions) as one small JSON section. Files are written
+to a temporary name, fsynced and renamed, so a crash never leaves a torn snapshot.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import datetime_to_us, timestamp_kind, us_to_datetime
+
+logger = lazy_logger(__name__)
+
+SNAPSHOT_MAGIC = b"SSNP"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHI")
+_SECTION_HEADER = struct.Struct("<HBQ")
+_KIND_JSON = 0
+_KIND_ARRAY = 1
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or of an unknown version"""
+
+
+def _encode_value(value: Any) -> Any:
+    """JSON default hook for the few non-JSON types found in strategy state"""
+    if isinstance(value, datetime):
+        return {"$dt": datetime_to_us(value), "$kind": timestamp_kind(value)}
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot snapshot value of type {type(value).__name__}")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if "$dt" in obj:
+        return us_to_datetime(obj["$dt"], obj.get("$kind", 0))
+    if "$dec" in obj:
+        return Decimal(obj["$dec"])
+    return obj
+
+
+def _array_sections(value: Any, prefix: str, arrays: Dict[str, np.ndarray]) -> Any:
+    """Move ndarrays out of the state tree, leaving a reference behind"""
+    if isinstance(value, np.ndarray):
+        arrays[prefix] = value
+        return {"$array": prefix}
+    if isinstance(value, dict):
+        return {k: _array_sections(v, f"{prefix}.{k}", arrays) for k, v in value.items()}
+    return value
+
+
+def _restore_arrays(value: Any, arrays: Dict[str, np.ndarray]) -> Any:
+    if isinstance(value, dict):
+        if "$array" in value and len(value) == 1:
+            return arrays[value["$array"]]
+        return {k: _restore_arrays(v, arrays) for k, v in value.items()}
+    return value
+
+
+def encode_snapshot(state: Dict[str, Any]) -> bytes:
+    """Serialise a strategy snapshot dict to bytes"""
+    arrays: Dict[str, np.ndarray] = {}
+    tree = _array_sections(state, "state", arrays)
+
+    parts = []
+
+    def _section(name: str, kind: int, payload: bytes):
+        encoded_name = name.encode()
+        parts.append(_SECTION_HEADER.pack(len(encoded_name), kind, len(payload)))
+        parts.append(encoded_name)
+        parts.append(payload)
+
+    _section("state", _KIND_JSON, json.dumps(tree, default=_encode_value, separators=(",", ":")).encode())
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        descr = json.dumps([array.dtype.str, list(array.shape)]).encode()
+        _section(name, _KIND_ARRAY, struct.pack("<H", len(descr)) + descr + array.tobytes())
+
+    body = zlib.compress(b"".join(parts), 1)
+    return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, zlib.crc32(body)) + body
+
+
+def decode_snapshot(data: bytes) -> Dict[str, Any]:
+    """Inverse of encode_snapshot"""
+    if len(data) < _HEADER.size:
+        raise SnapshotError("Snapshot too short")
+    magic, version, crc = _HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a strategy snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}")
+    body = data[_HEADER.size:]
+    if zlib.crc32(body) != crc:
+        raise SnapshotError("Snapshot checksum mismatch")
+
+    raw = zlib.decompress(body)
+    tree: Any = None
+    arrays: Dict[str, np.ndarray] = {}
+    offset = 0
+    while offset < len(raw):
+        name_len, kind, size = _SECTION_HEADER.unpack_from(raw, offset)
+        offset += _SECTION_HEADER.size
+        name = raw[offset:offset + name_len].decode()
+        offset += name_len
+        payload = raw[offset:offset + size]
+        offset += size
+
+        if kind == _KIND_JSON:
+            tree = json.loads(payload, object_hook=_decode_object)
+        elif kind == _KIND_ARRAY:
+            (descr_len,) = struct.unpack_from("<H", payload)
+            dtype, shape = json.loads(payload[2:2 + descr_len])
+            arrays[name] = np.frombuffer(payload[2 + descr_len:], dtype=np.dtype(dtype)).reshape(shape).copy()
+        else:
+            raise SnapshotError(f"Unknown section kind {kind}")
+
+    if tree is None:
+        raise SnapshotError("Snapshot has no state section")
+    return _restore_arrays(tree, arrays)
+
+
+def _fsync_directory(directory: str):
+    """Make a rename in directory durable (POSIX; directories cannot be opened on Windows)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_bytes_atomic(path: str, data: bytes) -> int:
+    """
+    Write data to a unique temporary file next to path, fsync and rename over path.
+
+    Concurrent writers of the same path (threads or processes) each use their own
+    temporary file; the last rename wins. Returns bytes written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+    return len(data)
+
+
+def write_snapshot(path: str, strategy: Any) -> int:
+    """Atomically write ``strategy.snapshot_state()`` to path; returns bytes written"""
+    return write_bytes_atomic(path, encode_snapshot(strategy.snapshot_state()))
+
+
+def load_snapshot(path: str, strategy: Any) -> bool:
+    """Restore strategy state from path; returns False when there is nothing usable"""
+    try:
+        with open(path, "rb") as fh:
+            snapshot = decode_snapshot(fh.read())
+    except FileNotFoundError:
+        return False
+    except (SnapshotError, ValueError, zlib.error) as e:
+        logger.error(f"Ignoring unreadable snapshot {path}: {e}")
+        return False
+
+    strategy.restore_state(snapshot)
+    return True
+
+
+class SnapshotWriter:
+    """
+    Periodic snapshot writer for a set of strategy instances.
+
+    Call ``maybe_write`` once per processed bar; a snapshot is written when either
+    ``interval_seconds`` has elapsed or ``every_n_bars`` bars were seen since the
+    last write for that instance.
+    """
+
+    def __init__(self, directory: str, interval_seconds: float = 30.0, every_n_bars: Optional[int] = None):
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self.every_n_bars = every_n_bars
+        self._last_write: Dict[str, float] = {}
+        self._bars_since: Dict[str, int] = {}
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.snap")
+
+    def maybe_write(self, key: str, strategy: Any, now: Optional[float] = None) -> bool:
+        """Write a snapshot for key if it is due; returns True when written"""
+        now = time.monotonic() if now is None else now
+        bars = self._bars_since.get(key, 0) + 1
+        last = self._last_write.get(key)
+
+        due = last is None or now - last >= self.interval_seconds
+        if self.every_n_bars is not None and bars >= self.every_n_bars:
+            due = True
+        if not due:
+            self._bars_since[key] = bars
+            return False
+
+        try:
+            write_snapshot(self.path_for(key), strategy)
+        except OSError as e:
+            logger.error(f"Failed to write snapshot for {key}: {e}")
+            self._bars_since[key] = bars
+            return False
+
+        self._last_write[key] = now
+        self._bars_since[key] = 0
+        return True
+
+    def restore(self, key: str, strategy: Any) -> bool:
+        """Load the latest snapshot for key into strategy, if one exists"""
+        return load_snapshot(self.path_for(key), strategy)
@@ -0,0 +1,157 @@
+"""
+Versioned status snapshots of strategy instances for dashboards.
+
+``RSIPairsStrategy.get_strategy_status`` recomputes all indicators,
+``GoldBuyDipStrategy.get_grid_status`` re-sums the grid and
+``RSI6TradesStrategy.get_status`` rescans positions on every call, and the
+dashboard polls each instance every second from another thread. A strategy
+attached to a ``StatusBoard`` instead builds its status once at the end of each
+bar (reusing the indicators of that bar) and publishes it as an immutable
+``StatusSnapshot``:
+
+- every publish that changes an instance's status takes the next board version;
+  an unchanged status keeps its snapshot and version
+- ``get_all_statuses(since_version)`` returns only the instances published after
+  ``since_version`` (and the keys removed since), walking the most recently
+  published entries first, so a poll costs O(changed instances)
+
+    strategy.attach_status_board(status_board)
+    ...
+    update = status_board.get_all_statuses()        # full picture
+    update = status_board.get_all_statuses(update.version)  # changes since
+
+Snapshot statuses are read-only mappings (nested dicts frozen, lists as tuples),
+safe to hand to any number of readers without copying.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from app.services.equity_monitor import strategy_key
+from app.utilities.clock import Clock, system_clock
+from app.utilities.lazy_imports import lazy_logger
+
+logger = lazy_logger(__name__)
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    """Status of one instance as of one bar; never modified after publication"""
+    key: str
+    version: int
+    published_at: datetime
+    status: Mapping[str, Any]
+
+
+@dataclass(frozen=True)
+class StatusUpdate:
+    """Result of get_all_statuses; pass ``version`` as the next since_version"""
+    version: int
+    statuses: Mapping[str, StatusSnapshot] = field(default_factory=lambda: MappingProxyType({}))
+    removed: Tuple[str, ...] = ()
+
+
+def freeze_status(value: Any) -> Any:
+    """Read-only deep copy of a status dict: dicts as mapping proxies, lists as tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze_status(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_status(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+class StatusBoard:
+    """Latest status snapshot per registered strategy instance"""
+
+    def __init__(self, clock: Optional[Clock] = None):
+        self.clock = clock or system_clock
+        self._lock = threading.Lock()
+        self._version = 0
+        self._owners: Dict[str, Any] = {}
+        # key -> snapshot, ordered by snapshot version (most recent last)
+        self._snapshots: "OrderedDict[str, StatusSnapshot]" = OrderedDict()
+        self._removed: Dict[str, int] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def register(self, strategy: Any, key: Optional[str] = None) -> str:
+        """Reserve a key for a strategy instance (default: app.services.equity_monitor.strategy_key)"""
+        key = key or strategy_key(strategy)
+        with self._lock:
+            owner = self._owners.get(key)
+            if owner is not None and owner is not strategy:
+                raise ValueError(f"Status board key {key!r} is already registered to another strategy")
+            self._owners[key] = strategy
+            self._removed.pop(key, None)
+        return key
+
+    def unregister(self, key: str) -> bool:
+        with self._lock:
+            if self._owners.pop(key, None) is None:
+                return False
+            self._snapshots.pop(key, None)
+            self._version += 1
+            self._removed[key] = self._version
+        return True
+
+    def publish(self, key: str, status: Dict[str, Any]) -> int:
+        """
+        Publish the status of a registered instance; returns its snapshot version.
+
+        A key that is not (or no longer) registered is ignored and returns 0, so a
+        strategy keeps running after its key is unregistered or the board cleared.
+        """
+        frozen = freeze_status(status)
+        with self._lock:
+            if key not in self._owners:
+                logger.debug(f"Status board key {key!r} is not registered, status not published")
+                return 0
+            previous = self._snapshots.get(key)
+            if previous is not None and previous.status == frozen:
+                return previous.version
+            self._version += 1
+            self._snapshots[key] = StatusSnapshot(key, self._version, self.clock.now(), frozen)
+            self._snapshots.move_to_end(key)
+            return self._version
+
+    def get(self, key: str) -> Optional[StatusSnapshot]:
+        return self._snapshots.get(key)
+
+    def get_all_statuses(self, since_version: int = 0) -> StatusUpdate:
+        """Snapshots published after since_version (all of them for 0) and keys removed since"""
+        with self._lock:
+            version = self._version
+            if since_version >= version:
+                return StatusUpdate(version)
+            changed = []
+            for snapshot in reversed(self._snapshots.values()):
+                if snapshot.version <= since_version:
+                    break
+                changed.append(snapshot)
+            removed = tuple(key for key, removed_at in self._removed.items() if removed_at > since_version)
+        statuses = MappingProxyType({snapshot.key: snapshot for snapshot in reversed(changed)})
+        return StatusUpdate(version, statuses, removed)
+
+    def clear(self):
+        """Unregister every instance; pollers see them all in the next update's ``removed``"""
+        with self._lock:
+            if not self._owners:
+                return
+            self._version += 1
+            for key in self._owners:
+                self._removed[key] = self._version
+            self._owners.clear()
+            self._snapshots.clear()
+
+
+status_board = StatusBoard()
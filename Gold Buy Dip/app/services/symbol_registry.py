@@ -0,0 +1,296 @@
+"""
+Symbol specification registry.
+
+Pip size, point, contract size, tick value and lot limits used to be derived per
+call by string-matching the symbol (and, in the research notebook, by calling
+``mt5.symbol_info`` every time). The registry resolves each symbol once, from a
+local JSON snapshot or from MT5 broker metadata, and hands out the same frozen
+``SymbolSpec`` object on every lookup.
+
+Symbols without broker metadata fall back to the same heuristics the strategies
+used before (gold pip 0.1 and $1 per pip per lot, JPY pip 0.01 and $9.43, ...,
+and Gold Buy Dip's MT4 Point: 0.01 for gold, 0.0001 for everything else), so
+behaviour is unchanged when neither MT5 nor a snapshot is available.
+
+Specs are keyed by the upper-cased symbol but keep the broker's spelling in
+``SymbolSpec.symbol``, which is what MT5 is queried with (suffixes such as
+``EURUSDm`` are case sensitive).
+
+Tick values move with exchange rates; when the registry is backed by MT5,
+``start_auto_refresh`` re-reads them on a background timer rather than per call.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, Iterable, Optional
+
+from app.utilities.lazy_imports import OptionalModule, lazy_logger
+
+logger = lazy_logger(__name__)
+
+_mt5 = OptionalModule("MetaTrader5")
+
+SNAPSHOT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class SymbolSpec:
+    """Trading specification of one symbol; ``pip_value`` is per 1.0 lot in account currency"""
+    symbol: str
+    pip_size: float
+    point: float
+    digits: int
+    contract_size: float
+    tick_size: float
+    tick_value: float
+    pip_value: float
+    volume_min: float = 0.01
+    volume_max: float = 100.0
+    volume_step: float = 0.01
+    source: str = "heuristic"
+
+    def pip_value_for(self, lot_size: float) -> float:
+        return self.pip_value * lot_size
+
+
+def pip_size_for(symbol: str, point: Optional[float] = None, digits: Optional[int] = None) -> float:
+    """
+    Pip size for a symbol (notebook rules).
+
+    Metals and JPY pairs have fixed pip sizes; other symbols derive it from the
+    broker's point/digits when known, otherwise assume a 5-digit broker.
+    """
+    symbol = symbol.upper()
+
+    # Precious metals
+    if symbol.startswith('XAU'):  # Gold (XAUUSD, XAUGBP, etc.)
+        return 0.1
+    if symbol.startswith('XAG'):  # Silver (XAGUSD, XAGGBP, etc.)
+        return 0.001
+    if symbol.startswith('XPD') or symbol.startswith('XPT'):  # Palladium/Platinum
+        return 0.1
+
+    # JPY pairs - pip is always 0.01 regardless of digits
+    if 'JPY' in symbol:
+        return 0.01
+
+    if point is not None and digits is not None:
+        if digits in (5, 3):  # 5-digit or 3-digit broker
+            return point * 10
+        if digits in (4, 2):  # 4-digit or 2-digit broker
+            return point
+        if point == 0.001:
+            return 0.01
+    return 0.0001
+
+
+def heuristic_spec(symbol: str) -> SymbolSpec:
+    """Spec built from the symbol name alone, matching the strategies' original constants"""
+    name = symbol.upper()
+    pip_size = pip_size_for(name)
+
+    # Simplified pip values per standard lot (actual values depend on exchange rates)
+    if 'JPY' in name:
+        pip_value = 9.43
+    elif name.startswith('XAU'):
+        pip_value = 1.0
+    elif name.startswith('XAG'):
+        pip_value = 5.0
+    else:
+        pip_value = 10.0
+
+    # MT4-style Point exactly as Gold Buy Dip used it: 0.01 for gold, 0.0001 otherwise
+    if 'XAU' in name:
+        point, digits = 0.01, 2
+    else:
+        point, digits = 0.0001, 4
+
+    return SymbolSpec(
+        symbol=symbol,
+        pip_size=pip_size,
+        point=point,
+        digits=digits,
+        contract_size=100.0 if name.startswith('XAU') else 100_000.0,
+        tick_size=pip_size,
+        tick_value=pip_value,
+        pip_value=pip_value,
+    )
+
+
+def spec_from_symbol_info(symbol: str, info: Any) -> SymbolSpec:
+    """Build a spec from an MT5 ``symbol_info`` record"""
+    point = float(info.point)
+    digits = int(info.digits)
+    tick_size = float(getattr(info, "trade_tick_size", 0.0) or point)
+    tick_value = float(getattr(info, "trade_tick_value", 0.0) or 0.0)
+    pip_size = pip_size_for(symbol, point, digits)
+    pip_value = tick_value * pip_size / tick_size if tick_value > 0 else heuristic_spec(symbol).pip_value
+    return SymbolSpec(
+        symbol=symbol,
+        pip_size=pip_size,
+        point=point,
+        digits=digits,
+        contract_size=float(getattr(info, "trade_contract_size", 0.0) or 100_000.0),
+        tick_size=tick_size,
+        tick_value=tick_value,
+        pip_value=pip_value,
+        volume_min=float(getattr(info, "volume_min", 0.01)),
+        volume_max=float(getattr(info, "volume_max", 100.0)),
+        volume_step=float(getattr(info, "volume_step", 0.01)),
+        source="mt5",
+    )
+
+
+class SymbolRegistry:
+    """
+    Interned per-symbol specs.
+
+    ``get`` is a dict lookup after the first call for a symbol. Specs are immutable;
+    a refresh swaps in a new object, so callers should look specs up rather than
+    keep them across bars.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, SymbolSpec] = {}
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+        self.last_refresh: Optional[float] = None
+
+    def get(self, symbol: str) -> SymbolSpec:
+        spec = self._specs.get(symbol)
+        if spec is not None:
+            return spec
+
+        with self._lock:
+            key = symbol.upper()
+            spec = self._specs.get(key)
+            if spec is None:
+                spec = heuristic_spec(symbol)
+                self._specs[key] = spec
+            # Intern under the caller's spelling too so the next lookup is a single hit
+            self._specs[symbol] = spec
+        return spec
+
+    def register(self, spec: SymbolSpec):
+        """Add or replace a spec (also drops any alias cached for another spelling)"""
+        key = spec.symbol.upper()
+        with self._lock:
+            for alias in [name for name in self._specs if name.upper() == key]:
+                del self._specs[alias]
+            self._specs[key] = spec
+
+    def symbols(self) -> Dict[str, SymbolSpec]:
+        """Canonical (upper-case) symbol -> spec"""
+        with self._lock:
+            items = list(self._specs.items())
+        return {name: spec for name, spec in items if name == name.upper()}
+
+    def load_json(self, path: str) -> int:
+        """Load specs from a snapshot written by save_json; returns the number loaded"""
+        with open(path, "r", encoding="utf-8") as fh:
+            payload = json.load(fh)
+        if payload.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported symbol snapshot version {payload.get('version')}")
+
+        for symbol, fields in payload["symbols"].items():
+            self.register(SymbolSpec(**{"symbol": symbol, **fields, "source": "snapshot"}))
+        logger.info(f"Loaded {len(payload['symbols'])} symbol specs from {path}")
+        return len(payload["symbols"])
+
+    def save_json(self, path: str):
+        """Write the current specs so later processes can start without MT5"""
+        payload = {
+            "version": SNAPSHOT_VERSION,
+            "symbols": {name: asdict(spec) for name, spec in self.symbols().items()},
+        }
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def load_from_mt5(self, symbols: Iterable[str]) -> int:
+        """Fetch specs from MT5 symbol_info; symbols MT5 does not know keep their heuristics"""
+        mt5 = _mt5.get()
+        if mt5 is None:
+            logger.warning("MetaTrader5 module unavailable; using heuristic symbol specs")
+            return 0
+
+        loaded = 0
+        for symbol in symbols:
+            try:
+                info = mt5.symbol_info(symbol)
+            except Exception as e:
+                logger.error(f"Error reading symbol_info for {symbol}: {e}")
+                continue
+            if info is None:
+                logger.warning(f"No symbol_info for {symbol}; using heuristic spec")
+                continue
+            self.register(spec_from_symbol_info(symbol, info))
+            loaded += 1
+        self.last_refresh = time.monotonic()
+        return loaded
+
+    def refresh_tick_values(self) -> int:
+        """Re-read tick values for broker-backed (MT5 or snapshot) specs; returns the number updated"""
+        mt5 = _mt5.get()
+        if mt5 is None:
+            return 0
+
+        updated = 0
+        for spec in self.symbols().values():
+            if spec.source == "heuristic":
+                continue
+            try:
+                info = mt5.symbol_info(spec.symbol)
+            except Exception as e:
+                logger.error(f"Error refreshing tick value for {spec.symbol}: {e}")
+                continue
+            tick_value = float(getattr(info, "trade_tick_value", 0.0) or 0.0) if info is not None else 0.0
+            if tick_value <= 0 or tick_value == spec.tick_value:
+                continue
+            pip_value = tick_value * spec.pip_size / spec.tick_size
+            self.register(replace(spec, tick_value=tick_value, pip_value=pip_value, source="mt5"))
+            updated += 1
+        self.last_refresh = time.monotonic()
+        return updated
+
+    def maybe_refresh(self, interval_seconds: float = 60.0, now: Optional[float] = None) -> bool:
+        """Refresh tick values if interval_seconds elapsed; for callers that run their own loop"""
+        now = time.monotonic() if now is None else now
+        if self.last_refresh is not None and now - self.last_refresh < interval_seconds:
+            return False
+        self.refresh_tick_values()
+        self.last_refresh = now
+        return True
+
+    def start_auto_refresh(self, interval_seconds: float = 60.0):
+        """Refresh tick values every interval_seconds on a daemon thread"""
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+        self._stop_refresh.clear()
+
+        def _run():
+            while not self._stop_refresh.wait(interval_seconds):
+                try:
+                    self.refresh_tick_values()
+                except Exception as e:
+                    logger.error(f"Symbol spec refresh failed: {e}")
+
+        self._refresh_thread = threading.Thread(target=_run, name="symbol-registry-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_auto_refresh(self):
+        self._stop_refresh.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout=5)
+            self._refresh_thread = None
+
+
+# Process-wide registry shared by all strategy instances
+symbol_registry = SymbolRegistry()
@@ -0,0 +1,242 @@
+"""
+Tick / sub-bar replay for strategy exit checks.
+
+Bar-level replay only ever sees ``candle.close``, so take profits that were touched
+inside a bar are either missed or filled at the wrong price. This module streams
+bid/ask ticks (real ticks, or a synthetic path derived from OHLC) between bar closes
+and checks them against the exit levels published by a strategy's
+``get_exit_levels()``. Entry logic and indicators still run only on bar close
+through ``_process_market_data``.
+
+Crossing detection is batched with NumPy: per-bar bid/ask extremes are computed for
+the whole tick stream in one ``reduceat`` pass, and a bar's ticks are only scanned
+when one of its extremes actually crosses an open exit level.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import timestamp_kind, us_to_datetime
+
+logger = lazy_logger(__name__)
+
+
+@dataclass
+class TickStream:
+    """
+    Bid/ask ticks assigned to the bars they occurred in.
+
+    ``bar_index`` must be non-decreasing; ticks of bar ``i`` happen before bar ``i``
+    closes. ``times`` is optional and holds epoch microseconds (UTC).
+    """
+    bar_index: np.ndarray
+    bid: np.ndarray
+    ask: np.ndarray
+    times: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.bar_index = np.ascontiguousarray(self.bar_index, dtype=np.int64)
+        self.bid = np.ascontiguousarray(self.bid, dtype=np.float64)
+        self.ask = np.ascontiguousarray(self.ask, dtype=np.float64)
+        if self.times is not None:
+            self.times = np.ascontiguousarray(self.times, dtype=np.int64)
+        if not (len(self.bar_index) == len(self.bid) == len(self.ask)):
+            raise ValueError("bar_index, bid and ask must have the same length")
+        if len(self.bar_index) > 1 and np.any(np.diff(self.bar_index) < 0):
+            raise ValueError("Ticks must be ordered by bar")
+
+    def __len__(self) -> int:
+        return len(self.bid)
+
+
+@dataclass
+class ReplayEvent:
+    """A signal produced during replay, with where and at what price it happened"""
+    bar_index: int
+    tick_index: Optional[int]  # None for signals generated on bar close
+    price: float
+    signal: Any
+
+
+def assign_ticks_to_bars(tick_times: np.ndarray, bar_open_times: np.ndarray) -> np.ndarray:
+    """
+    Map tick timestamps onto the bar that contains them.
+
+    Both arrays must be sorted and use the same unit. Ticks before the first bar map
+    to -1 and are ignored by the replay engine.
+    """
+    return np.searchsorted(np.asarray(bar_open_times), np.asarray(tick_times), side="right").astype(np.int64) - 1
+
+
+def synthetic_ticks_from_ohlc(opens: Sequence[float], highs: Sequence[float], lows: Sequence[float],
+                              closes: Sequence[float], spread: float = 0.0) -> TickStream:
+    """
+    Build a four-point synthetic path per bar from OHLC (MT4 "control points" style).
+
+    Bullish bars are walked open -> low -> high -> close and bearish bars
+    open -> high -> low -> close, which is the conservative ordering for a grid that
+    is scaling against the move. The path is used as BID; ASK is BID + spread.
+    """
+    o = np.asarray(opens, dtype=np.float64)
+    h = np.asarray(highs, dtype=np.float64)
+    l = np.asarray(lows, dtype=np.float64)
+    c = np.asarray(closes, dtype=np.float64)
+    n = len(c)
+
+    bullish = c >= o
+    path = np.empty((n, 4), dtype=np.float64)
+    path[:, 0] = o
+    path[:, 1] = np.where(bullish, l, h)
+    path[:, 2] = np.where(bullish, h, l)
+    path[:, 3] = c
+
+    bid = path.reshape(-1)
+    bar_index = np.repeat(np.arange(n, dtype=np.int64), 4)
+    return TickStream(bar_index=bar_index, bid=bid, ask=bid + spread)
+
+
+def bar_extremes(ticks: TickStream, n_bars: int) -> Dict[str, np.ndarray]:
+    """
+    Per-bar min/max of bid and ask plus tick offsets, computed in one pass.
+
+    Returns arrays of length ``n_bars``: ``start``/``stop`` tick offsets and
+    ``min_bid``, ``max_bid``, ``min_ask``, ``max_ask`` (NaN for bars without ticks).
+    Ticks with ``bar_index`` outside ``[0, n_bars)`` belong to no bar and are ignored.
+    """
+    bars = np.arange(n_bars, dtype=np.int64)
+    start = np.searchsorted(ticks.bar_index, bars, side="left")
+    stop = np.searchsorted(ticks.bar_index, bars, side="right")
+    has_ticks = stop > start
+
+    # reduceat runs the last segment to the end of the array: cut it at the last bar
+    end = int(np.searchsorted(ticks.bar_index, n_bars, side="left"))
+    if end < len(ticks):
+        logger.warning(f"Ignoring {len(ticks) - end} ticks after the last of {n_bars} bars")
+
+    result = {"start": start, "stop": stop}
+    offsets = start[has_ticks]
+    for name, values, ufunc in (
+        ("min_bid", ticks.bid, np.minimum),
+        ("max_bid", ticks.bid, np.maximum),
+        ("min_ask", ticks.ask, np.minimum),
+        ("max_ask", ticks.ask, np.maximum),
+    ):
+        column = np.full(n_bars, np.nan)
+        if len(offsets):
+            column[has_ticks] = ufunc.reduceat(values[:end], offsets)
+        result[name] = column
+    return result
+
+
+def first_crossing(prices: np.ndarray, level: float, above: bool) -> int:
+    """Index of the first price at/above (or at/below) ``level``, or -1"""
+    mask = prices >= level if above else prices <= level
+    idx = int(mask.argmax())
+    return idx if mask[idx] else -1
+
+
+class TickReplayEngine:
+    """
+    Replay a strategy over bars with intra-bar exit evaluation.
+
+    For every bar the engine first scans that bar's ticks against the strategy's
+    current exit levels (BUY baskets against BID, SELL baskets against ASK) and calls
+    ``strategy.close_at_price`` on the first crossing, then hands the closed bar to
+    ``strategy._process_market_data`` as usual.
+    """
+
+    def __init__(self, strategy: Any, candles: Sequence[Any], ticks: TickStream,
+                 process_kwargs: Optional[Dict[str, Any]] = None):
+        self.strategy = strategy
+        self.candles = candles
+        self.ticks = ticks
+        self.process_kwargs = process_kwargs or {}
+        self.events: List[ReplayEvent] = []
+        self.intra_bar_exits = 0
+        self.bars_scanned = 0
+
+    def run(self) -> List[ReplayEvent]:
+        """Replay every bar and return the generated events in order"""
+        n_bars = len(self.candles)
+        extremes = bar_extremes(self.ticks, n_bars)
+
+        for i, candle in enumerate(self.candles):
+            if extremes["stop"][i] > extremes["start"][i]:
+                self._replay_bar_ticks(i, extremes)
+
+            # Indicators and entry logic only run on bar close
+            signal = self.strategy._process_market_data(candle, **self.process_kwargs)
+            if signal is not None:
+                self.events.append(ReplayEvent(i, None, float(candle.close), signal))
+
+        logger.info(f"Tick replay finished: {n_bars} bars, {len(self.ticks)} ticks, "
+                    f"{self.bars_scanned} bars scanned, {self.intra_bar_exits} intra-bar exits")
+        return self.events
+
+    def _replay_bar_ticks(self, i: int, extremes: Dict[str, np.ndarray]) -> None:
+        """Close baskets whose exit level is crossed by the ticks of bar i"""
+        start = int(extremes["start"][i])
+        stop = int(extremes["stop"][i])
+
+        while start < stop:
+            levels = self._crossable_levels(i, extremes)
+            if not levels:
+                return
+            self.bars_scanned += 1
+
+            # Earliest crossing across all open levels wins
+            hit: Optional[Tuple[int, str, float, str]] = None
+            for side, level, reason in levels:
+                prices = self.ticks.bid[start:stop] if side == "BUY" else self.ticks.ask[start:stop]
+                idx = first_crossing(prices, level, above=side == "BUY")
+                if idx >= 0 and (hit is None or idx < hit[0]):
+                    hit = (idx, side, level, reason)
+            if hit is None:
+                return
+
+            tick = start + hit[0]
+            side, reason = hit[1], hit[3]
+            price = float(self.ticks.bid[tick] if side == "BUY" else self.ticks.ask[tick])
+            timestamp = self._tick_timestamp(i, tick)
+            clock = getattr(self.strategy, "clock", None)
+            if clock is not None:
+                clock.observe(timestamp)
+            signal = self.strategy.close_at_price(side, price, reason, timestamp)
+            if signal is not None:
+                self.intra_bar_exits += 1
+                self.events.append(ReplayEvent(i, tick, price, signal))
+
+            # Remaining ticks of the bar may still hit the other basket
+            start = tick + 1
+            extremes = self._rest_of_bar_extremes(i, start, stop, extremes)
+
+    def _crossable_levels(self, i: int, extremes: Dict[str, np.ndarray]) -> List[Tuple[str, float, str]]:
+        """Exit levels that this bar's extremes actually reach"""
+        crossable = []
+        for side, level, reason in self.strategy.get_exit_levels():
+            if side == "BUY" and extremes["max_bid"][i] >= level:
+                crossable.append((side, level, reason))
+            elif side == "SELL" and extremes["min_ask"][i] <= level:
+                crossable.append((side, level, reason))
+        return crossable
+
+    def _rest_of_bar_extremes(self, i: int, start: int, stop: int,
+                              extremes: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Refresh bar i's extremes to cover only ticks[start:stop]"""
+        if start >= stop:
+            return extremes
+        extremes["max_bid"][i] = self.ticks.bid[start:stop].max()
+        extremes["min_ask"][i] = self.ticks.ask[start:stop].min()
+        return extremes
+
+    def _tick_timestamp(self, i: int, tick: int) -> Any:
+        """Timestamp of a tick, of the same kind (naive / aware / raw) as the bar timestamps"""
+        bar_timestamp = getattr(self.candles[i], "timestamp", None)
+        if self.ticks.times is None or bar_timestamp is None:
+            return bar_timestamp
+        return us_to_datetime(int(self.ticks.times[tick]), timestamp_kind(bar_timestamp))
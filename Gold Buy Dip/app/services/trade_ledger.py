@@ -0,0 +1,387 @@
+"""
+Columnar, append-only trade ledger with incrementally maintained metrics.
+
+The research notebook keeps ``trade_history`` as a list of wide dicts with
+human-readable keys ("Symbol1 Entry RSI", "Total P&L", ...) and builds a DataFrame
+at the end; live, each Gold Buy Dip instance carries its own
+StrategyPerformanceTracker. ``TradeLedger`` stores closed trades in one typed
+NumPy array per field (symbols, trade types and exit reasons as small integer
+codes), about 125 bytes per trade against several KB for the dict, and updates the
+summary metrics as each trade is appended:
+
+- running P&L, win rate, profit factor, gross profit / loss
+- peak and maximum drawdown of the cumulative P&L curve
+- Sharpe / Sortino accumulators (Welford mean / variance, downside sum of squares)
+- a histogram of basket depth (grid trades per closed basket, 1 for pair trades)
+
+so ``metrics_dict()`` is O(1) however long the history gets. ``to_frame`` rebuilds the
+notebook's DataFrame when a report is needed.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.indicators.spread import LEG_DIRECTIONS
+from app.utilities.ohlc_arrays import datetime_to_us
+
+# Field name -> dtype; float fields default to NaN when not given
+LEDGER_FIELDS = {
+    "trade_id": np.int64,
+    "entry_time_us": np.int64,
+    "exit_time_us": np.int64,
+    "symbol1": np.int16,
+    "symbol2": np.int16,
+    "trade_type": np.int8,
+    "exit_reason": np.int8,
+    "depth": np.int16,
+    "s1_entry_price": np.float64,
+    "s1_exit_price": np.float64,
+    "s2_entry_price": np.float64,
+    "s2_exit_price": np.float64,
+    "s1_lots": np.float32,
+    "s2_lots": np.float32,
+    "s1_entry_rsi": np.float32,
+    "s2_entry_rsi": np.float32,
+    "s1_entry_atr": np.float32,
+    "s2_entry_atr": np.float32,
+    "hedge_ratio": np.float32,
+    "s1_pips": np.float32,
+    "s2_pips": np.float32,
+    "s1_pnl": np.float64,
+    "s2_pnl": np.float64,
+    "pnl": np.float64,
+}
+
+_CODED_FIELDS = ("symbol1", "symbol2", "trade_type", "exit_reason")
+
+# Ledger field -> notebook trade_history column
+NOTEBOOK_COLUMNS = {
+    "trade_id": "ID",
+    "trade_type": "Trade Type",
+    "entry_time": "Entry Time",
+    "exit_time": "Exit Time",
+    "duration_hours": "Duration (hrs)",
+    "exit_reason": "Exit Reason",
+    "symbol1": "Symbol1",
+    "symbol2": "Symbol2",
+    "s1_entry_rsi": "Symbol1 Entry RSI",
+    "s2_entry_rsi": "Symbol2 Entry RSI",
+    "s1_entry_atr": "Symbol1 Entry ATR",
+    "s2_entry_atr": "Symbol2 Entry ATR",
+    "s1_entry_price": "Symbol1 Entry",
+    "s1_exit_price": "Symbol1 Exit",
+    "s2_entry_price": "Symbol2 Entry",
+    "s2_exit_price": "Symbol2 Exit",
+    "s1_lots": "Symbol1 Lots",
+    "s2_lots": "Symbol2 Lots",
+    "hedge_ratio": "Hedge Ratio",
+    "s1_pips": "Symbol1 Pips",
+    "s2_pips": "Symbol2 Pips",
+    "total_pips": "Total Pips",
+    "s1_pnl": "Symbol1 P&L",
+    "s2_pnl": "Symbol2 P&L",
+    "pnl": "Total P&L",
+}
+
+
+class TradeMetrics:
+    """Summary statistics updated in O(1) per closed trade"""
+
+    def __init__(self, starting_balance: float = 0.0):
+        self.starting_balance = starting_balance
+        self.trades = 0
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.net_pnl = 0.0
+        self.peak_pnl = 0.0
+        self.max_drawdown = 0.0
+        self.max_drawdown_pct = 0.0
+        self.best_trade = -math.inf
+        self.worst_trade = math.inf
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._downside_sq = 0.0
+        self.depth_histogram = np.zeros(16, dtype=np.int64)
+
+    def add(self, pnl: float, depth: int = 1):
+        pnl = float(pnl)
+        self.trades += 1
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+        elif pnl < 0:
+            self.losses += 1
+            self.gross_loss -= pnl
+        self.net_pnl += pnl
+        self.best_trade = max(self.best_trade, pnl)
+        self.worst_trade = min(self.worst_trade, pnl)
+
+        # Drawdown of the closed-trade equity curve
+        if self.net_pnl > self.peak_pnl:
+            self.peak_pnl = self.net_pnl
+        drawdown = self.peak_pnl - self.net_pnl
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+        peak_equity = self.starting_balance + self.peak_pnl
+        if peak_equity > 0:
+            self.max_drawdown_pct = max(self.max_drawdown_pct, drawdown / peak_equity * 100)
+
+        # Welford update for the per-trade P&L mean / variance
+        delta = pnl - self._mean
+        self._mean += delta / self.trades
+        self._m2 += delta * (pnl - self._mean)
+        if pnl < 0:
+            self._downside_sq += pnl * pnl
+
+        if depth >= len(self.depth_histogram):
+            grown = np.zeros(max(depth + 1, 2 * len(self.depth_histogram)), dtype=np.int64)
+            grown[:len(self.depth_histogram)] = self.depth_histogram
+            self.depth_histogram = grown
+        self.depth_histogram[depth] += 1
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.trades * 100 if self.trades else 0.0
+
+    @property
+    def profit_factor(self) -> float:
+        if self.gross_loss == 0:
+            return math.inf if self.gross_profit > 0 else 0.0
+        return self.gross_profit / self.gross_loss
+
+    @property
+    def pnl_std(self) -> float:
+        return math.sqrt(self._m2 / (self.trades - 1)) if self.trades > 1 else 0.0
+
+    def sharpe(self, periods_per_year: Optional[float] = None) -> float:
+        """Per-trade Sharpe ratio (mean / std of trade P&L), optionally annualised"""
+        std = self.pnl_std
+        if std == 0:
+            return 0.0
+        ratio = self._mean / std
+        return ratio * math.sqrt(periods_per_year) if periods_per_year else ratio
+
+    def sortino(self, periods_per_year: Optional[float] = None) -> float:
+        """Per-trade Sortino ratio (mean / downside deviation), optionally annualised"""
+        if self.trades == 0 or self._downside_sq == 0:
+            return 0.0
+        ratio = self._mean / math.sqrt(self._downside_sq / self.trades)
+        return ratio * math.sqrt(periods_per_year) if periods_per_year else ratio
+
+    def as_dict(self, periods_per_year: Optional[float] = None) -> Dict[str, Any]:
+        depths = np.flatnonzero(self.depth_histogram)
+        return {
+            "trades": self.trades,
+            "wins": self.wins,
+            "losses": self.losses,
+            "win_rate": self.win_rate,
+            "net_pnl": self.net_pnl,
+            "gross_profit": self.gross_profit,
+            "gross_loss": self.gross_loss,
+            "profit_factor": self.profit_factor,
+            "average_trade": self._mean,
+            "best_trade": self.best_trade if self.trades else 0.0,
+            "worst_trade": self.worst_trade if self.trades else 0.0,
+            "max_drawdown": self.max_drawdown,
+            "max_drawdown_pct": self.max_drawdown_pct,
+            "sharpe": self.sharpe(periods_per_year),
+            "sortino": self.sortino(periods_per_year),
+            "depth_histogram": {int(d): int(self.depth_histogram[d]) for d in depths},
+        }
+
+
+class TradeLedger:
+    """
+    Closed trades stored column-wise, with running metrics.
+
+    Columns are exposed as NumPy views of the filled rows (``ledger.column("pnl")``);
+    strings are interned per ledger and stored as codes.
+    """
+
+    def __init__(self, capacity: int = 1024, starting_balance: float = 0.0):
+        self._size = 0
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in LEDGER_FIELDS.items()}
+        self._labels: Dict[str, List[str]] = {name: [] for name in _CODED_FIELDS}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in _CODED_FIELDS}
+        self.metrics = TradeMetrics(starting_balance)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        capacity = 2 * len(self._columns["pnl"])
+        for name, values in self._columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def _code(self, field: str, label: Optional[str]) -> int:
+        label = "" if label is None else str(label)
+        codes = self._codes[field]
+        code = codes.get(label)
+        if code is None:
+            code = len(codes)
+            if code > np.iinfo(LEDGER_FIELDS[field]).max:
+                raise ValueError(f"Too many distinct values for {field}")
+            codes[label] = code
+            self._labels[field].append(label)
+        return code
+
+    def append(self, pnl: float, entry_time: Optional[datetime] = None, exit_time: Optional[datetime] = None,
+               symbol1: str = "", symbol2: str = "", trade_type: str = "", exit_reason: str = "",
+               depth: int = 1, trade_id: Optional[int] = None, **fields: float) -> int:
+        """
+        Record a closed trade and update the metrics; returns its row.
+
+        ``depth`` is the number of trades in the closed basket (grid depth for
+        Gold Buy Dip). Other numeric fields (prices, lots, RSI/ATR at entry, pips,
+        leg P&L) are passed by their LEDGER_FIELDS name.
+        """
+        unknown = set(fields) - set(LEDGER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown ledger fields: {sorted(unknown)}")
+        if self._size == len(self._columns["pnl"]):
+            self._grow()
+
+        row = self._size
+        columns = self._columns
+        for name, dtype in LEDGER_FIELDS.items():
+            if np.issubdtype(dtype, np.floating):
+                columns[name][row] = fields.get(name, np.nan)
+        columns["pnl"][row] = pnl
+        columns["trade_id"][row] = row + 1 if trade_id is None else trade_id
+        columns["entry_time_us"][row] = datetime_to_us(entry_time) if entry_time else 0
+        columns["exit_time_us"][row] = datetime_to_us(exit_time) if exit_time else 0
+        columns["symbol1"][row] = self._code("symbol1", symbol1)
+        columns["symbol2"][row] = self._code("symbol2", symbol2)
+        columns["trade_type"][row] = self._code("trade_type", trade_type)
+        columns["exit_reason"][row] = self._code("exit_reason", exit_reason)
+        columns["depth"][row] = depth
+        self._size += 1
+
+        self.metrics.add(pnl, depth)
+        return row
+
+    def append_pair_trade(self, strategy: Any, entry_time: datetime, exit_time: datetime) -> int:
+        """Record the trade an RSIPairsStrategy just closed (exit fields already in its state)"""
+        state = strategy.state
+        s1_type, s2_type = LEG_DIRECTIONS.get(state.trade_direction, (state.trade_direction, state.trade_direction))
+        s1_pips = strategy.calculate_pips(strategy.symbol1, state.entry_price_s1, state.exit_price_s1, s1_type)
+        s2_pips = strategy.calculate_pips(strategy.symbol2, state.entry_price_s2, state.exit_price_s2, s2_type)
+        return self.append(
+            state.total_pnl, entry_time, exit_time,
+            symbol1=strategy.symbol1, symbol2=strategy.symbol2,
+            trade_type=state.trade_direction, exit_reason=state.exit_reason,
+            s1_entry_price=state.entry_price_s1, s1_exit_price=state.exit_price_s1,
+            s2_entry_price=state.entry_price_s2, s2_exit_price=state.exit_price_s2,
+            s1_lots=state.lot_size_s1, s2_lots=state.lot_size_s2,
+            s1_entry_rsi=state.entry_s1_rsi, s2_entry_rsi=state.entry_s2_rsi,
+            s1_entry_atr=state.entry_s1_atr, s2_entry_atr=state.entry_s2_atr,
+            hedge_ratio=state.hedge_ratio, s1_pips=s1_pips, s2_pips=s2_pips,
+            s1_pnl=state.s1_pnl, s2_pnl=state.s2_pnl,
+        )
+
+    def append_grid_basket(self, strategy: Any, trades: List[Dict[str, Any]], exit_price: float,
+                           exit_time: Optional[datetime], exit_reason: str) -> int:
+        """
+        Record a Gold Buy Dip basket closed at ``exit_price``.
+
+        ``trades`` are the strategy's grid trade dicts before they were cleared. Prices
+        are volume-weighted, pips are those of the average entry and P&L is gross of
+        costs, from the symbol registry pip value.
+        """
+        spec = strategy.symbol_registry.get(strategy.pair)
+        direction = trades[0]["direction"]
+        sign = 1.0 if direction == "BUY" else -1.0
+        lots = sum(trade["lot_size"] for trade in trades)
+        entry_price = sum(trade["price"] * trade["lot_size"] for trade in trades) / lots
+        pips = sign * (exit_price - entry_price) / spec.pip_size
+        pnl = pips * spec.pip_value_for(lots)
+        return self.append(
+            pnl, trades[0].get("open_time"), exit_time,
+            symbol1=strategy.pair, trade_type=direction, exit_reason=exit_reason, depth=len(trades),
+            s1_entry_price=entry_price, s1_exit_price=exit_price, s1_lots=lots, s1_pips=pips, s1_pnl=pnl,
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Filled columns, label tables and starting balance, e.g. for app.services.state_snapshot"""
+        return {
+            "columns": {name: values[:self._size].copy() for name, values in self._columns.items()},
+            "labels": {name: list(labels) for name, labels in self._labels.items()},
+            "starting_balance": self.metrics.starting_balance,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "TradeLedger":
+        """Rebuild a ledger written by snapshot(); metrics are recomputed from the rows"""
+        columns = snapshot["columns"]
+        size = len(columns["pnl"])
+        ledger = cls(max(size, 1024), snapshot.get("starting_balance", 0.0))
+        for name, dtype in LEDGER_FIELDS.items():
+            if name in columns:
+                ledger._columns[name][:size] = np.asarray(columns[name], dtype=dtype)
+        for name in _CODED_FIELDS:
+            labels = [str(label) for label in snapshot["labels"].get(name, [])]
+            ledger._labels[name] = labels
+            ledger._codes[name] = {label: code for code, label in enumerate(labels)}
+        ledger._size = size
+        for pnl, depth in zip(ledger._columns["pnl"][:size].tolist(), ledger._columns["depth"][:size].tolist()):
+            ledger.metrics.add(pnl, depth)
+        return ledger
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of one field for the recorded trades"""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def labels(self, name: str) -> np.ndarray:
+        """Decoded values of a coded field (symbol1, symbol2, trade_type, exit_reason)"""
+        return np.array(self._labels[name], dtype=object)[self._columns[name][:self._size]]
+
+    def metrics_dict(self, periods_per_year: Optional[float] = None) -> Dict[str, Any]:
+        return self.metrics.as_dict(periods_per_year)
+
+    def equity_curve(self) -> np.ndarray:
+        """Cumulative P&L after each trade"""
+        return np.cumsum(self._columns["pnl"][:self._size])
+
+    def nbytes(self) -> int:
+        """Bytes used by the filled rows"""
+        return sum(values.dtype.itemsize for values in self._columns.values()) * self._size
+
+    def to_frame(self):
+        """The notebook's trade_history DataFrame (pandas imported on demand)"""
+        import pandas as pd
+
+        size = self._size
+        columns = {name: values[:size] for name, values in self._columns.items()}
+        entry = columns["entry_time_us"].astype("datetime64[us]")
+        exit_ = columns["exit_time_us"].astype("datetime64[us]")
+        data = {
+            "trade_id": columns["trade_id"],
+            "trade_type": np.char.upper(self.labels("trade_type").astype(str)),
+            "entry_time": entry,
+            "exit_time": exit_,
+            "duration_hours": np.round((columns["exit_time_us"] - columns["entry_time_us"]) / 3.6e9, 2),
+            "exit_reason": self.labels("exit_reason"),
+            "symbol1": self.labels("symbol1"),
+            "symbol2": self.labels("symbol2"),
+            "total_pips": np.round(columns["s1_pips"].astype(np.float64) + columns["s2_pips"], 1),
+        }
+        for name in LEDGER_FIELDS:
+            if name in NOTEBOOK_COLUMNS and name not in data:
+                data[name] = columns[name]
+        frame = pd.DataFrame({NOTEBOOK_COLUMNS[name]: data[name] for name in NOTEBOOK_COLUMNS})
+        for name in ("s1_pips", "s2_pips"):
+            frame[NOTEBOOK_COLUMNS[name]] = frame[NOTEBOOK_COLUMNS[name]].astype(np.float64).round(1)
+        for name in ("s1_pnl", "s2_pnl", "pnl"):
+            frame[NOTEBOOK_COLUMNS[name]] = frame[NOTEBOOK_COLUMNS[name]].round(2)
+        return frame
@@ -0,0 +1,385 @@
+"""
+Write-behind persistence of trades, exits and ticket updates.
+
+Every strategy receives a SQLAlchemy ``db: Session`` and trade rows used to be
+written inline, so a slow or locked database stalled signal generation. A
+strategy with ``persistence`` set only enqueues rows on the signal path:
+
+    entries   BUY / SELL signals (Gold Buy Dip grid adds carry their grid level,
+              RSI Pairs entries both legs)                  -> strategy_trades
+    exits     CLOSE_ALL / CLOSE_BUY / CLOSE_SELL signals with exit_price_s1 / s2,
+              total_pnl and the leg P&L where the strategy tracks them
+                                                            -> strategy_exits
+    tickets   update_trade_ticket(grid_level, ticket)       -> strategy_trades.ticket
+
+A background thread drains the queue in batches of up to ``batch_size`` rows and
+writes each batch in one transaction: one executemany INSERT per table, then one
+executemany UPDATE for the tickets (a ticket always follows its trade in the
+queue, so it lands in the same or a later batch). A failed batch is rolled back
+and retried with exponential backoff; after ``max_retries`` it moves to
+``failed`` and can be requeued with ``retry_failed()``. The writer uses its own
+sessions (a Session is not thread safe), bound to the same engine as the
+strategy's session:
+
+    persistence = TradePersistence.from_session(db)
+    create_tables(db.get_bind())
+    persistence.start()
+    strategy.persistence = persistence
+    ...
+    persistence.stop()  # drains the queue first
+
+Enqueueing never blocks: when the queue is full the row is dropped and counted.
+``failed`` keeps the newest ``max_failed`` rows; older ones are discarded and
+counted in ``failed_evicted``.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, MetaData, String, Table, bindparam, insert, update
+from sqlalchemy.orm import Session
+
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import us_to_datetime
+
+logger = lazy_logger(__name__)
+
+metadata = MetaData()
+
+strategy_trades = Table(
+    "strategy_trades", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("strategy", String(32), nullable=False),
+    Column("pair", String(32), nullable=False),
+    Column("timeframe", String(8)),
+    Column("grid_level", Integer, nullable=False, default=0),
+    Column("action", String(16), nullable=False),
+    Column("lot_size", Float),
+    Column("entry_price", Float),
+    Column("lot_size_s2", Float),
+    Column("entry_price_s2", Float),
+    Column("reason", String(255)),
+    Column("ticket", String(64)),
+    Column("opened_at", DateTime),
+    Column("recorded_at", DateTime),
+    Index("ix_strategy_trades_position", "strategy", "pair", "grid_level", "opened_at"),
+)
+
+strategy_exits = Table(
+    "strategy_exits", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("strategy", String(32), nullable=False),
+    Column("pair", String(32), nullable=False),
+    Column("timeframe", String(8)),
+    Column("action", String(16), nullable=False),
+    Column("exit_reason", String(32)),
+    Column("exit_price_s1", Float),
+    Column("exit_price_s2", Float),
+    Column("total_pnl", Float),
+    Column("s1_pnl", Float),
+    Column("s2_pnl", Float),
+    Column("reason", String(255)),
+    Column("closed_at", DateTime),
+    Column("recorded_at", DateTime),
+)
+
+# Matches the trade row a ticket belongs to: one grid level of one position
+_TICKET_UPDATE = (
+    update(strategy_trades)
+    .where(strategy_trades.c.strategy == bindparam("b_strategy"),
+           strategy_trades.c.pair == bindparam("b_pair"),
+           strategy_trades.c.grid_level == bindparam("b_grid_level"),
+           strategy_trades.c.opened_at == bindparam("b_opened_at"))
+    .values(ticket=bindparam("b_ticket"))
+)
+
+EXIT_ACTIONS = ("CLOSE_ALL", "CLOSE_BUY", "CLOSE_SELL")
+
+OP_TRADE = 1
+OP_EXIT = 2
+OP_TICKET = 3
+
+_STOP = object()
+
+Operation = Tuple[int, Dict[str, Any]]
+
+
+def create_tables(bind: Any):
+    """Create strategy_trades / strategy_exits if they do not exist"""
+    metadata.create_all(bind)
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    """Bar timestamps are datetimes; raw epoch-microsecond timestamps are converted"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return us_to_datetime(int(value))
+
+
+def _action(signal: Any) -> str:
+    action = signal.action
+    return getattr(action, "value", action)
+
+
+class TradePersistence:
+    """Queues trade rows from the signal path and writes them in batches on a background thread"""
+
+    def __init__(self, session_factory: Callable[[], Session], batch_size: int = 500,
+                 flush_interval: float = 0.5, max_retries: int = 5, retry_backoff: float = 0.2,
+                 max_queue: int = 100_000, max_failed: int = 100_000):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.failed: Deque[Operation] = deque(maxlen=max_failed)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Condition()
+        self._enqueued = 0
+        self._finished = 0  # written or moved to failed
+        self.written = 0
+        self.dropped = 0
+        self.failed_evicted = 0  # oldest failed rows pushed out of a full ``failed``
+        self.batches = 0
+        self.retries = 0
+
+    @classmethod
+    def from_session(cls, db: Session, **kwargs) -> "TradePersistence":
+        """Writer with its own sessions on the engine of a strategy's ``db``"""
+        bind = db.get_bind()
+        return cls(lambda: Session(bind=bind), **kwargs)
+
+    # ------------------------------------------------------------------
+    # Signal path (never blocks)
+    # ------------------------------------------------------------------
+
+    def _put(self, op: int, row: Dict[str, Any]):
+        row["recorded_at"] = datetime.now(timezone.utc).replace(tzinfo=None)
+        try:
+            self._queue.put_nowait((op, row))
+        except queue.Full:
+            self.dropped += 1
+            logger.error(f"Trade persistence queue full, dropped {row.get('action', 'ticket')} row "
+                         f"for {row.get('pair', row.get('b_pair'))} ({self.dropped} dropped)")
+            return
+        with self._done:
+            self._enqueued += 1
+
+    def record_trade(self, strategy: Any, signal: Any, timestamp: Any, price: Optional[float] = None,
+                     grid_level: int = 0):
+        """Queue an entry (or grid add); RSI Pairs entries also store the second leg"""
+        state = getattr(strategy, "state", None)
+        entry_price = getattr(signal, "entry_price", None)
+        self._put(OP_TRADE, {
+            "strategy": strategy.strategy_name,
+            "pair": strategy.pair,
+            "timeframe": strategy.timeframe,
+            "grid_level": max(grid_level, 0),
+            "action": _action(signal),
+            "lot_size": signal.lot_size,
+            "entry_price": entry_price if entry_price is not None else price,
+            "lot_size_s2": getattr(state, "lot_size_s2", None),
+            "entry_price_s2": getattr(state, "entry_price_s2", None),
+            "reason": signal.reason,
+            "ticket": None,
+            "opened_at": _as_datetime(timestamp),
+        })
+
+    def record_exit(self, strategy: Any, signal: Any, timestamp: Any, price: Optional[float] = None):
+        """Queue an exit; exit prices and P&L come from the strategy state where it tracks them"""
+        state = getattr(strategy, "state", None)
+        exit_price_s1 = getattr(state, "exit_price_s1", None)
+        self._put(OP_EXIT, {
+            "strategy": strategy.strategy_name,
+            "pair": strategy.pair,
+            "timeframe": strategy.timeframe,
+            "action": _action(signal),
+            "exit_reason": getattr(state, "exit_reason", None),
+            "exit_price_s1": exit_price_s1 if exit_price_s1 else price,
+            "exit_price_s2": getattr(state, "exit_price_s2", None),
+            "total_pnl": getattr(state, "total_pnl", None),
+            "s1_pnl": getattr(state, "s1_pnl", None),
+            "s2_pnl": getattr(state, "s2_pnl", None),
+            "reason": signal.reason,
+            "closed_at": _as_datetime(timestamp),
+        })
+
+    def record_signal(self, strategy: Any, signal: Any, timestamp: Any, price: Optional[float] = None,
+                      grid_level: int = 0):
+        """Queue a signal as an entry or an exit depending on its action"""
+        if _action(signal) in EXIT_ACTIONS:
+            self.record_exit(strategy, signal, timestamp, price)
+        else:
+            self.record_trade(strategy, signal, timestamp, price, grid_level)
+
+    def update_ticket(self, strategy: Any, grid_level: int, ticket: str, opened_at: Any):
+        """Queue the broker ticket of an executed trade"""
+        self._put(OP_TICKET, {
+            "b_strategy": strategy.strategy_name,
+            "b_pair": strategy.pair,
+            "b_grid_level": grid_level,
+            "b_opened_at": _as_datetime(opened_at),
+            "b_ticket": str(ticket),
+        })
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pending(self) -> int:
+        with self._done:
+            return self._enqueued - self._finished
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="trade-persistence", daemon=True)
+        self._thread.start()
+        logger.info(f"Trade persistence started (batch {self.batch_size}, flush every {self.flush_interval}s)")
+
+    def stop(self, timeout: Optional[float] = 30.0):
+        """Write everything still queued, then stop the writer thread (or drain here if it never ran)"""
+        if not self.running:
+            pending = self.pending
+            if pending:
+                logger.warning(f"Trade persistence writer not running, writing {pending} pending rows")
+                self._drain()
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Trade persistence did not stop within {timeout}s ({self.pending} rows pending)")
+            return
+        self._thread = None
+        logger.info(f"Trade persistence stopped: {self.stats()}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every row queued so far is written (or failed); False on timeout"""
+        with self._done:
+            target = self._enqueued
+            return self._done.wait_for(lambda: self._finished >= target, timeout)
+
+    def retry_failed(self) -> int:
+        """Requeue the rows of batches that exhausted their retries"""
+        count = 0
+        while self.failed:
+            op, row = self.failed.popleft()
+            self._put(op, row)
+            count += 1
+        return count
+
+    def _take_batch(self) -> Tuple[List[Operation], bool]:
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return [], False
+        batch: List[Operation] = []
+        while True:
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+    def _drain(self):
+        """Write everything queued on the calling thread"""
+        while True:
+            batch: List[Operation] = []
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    batch.append(item)
+            if not batch:
+                return
+            self._write_with_retry(batch)
+
+    def _run(self):
+        while True:
+            batch, stop = self._take_batch()
+            if batch:
+                self._write_with_retry(batch)
+            if stop and self._queue.empty():
+                return
+
+    def _write_with_retry(self, batch: List[Operation]):
+        self.batches += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(batch)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._keep_failed(batch)
+                    logger.error(f"Trade persistence gave up on {len(batch)} rows after "
+                                 f"{attempt + 1} attempts: {e}")
+                    break
+                self.retries += 1
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"Trade persistence write failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.written += len(batch)
+                break
+        with self._done:
+            self._finished += len(batch)
+            self._done.notify_all()
+
+    def _keep_failed(self, batch: List[Operation]):
+        maxlen = self.failed.maxlen
+        evicted = 0 if maxlen is None else max(len(self.failed) + len(batch) - maxlen, 0)
+        self.failed.extend(batch)
+        if evicted:
+            self.failed_evicted += evicted
+            logger.error(f"Trade persistence failed rows full, discarded the {evicted} oldest "
+                         f"({self.failed_evicted} discarded)")
+
+    def _write(self, batch: List[Operation]):
+        trades = [row for op, row in batch if op == OP_TRADE]
+        exits = [row for op, row in batch if op == OP_EXIT]
+        tickets = [row for op, row in batch if op == OP_TICKET]
+        session = self.session_factory()
+        try:
+            if trades:
+                session.execute(insert(strategy_trades), trades)
+            if exits:
+                session.execute(insert(strategy_exits), exits)
+            if tickets:
+                session.execute(_TICKET_UPDATE, tickets)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._enqueued,
+            "written": self.written,
+            "pending": self.pending,
+            "failed": len(self.failed),
+            "dropped": self.dropped,
+            "failed_evicted": self.failed_evicted,
+            "batches": self.batches,
+            "retries": self.retries,
+        }
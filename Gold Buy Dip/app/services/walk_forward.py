@@ -0,0 +1,507 @@
+"""
+Walk-forward optimisation of GoldBuyDipConfig.
+
+History is split into rolling (or anchored) in-sample / out-of-sample windows.
+In each window every candidate config is scored on the in-sample bars, the best
+one is run on the following out-of-sample bars, and the out-of-sample equity
+curves are stitched into one curve: the performance the optimiser would actually
+have delivered.
+
+Indicators are computed once per distinct parameter on the full history and
+shared by every candidate and window (``IndicatorTables``):
+
+- Z-score per ``zscore_period`` (app.indicators.kernels.zscore_series)
+- ATR per ``atr_period`` (app.indicators.kernels.atr_window_series)
+- highest / lowest close of the trigger lookback per ``lookback_candles``
+
+``CandidateBatch`` then runs all candidates of a window side by side, one row per
+config, with the bar rules of ``GoldBuyDipUniverse`` (app.services.cross_sectional):
+grid take profit, percentage trigger, Z-score confirmation / timeout, ATR or
+percent grid spacing. Orders fill at the bar close and, as there, the per-instance
+drawdown stop is not modelled. Because indicators come from the full history,
+every window starts warmed up (as after ``GoldBuyDipStrategy.warm_up``) with no
+open grid; a grid still open when a window ends is closed at its last close.
+
+With ``max_workers`` the candidates are split into chunks evaluated in worker
+processes, each of which receives the indicator tables once.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import itertools
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.indicators.kernels import atr_window_series, zscore_series
+from app.services.symbol_registry import SymbolRegistry, symbol_registry
+from app.utilities.lazy_imports import lazy_logger
+
+logger = lazy_logger(__name__)
+
+# Setup state codes, as in app.services.cross_sectional
+WAITING_FOR_TRIGGER = 0
+WAITING_FOR_ZSCORE = 1
+TRADE_EXECUTED = 2
+
+Objective = Union[str, Callable[[Dict[str, float]], float]]
+
+
+def grid_candidates(base_config: Any, space: Dict[str, Sequence[Any]]) -> List[Any]:
+    """Every combination of the values in ``space`` applied to base_config (a dataclass)"""
+    names = list(space)
+    return [
+        dataclasses.replace(base_config, **dict(zip(names, values)))
+        for values in itertools.product(*(space[name] for name in names))
+    ]
+
+
+def walk_forward_windows(n_bars: int, in_sample: int, out_of_sample: int, step: Optional[int] = None,
+                         anchored: bool = False) -> List[Tuple[int, int, int, int]]:
+    """
+    (is_start, is_stop, oos_start, oos_stop) bar ranges.
+
+    Windows advance by ``step`` bars (default ``out_of_sample``, so out-of-sample
+    ranges tile the history); anchored windows keep the in-sample start at 0.
+    """
+    if in_sample <= 0 or out_of_sample <= 0:
+        raise ValueError("in_sample and out_of_sample must be positive")
+    step = step or out_of_sample
+    windows = []
+    for offset in range(0, max(n_bars - in_sample, 0), step):
+        is_stop = in_sample + offset
+        windows.append((0 if anchored else offset, is_stop, is_stop, min(is_stop + out_of_sample, n_bars)))
+    return windows
+
+
+class IndicatorTables:
+    """Full-history indicator arrays, computed once per distinct period and shared"""
+
+    def __init__(self, highs: Sequence[float], lows: Sequence[float], closes: Sequence[float]):
+        self.highs = np.ascontiguousarray(highs, dtype=np.float64)
+        self.lows = np.ascontiguousarray(lows, dtype=np.float64)
+        self.closes = np.ascontiguousarray(closes, dtype=np.float64)
+        self.zscores: Dict[int, np.ndarray] = {}
+        self.atrs: Dict[int, np.ndarray] = {}
+        self.highest: Dict[int, np.ndarray] = {}
+        self.lowest: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.closes)
+
+    def zscore(self, period: int) -> np.ndarray:
+        if period not in self.zscores:
+            self.zscores[period] = zscore_series(self.closes, period)
+        return self.zscores[period]
+
+    def atr(self, period: int) -> np.ndarray:
+        if period not in self.atrs:
+            self.atrs[period] = atr_window_series(self.highs, self.lows, self.closes, period)
+        return self.atrs[period]
+
+    def extremes(self, lookback: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Highest / lowest close of closes[i - lookback - 1:i - 1] at bar i (NaN before it exists)"""
+        if lookback not in self.highest:
+            n = len(self.closes)
+            highest = np.full(n, np.nan)
+            lowest = np.full(n, np.nan)
+            if n > lookback + 1:
+                windows = np.lib.stride_tricks.sliding_window_view(self.closes, lookback)
+                highest[lookback + 1:] = windows.max(axis=1)[:n - lookback - 1]
+                lowest[lookback + 1:] = windows.min(axis=1)[:n - lookback - 1]
+            self.highest[lookback] = highest
+            self.lowest[lookback] = lowest
+        return self.highest[lookback], self.lowest[lookback]
+
+    def prepare(self, configs: Sequence[Any]):
+        """Compute every table the given configs need"""
+        for config in configs:
+            self.zscore(config.zscore_period)
+            self.atr(config.atr_period)
+            self.extremes(config.lookback_candles)
+
+
+def _stack(tables: Dict[int, np.ndarray], keys: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows of the distinct keys and each key's row index"""
+    distinct = sorted(set(keys))
+    position = {key: i for i, key in enumerate(distinct)}
+    return np.stack([tables[key] for key in distinct]), np.array([position[key] for key in keys], dtype=np.int64)
+
+
+def _level_lots(config: Any, max_levels: int) -> np.ndarray:
+    """GoldBuyDipStrategy.calculate_grid_lot_size for every level"""
+    lots = np.zeros(max_levels)
+    for level in range(max(config.max_grid_trades, 1)):
+        if level == 0:
+            lots[level] = config.lot_size
+        elif config.use_progressive_lots:
+            lots[level] = config.lot_size * (config.lot_progression_factor ** level)
+        else:
+            lots[level] = config.lot_size * config.grid_lot_multiplier
+    return lots
+
+
+class CandidateBatch:
+    """
+    Many GoldBuyDipConfigs simulated over the same bars, one row per config.
+
+    P&L is ``(price difference) x lots x contract_size`` in the quote currency.
+    """
+
+    def __init__(self, configs: Sequence[Any], tables: IndicatorTables, point: float, contract_size: float):
+        self.configs = list(configs)
+        self.tables = tables
+        self.contract_size = contract_size
+        n = len(self.configs)
+        tables.prepare(self.configs)
+
+        self.z_table, self.z_row = _stack(tables.zscores, [c.zscore_period for c in self.configs])
+        self.atr_table, self.atr_row = _stack(tables.atrs, [c.atr_period for c in self.configs])
+        lookbacks = [c.lookback_candles for c in self.configs]
+        self.high_table, self.lookback_row = _stack(tables.highest, lookbacks)
+        self.low_table, _ = _stack(tables.lowest, lookbacks)
+
+        def column(name: str, dtype=np.float64) -> np.ndarray:
+            return np.array([getattr(c, name) for c in self.configs], dtype=dtype)
+
+        self.percentage_threshold = column("percentage_threshold")
+        self.zscore_sell = column("zscore_threshold_sell")
+        self.zscore_buy = column("zscore_threshold_buy")
+        self.wait_candles = column("zscore_wait_candles", np.int64)
+        self.use_grid = column("use_grid_trading", bool)
+        self.max_grid = column("max_grid_trades", np.int64)
+        self.use_grid_percent = column("use_grid_percent", bool)
+        self.grid_percent = column("grid_percent")
+        self.atr_multiplier = column("grid_atr_multiplier")
+        self.use_tp_percent = column("use_take_profit_percent", bool)
+        self.tp_percent = column("take_profit_percent")
+        self.tp_distance = column("take_profit") * point
+        self.lot_size = column("lot_size")
+        max_levels = max(max(c.max_grid_trades, 1) for c in self.configs)
+        self.level_lots = np.stack([_level_lots(c, max_levels) for c in self.configs])
+        self._rows = np.arange(n)
+
+        self.setup_state = np.zeros(n, dtype=np.int8)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.wait_count = np.zeros(n, dtype=np.int64)
+        self.grid_depth = np.zeros(n, dtype=np.int64)
+        self.grid_price = np.zeros((n, max_levels))
+        self.grid_lots = np.zeros((n, max_levels))
+
+    def reset(self):
+        self.setup_state[:] = WAITING_FOR_TRIGGER
+        self.direction[:] = 0
+        self.wait_count[:] = 0
+        self.grid_depth[:] = 0
+        self.grid_price[:] = 0.0
+        self.grid_lots[:] = 0.0
+
+    def floating(self, close: float) -> np.ndarray:
+        """Open grid P&L per row at ``close``"""
+        return ((close - self.grid_price) * self.grid_lots).sum(axis=1) * self.direction * self.contract_size
+
+    def _close(self, rows: np.ndarray, close: float) -> np.ndarray:
+        pnl = self.floating(close)[rows]
+        self.setup_state[rows] = WAITING_FOR_TRIGGER
+        self.grid_depth[rows] = 0
+        self.grid_price[rows] = 0.0
+        self.grid_lots[rows] = 0.0
+        return pnl
+
+    def step(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Advance every row by bar i; returns the rows whose grid closed and their P&L"""
+        close = self.tables.closes[i]
+
+        # Grid take profit
+        in_grid = np.flatnonzero(self.grid_depth > 0)
+        done = in_grid[:0]
+        pnl = np.zeros(0)
+        if len(in_grid):
+            lots = self.grid_lots[in_grid]
+            vwap = (self.grid_price[in_grid] * lots).sum(axis=1) / lots.sum(axis=1)
+            direction = self.direction[in_grid]
+            take_profit = np.where(self.use_tp_percent[in_grid],
+                                   vwap * (1 + direction * self.tp_percent[in_grid] / 100),
+                                   vwap + direction * self.tp_distance[in_grid])
+            hit = ((direction == 1) & (close >= take_profit)) | ((direction == -1) & (close <= take_profit))
+            done = in_grid[hit]
+            if len(done):
+                pnl = self._close(done, close)
+        state = self.setup_state.copy()
+        state[done] = -1
+
+        # Percentage trigger: previous close against the lookback range before it
+        waiting = np.flatnonzero(state == WAITING_FOR_TRIGGER)
+        if len(waiting) and i >= 1:
+            highest = self.high_table[self.lookback_row[waiting], i]
+            lowest = self.low_table[self.lookback_row[waiting], i]
+            current = self.tables.closes[i - 1]
+            threshold = self.percentage_threshold[waiting]
+            valid = (lowest > 0) & (highest > 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sell = valid & (((current - lowest) / lowest) * 100 >= threshold)
+                buy = valid & ~sell & (((current - highest) / highest) * 100 <= -threshold)
+            self.direction[waiting[sell]] = -1
+            self.direction[waiting[buy]] = 1
+            triggered = waiting[sell | buy]
+            self.setup_state[triggered] = WAITING_FOR_ZSCORE
+            self.wait_count[triggered] = 0
+
+        # Z-score confirmation or timeout
+        confirming = np.flatnonzero(state == WAITING_FOR_ZSCORE)
+        if len(confirming):
+            self.wait_count[confirming] += 1
+            z = self.z_table[self.z_row[confirming], i]
+            direction = self.direction[confirming]
+            confirmed = ((direction == -1) & (z >= self.zscore_sell[confirming])) | \
+                        ((direction == 1) & (z <= self.zscore_buy[confirming]))
+            entries = confirming[confirmed]
+            self.setup_state[entries] = TRADE_EXECUTED
+            self.grid_depth[entries] = 1
+            self.grid_price[entries, 0] = close
+            self.grid_lots[entries, 0] = self.lot_size[entries]
+            expired = confirming[~confirmed & (self.wait_count[confirming] > self.wait_candles[confirming])]
+            self.setup_state[expired] = WAITING_FOR_TRIGGER
+            self.direction[expired] = 0
+
+        # Grid additions
+        executed = np.flatnonzero((state == TRADE_EXECUTED) & self.use_grid)
+        depth = self.grid_depth[executed]
+        executed = executed[(depth > 0) & (depth < self.max_grid[executed])]
+        if len(executed):
+            depth = self.grid_depth[executed]
+            last_price = self.grid_price[executed, depth - 1]
+            atr = self.atr_table[self.atr_row[executed], i]
+            spacing = np.where(self.use_grid_percent[executed],
+                               last_price * (self.grid_percent[executed] / 100),
+                               np.where(atr <= 0, 0.001, atr * self.atr_multiplier[executed]))
+            against = (last_price - close) * self.direction[executed]
+            hit = against >= spacing
+            adds = executed[hit]
+            levels = depth[hit]
+            self.grid_price[adds, levels] = close
+            self.grid_lots[adds, levels] = self.level_lots[adds, levels]
+            self.grid_depth[adds] = levels + 1
+
+        return done, pnl
+
+    def run(self, start: int, stop: int, capital: float, record_equity: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Simulate bars [start, stop) from a flat state; open grids are closed at the end.
+
+        Returns per-row metric arrays, plus the (rows x bars) equity matrix when
+        ``record_equity`` is set.
+        """
+        self.reset()
+        n = len(self.configs)
+        realised = np.zeros(n)
+        peak = np.full(n, float(capital))
+        max_drawdown = np.zeros(n)
+        max_drawdown_pct = np.zeros(n)
+        trades = np.zeros(n, dtype=np.int64)
+        wins = np.zeros(n, dtype=np.int64)
+        gross_profit = np.zeros(n)
+        gross_loss = np.zeros(n)
+        equity_curve = np.empty((n, stop - start)) if record_equity else None
+
+        def book(rows: np.ndarray, pnl: np.ndarray):
+            realised[rows] += pnl
+            trades[rows] += 1
+            wins[rows] += pnl > 0
+            gross_profit[rows] += np.maximum(pnl, 0.0)
+            gross_loss[rows] -= np.minimum(pnl, 0.0)
+
+        closes = self.tables.closes
+        for i in range(start, stop):
+            rows, pnl = self.step(i)
+            if len(rows):
+                book(rows, pnl)
+            if i == stop - 1:
+                open_rows = np.flatnonzero(self.grid_depth > 0)
+                if len(open_rows):
+                    book(open_rows, self._close(open_rows, closes[i]))
+                equity = capital + realised
+            else:
+                equity = capital + realised + self.floating(closes[i])
+            np.maximum(peak, equity, out=peak)
+            drawdown = peak - equity
+            np.maximum(max_drawdown, drawdown, out=max_drawdown)
+            np.maximum(max_drawdown_pct, drawdown / peak * 100, out=max_drawdown_pct)
+            if equity_curve is not None:
+                equity_curve[:, i - start] = equity
+
+        result = {
+            "net_pnl": realised,
+            "trades": trades,
+            "wins": wins,
+            "gross_profit": gross_profit,
+            "gross_loss": gross_loss,
+            "max_drawdown": max_drawdown,
+            "max_drawdown_pct": max_drawdown_pct,
+        }
+        if equity_curve is not None:
+            result["equity"] = equity_curve
+        return result
+
+
+def score(metrics: Dict[str, float], objective: Objective = "recovery", min_trades: int = 1) -> float:
+    """
+    Rank of one candidate's in-sample metrics (higher is better).
+
+    Objectives: "net_pnl", "profit_factor", "recovery" (net P&L / max drawdown) or a
+    callable taking the metrics dict. Candidates with fewer than ``min_trades``
+    closed grids score -inf.
+    """
+    if metrics["trades"] < min_trades:
+        return -math.inf
+    if callable(objective):
+        return float(objective(metrics))
+    if objective == "net_pnl":
+        return metrics["net_pnl"]
+    if objective == "profit_factor":
+        if metrics["gross_loss"] == 0:
+            return math.inf if metrics["gross_profit"] > 0 else 0.0
+        return metrics["gross_profit"] / metrics["gross_loss"]
+    if objective == "recovery":
+        if metrics["max_drawdown"] == 0:
+            return math.inf if metrics["net_pnl"] > 0 else metrics["net_pnl"]
+        return metrics["net_pnl"] / metrics["max_drawdown"]
+    raise ValueError(f"Unknown objective {objective!r}")
+
+
+def _rows_to_dicts(result: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    names = [name for name in result if name != "equity"]
+    return [{name: result[name][row].item() for name in names} for row in range(len(result["net_pnl"]))]
+
+
+# Worker process state: the tables are sent once per worker by the pool initializer
+_worker_tables: Optional[IndicatorTables] = None
+
+
+def _init_worker(tables: IndicatorTables):
+    global _worker_tables
+    _worker_tables = tables
+
+
+def _evaluate_chunk(configs: Sequence[Any], start: int, stop: int, point: float, contract_size: float,
+                    capital: float) -> List[Dict[str, float]]:
+    batch = CandidateBatch(configs, _worker_tables, point, contract_size)
+    return _rows_to_dicts(batch.run(start, stop, capital))
+
+
+@dataclass
+class WalkForwardWindow:
+    """One in-sample / out-of-sample step"""
+    index: int
+    is_range: Tuple[int, int]
+    oos_range: Tuple[int, int]
+    best_config: Any
+    best_score: float
+    is_metrics: Dict[str, float]
+    oos_metrics: Dict[str, float]
+
+
+@dataclass
+class WalkForwardResult:
+    """Stitched out-of-sample equity and the per-window choices"""
+    windows: List[WalkForwardWindow]
+    equity: np.ndarray  # one value per out-of-sample bar
+    bar_index: np.ndarray  # history index of each equity value
+    capital: float
+    seconds: float = 0.0
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+
+class WalkForwardOptimizer:
+    """
+    Walk-forward search over GoldBuyDipConfig candidates for one symbol.
+
+    ``objective`` and ``min_trades`` are passed to ``score``. ``max_workers`` > 1
+    evaluates candidates in that many processes, ``chunk_size`` configs per task.
+    """
+
+    def __init__(self, highs: Sequence[float], lows: Sequence[float], closes: Sequence[float],
+                 symbol: str = "XAUUSD", capital: float = 10000.0, objective: Objective = "recovery",
+                 min_trades: int = 1, max_workers: Optional[int] = None, chunk_size: int = 256,
+                 registry: Optional[SymbolRegistry] = None):
+        self.tables = IndicatorTables(highs, lows, closes)
+        registry = registry or symbol_registry
+        spec = registry.get(symbol)
+        self.symbol = symbol
+        self.point = spec.point
+        self.contract_size = spec.contract_size
+        self.capital = capital
+        self.objective = objective
+        self.min_trades = min_trades
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+
+    def evaluate(self, configs: Sequence[Any], start: int, stop: int,
+                 executor: Optional[ProcessPoolExecutor] = None) -> List[Dict[str, float]]:
+        """Metrics of every config on bars [start, stop), in config order"""
+        if executor is None:
+            batch = CandidateBatch(configs, self.tables, self.point, self.contract_size)
+            return _rows_to_dicts(batch.run(start, stop, self.capital))
+        chunks = [configs[i:i + self.chunk_size] for i in range(0, len(configs), self.chunk_size)]
+        futures = [
+            executor.submit(_evaluate_chunk, chunk, start, stop, self.point, self.contract_size, self.capital)
+            for chunk in chunks
+        ]
+        return [metrics for future in futures for metrics in future.result()]
+
+    def run(self, configs: Sequence[Any], in_sample: int, out_of_sample: int, step: Optional[int] = None,
+            anchored: bool = False) -> WalkForwardResult:
+        """Optimise on each in-sample window and stitch the out-of-sample runs of the winners"""
+        started = time.perf_counter()
+        configs = list(configs)
+        if not configs:
+            raise ValueError("No candidate configs")
+        windows = walk_forward_windows(len(self.tables), in_sample, out_of_sample, step, anchored)
+        if not windows:
+            raise ValueError(f"History of {len(self.tables)} bars is too short for in_sample={in_sample}")
+        self.tables.prepare(configs)
+
+        executor = None
+        if self.max_workers and self.max_workers > 1:
+            executor = ProcessPoolExecutor(self.max_workers, initializer=_init_worker, initargs=(self.tables,))
+        results: List[WalkForwardWindow] = []
+        curves: List[np.ndarray] = []
+        indices: List[np.ndarray] = []
+        equity = self.capital
+        try:
+            for index, (is_start, is_stop, oos_start, oos_stop) in enumerate(windows):
+                candidates = self.evaluate(configs, is_start, is_stop, executor)
+                scores = [score(metrics, self.objective, self.min_trades) for metrics in candidates]
+                best = int(np.argmax(scores))
+
+                # Out-of-sample run of the winner, continuing from the stitched equity
+                batch = CandidateBatch([configs[best]], self.tables, self.point, self.contract_size)
+                oos = batch.run(oos_start, oos_stop, equity, record_equity=True)
+                curve = oos["equity"][0]
+                curves.append(curve)
+                indices.append(np.arange(oos_start, oos_stop))
+                equity = float(curve[-1])
+
+                results.append(WalkForwardWindow(index, (is_start, is_stop), (oos_start, oos_stop), configs[best],
+                                                 scores[best], candidates[best], _rows_to_dicts(oos)[0]))
+                logger.info(f"Walk-forward window {index + 1}/{len(windows)}: best score {scores[best]:.3f}, "
+                            f"out-of-sample P&L {results[-1].oos_metrics['net_pnl']:.2f}")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        curve = np.concatenate(curves)
+        peak = np.maximum.accumulate(np.concatenate(([self.capital], curve)))[1:]
+        metrics = {
+            "net_pnl": float(curve[-1] - self.capital),
+            "trades": int(sum(w.oos_metrics["trades"] for w in results)),
+            "max_drawdown": float((peak - curve).max()),
+            "max_drawdown_pct": float(((peak - curve) / peak).max() * 100),
+        }
+        return WalkForwardResult(results, curve, np.concatenate(indices), self.capital,
+                                 time.perf_counter() - started, metrics)
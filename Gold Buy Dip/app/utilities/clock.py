@@ -0,0 +1,71 @@
+"""
+Injectable clocks for strategies.
+
+Strategies that stamp entry times or compare trade age (RSI Pairs' max_trade_hours,
+RSI 6 Trades' position times) ask ``self.clock.now()`` instead of calling
+``datetime.now()``. Live, that is the system clock. In replay a ``ReplayClock`` is
+driven by the candle (or tick) timestamps the strategy is fed, so the production
+classes can be replayed as fast as the data can be read and time-based exits still
+trigger on market time.
+
+Strategies call ``clock.observe(candle.timestamp)`` at the start of every bar; the
+system clock ignores it.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+
+class Clock:
+    """Source of "now" for a strategy"""
+
+    def now(self) -> datetime:
+        raise NotImplementedError
+
+    def observe(self, timestamp: Any):
+        """Called with every processed candle/tick timestamp"""
+
+
+class SystemClock(Clock):
+    """Wall-clock time, as used by the live strategies"""
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+
+class ReplayClock(Clock):
+    """
+    Market time taken from the data being replayed.
+
+    Time is kept as a naive datetime like the system clock: numeric timestamps
+    (epoch seconds, as in MT5 rates arrays) and aware datetimes are converted to
+    naive UTC. Time never moves backwards: an older timestamp (e.g. a late tick)
+    leaves the clock where it is.
+    """
+
+    def __init__(self, start: Optional[datetime] = None):
+        self._now = start
+
+    def now(self) -> datetime:
+        if self._now is None:
+            raise RuntimeError("ReplayClock has not observed any timestamp yet")
+        return self._now
+
+    def observe(self, timestamp: Any):
+        if timestamp is None:
+            return
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.fromtimestamp(float(timestamp), tz=timezone.utc)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        if self._now is None or timestamp > self._now:
+            self._now = timestamp
+
+    def set(self, timestamp: datetime):
+        """Move the clock to an exact time, also backwards (e.g. between replay runs)"""
+        self._now = timestamp
+
+
+system_clock = SystemClock()
@@ -0,0 +1,189 @@
+"""
+Fixed-point prices: integer numbers of points.
+
+Strategies compare float prices with levels built from float arithmetic
+(``vwap + take_profit * point``, ``last_price - close >= atr * multiplier``), so a
+take profit exactly reached can be missed by 1e-13. Expressed in the symbol's
+points (``SymbolSpec.point``: 0.01 for XAUUSD, 0.00001 for 5-digit FX) every
+quoted price is an integer, and so is every level that matters:
+
+- a BUY grid closes at the first point at or above its take profit, i.e. at
+  ``ceil(vwap + tp)`` points (``floor(vwap - tp)`` for SELL); with lots counted in
+  volume steps that is integer / rational arithmetic with no rounding
+- a grid step is reached when the whole-point move is at least
+  ``ceil(spacing)`` points
+
+``PriceScale`` converts between prices and points (the API edge); the helpers
+below do the basket math on points. ``ohlc_to_points`` turns an OHLC column dict
+(app.utilities.ohlc_arrays) into integer columns, int32 when the values fit, which
+is half the size of float64 and compresses far better (app.services.candle_archive).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.utilities.ohlc_arrays import OHLC_FIELDS
+
+_INT32 = np.iinfo(np.int32)
+
+
+def exact(value: float) -> Fraction:
+    """Decimal value of a config float (0.1 -> 1/10, not the binary 0.1000000000000000055...)"""
+    return Fraction(repr(float(value)))
+
+
+@dataclass(frozen=True)
+class PriceScale:
+    """Conversion between prices and integer points for one symbol"""
+    point: float
+
+    @classmethod
+    def for_symbol(cls, symbol: str, registry: Any = None) -> "PriceScale":
+        if registry is None:
+            from app.services.symbol_registry import symbol_registry as registry
+        return cls(registry.get(symbol).point)
+
+    def to_points(self, price: float) -> int:
+        return int(round(price / self.point))
+
+    @property
+    def per_unit(self) -> Optional[int]:
+        """Points per 1.0 of price (100 for 0.01) when whole, which makes to_price exact"""
+        inverse = 1 / self.point
+        return int(round(inverse)) if abs(inverse - round(inverse)) < 1e-6 else None
+
+    def to_price(self, points: int) -> float:
+        # points / 100 is correctly rounded (the float of "2000.01"); points * 0.01 is not
+        per_unit = self.per_unit
+        return points / per_unit if per_unit else points * self.point
+
+    def points_array(self, prices: Sequence[float], dtype: Any = np.int64) -> np.ndarray:
+        return np.rint(np.asarray(prices, dtype=np.float64) / self.point).astype(dtype)
+
+    def prices_array(self, points: np.ndarray) -> np.ndarray:
+        per_unit = self.per_unit
+        points = np.asarray(points, dtype=np.float64)
+        return points / per_unit if per_unit else points * self.point
+
+    def distance_points(self, distance: float) -> Fraction:
+        """A price distance (e.g. ATR x multiplier) in points, exactly as configured"""
+        return exact(distance) / exact(self.point)
+
+
+def compact_dtype(*arrays: np.ndarray) -> Any:
+    """int32 when every value fits, else int64"""
+    for values in arrays:
+        if len(values) and (values.min() < _INT32.min or values.max() > _INT32.max):
+            return np.int64
+    return np.int32
+
+
+def ohlc_to_points(arrays: Dict[str, Any], scale: PriceScale, dtype: Any = None) -> Dict[str, Any]:
+    """Integer-point copy of an OHLC column dict; ``dtype`` defaults to compact_dtype"""
+    points = {name: scale.points_array(arrays[name]) for name in OHLC_FIELDS}
+    dtype = dtype or compact_dtype(*points.values())
+    result = {name: values.astype(dtype) for name, values in points.items()}
+    result["timestamp"] = np.asarray(arrays["timestamp"], dtype=np.int64)
+    result["timestamp_kind"] = arrays.get("timestamp_kind", 0)
+    result["point"] = scale.point
+    return result
+
+
+def points_to_ohlc(arrays: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of ohlc_to_points: float64 OHLC columns"""
+    scale = PriceScale(arrays["point"])
+    result = {name: scale.prices_array(arrays[name]) for name in OHLC_FIELDS}
+    result["timestamp"] = arrays["timestamp"]
+    result["timestamp_kind"] = arrays.get("timestamp_kind", 0)
+    return result
+
+
+def lot_units(lot_size: float, lot_step: float) -> int:
+    """Lots as a whole number of volume steps (orders are normalised to the step anyway)"""
+    return int(round(lot_size / lot_step))
+
+
+def _ceil(value: Fraction) -> int:
+    return -((-value.numerator) // value.denominator)
+
+
+def _floor(value: Fraction) -> int:
+    return value.numerator // value.denominator
+
+
+def take_profit_level(prices: Sequence[int], units: Sequence[int], direction: int,
+                      take_profit_points: Optional[float] = None,
+                      take_profit_percent: Optional[float] = None) -> Optional[int]:
+    """
+    Whole-point price at which a grid's volume-weighted take profit is reached.
+
+    ``prices`` in points and ``units`` in volume steps per grid trade; direction +1
+    for BUY (returns the first point at or above the target) or -1 for SELL (first
+    point at or below). Either a distance in points or a percent of the VWAP.
+    """
+    total = sum(units)
+    if total == 0:
+        return None
+    vwap = Fraction(sum(p * u for p, u in zip(prices, units)), total)
+    if take_profit_percent is not None:
+        target = vwap * (1 + direction * exact(take_profit_percent) / 100)
+    else:
+        target = vwap + direction * exact(take_profit_points or 0)
+    return _ceil(target) if direction > 0 else _floor(target)
+
+
+def take_profit_reached(close: int, level: int, direction: int) -> bool:
+    return close >= level if direction > 0 else close <= level
+
+
+def atr_points(highs: Sequence[int], lows: Sequence[int], closes: Sequence[int], period: int) -> Optional[Fraction]:
+    """
+    MT4 ATR of the last ``period`` bars in points (app.indicators.atr semantics).
+
+    Each bar's true range is taken against the previous close; None when there are
+    fewer than ``period + 2`` bars, where calculate_atr returns its 0.001 default.
+    """
+    n = len(closes)
+    if n < period + 2:
+        return None
+    total = 0
+    for current in range(n - period, n):
+        high, low, prev_close = int(highs[current]), int(lows[current]), int(closes[current - 1])
+        total += max(high - low, abs(high - prev_close), abs(low - prev_close))
+    return Fraction(total, period)
+
+
+def grid_spacing_points(scale: PriceScale, last_price: int, grid_percent: Optional[float] = None,
+                        atr: Optional[Fraction] = None, atr_multiplier: float = 1.0) -> int:
+    """
+    Whole points the price must move against the grid to add a level.
+
+    Percent spacing is taken from the last grid price; ATR spacing from ``atr`` in
+    points (None: the 0.001 price fallback of calculate_grid_spacing).
+    """
+    if grid_percent is not None:
+        spacing = last_price * exact(grid_percent) / 100
+    elif atr is None:
+        spacing = scale.distance_points(0.001) * exact(atr_multiplier)
+    elif atr <= 0:
+        spacing = scale.distance_points(0.001)
+    else:
+        spacing = atr * exact(atr_multiplier)
+    return max(_ceil(spacing), 0)
+
+
+def grid_step_reached(last_price: int, close: int, direction: int, spacing: int) -> bool:
+    """Price moved against the grid (down for BUY, up for SELL) by at least ``spacing`` points"""
+    return (last_price - close) * direction >= spacing
+
+
+def check_points(values: Sequence[float], scale: PriceScale, tolerance: float = 1e-6) -> bool:
+    """Whether prices sit on the point grid (off-grid data would be rounded by conversion)"""
+    points = np.asarray(values, dtype=np.float64) / scale.point
+    return bool(np.all(np.abs(points - np.rint(points)) <= tolerance)) if len(points) else True
+
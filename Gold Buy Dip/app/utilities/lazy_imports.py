@@ -0,0 +1,78 @@
+"""
+Deferred imports for the strategy modules.
+
+The signal core of a strategy (state machine + indicators) only needs the
+standard library and NumPy. Logging, database and broker integrations are pulled
+in through the helpers below on first use, so importing a strategy in a research
+notebook, a backtest worker or a freshly spawned process stays cheap.
+"""
+
+from __future__ import annotations
+
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyLogger:
+    """
+    Stand-in for ``forex_logger.get_logger(name)`` that is resolved on first use.
+
+    Any attribute access (``logger.info``, ``logger.error``, ...) imports
+    app.utilities.forex_logger, creates the real logger and forwards to it.
+    """
+
+    __slots__ = ("_name", "_logger")
+
+    def __init__(self, name: str):
+        self._name = name
+        self._logger = None
+
+    def _resolve(self):
+        if self._logger is None:
+            from app.utilities.forex_logger import forex_logger
+            self._logger = forex_logger.get_logger(self._name)
+        return self._logger
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._resolve(), attr)
+
+
+def lazy_logger(name: str) -> LazyLogger:
+    """Module-level logger that imports the logging stack on first use"""
+    return LazyLogger(name)
+
+
+def get_forex_logger() -> Any:
+    """The shared forex_logger instance, imported on demand"""
+    from app.utilities.forex_logger import forex_logger as instance
+    return instance
+
+
+class OptionalModule:
+    """
+    An optional third-party module imported the first time it is needed.
+
+    ``get()`` returns the module, or None when it is not installed; the ImportError
+    is kept in ``import_error`` so callers can chain it into their own exception.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.import_error: Optional[ImportError] = None
+        self._module: Optional[ModuleType] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[ModuleType]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._module = importlib.import_module(self.name)
+                    except ImportError as exc:
+                        self._module = None
+                        self.import_error = exc
+                    self._loaded = True
+        return self._module
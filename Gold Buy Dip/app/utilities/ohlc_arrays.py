@@ -0,0 +1,124 @@
+"""
+Columnar OHLC helpers.
+
+Strategies keep their candle buffers as lists of ``MarketData`` objects (or plain
+dicts for RSI Pairs). These helpers convert such buffers to and from one NumPy
+column per field so they can be stored, shipped and sliced cheaply.
+
+Timestamps are stored as int64 microseconds since the Unix epoch together with a
+``timestamp_kind`` flag, so naive datetimes, UTC-aware datetimes and raw numeric
+timestamps all round-trip unchanged.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+OHLC_FIELDS = ("open", "high", "low", "close")
+
+TIMESTAMP_NAIVE = 0
+TIMESTAMP_UTC = 1
+TIMESTAMP_RAW = 2
+
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_ONE_US = timedelta(microseconds=1)
+
+
+def datetime_to_us(value: datetime) -> int:
+    """Epoch microseconds for a naive (treated as UTC) or aware datetime"""
+    if value.tzinfo is None:
+        return (value - _EPOCH_NAIVE) // _ONE_US
+    return (value - _EPOCH_UTC) // _ONE_US
+
+
+def us_to_datetime(value: int, kind: int = TIMESTAMP_NAIVE) -> Any:
+    """Inverse of datetime_to_us for the given timestamp kind"""
+    if kind == TIMESTAMP_RAW:
+        return int(value)
+    if kind == TIMESTAMP_UTC:
+        return _EPOCH_UTC + timedelta(microseconds=int(value))
+    return _EPOCH_NAIVE + timedelta(microseconds=int(value))
+
+
+def timestamp_kind(value: Any) -> int:
+    """Classify a timestamp so it can be restored with the same type"""
+    if isinstance(value, datetime):
+        return TIMESTAMP_NAIVE if value.tzinfo is None else TIMESTAMP_UTC
+    return TIMESTAMP_RAW
+
+
+def ohlc_length(arrays: Dict[str, Any]) -> int:
+    """Number of bars in a column dict, checking that all columns agree"""
+    lengths = {name: len(arrays[name]) for name in ("timestamp",) + OHLC_FIELDS}
+    if len(set(lengths.values())) > 1:
+        raise ValueError(f"OHLC columns have different lengths: {lengths}")
+    return lengths["close"]
+
+
+def tail_start(arrays: Dict[str, Any], count: int) -> int:
+    """Start offset of the last ``count`` bars of a column dict"""
+    return max(0, ohlc_length(arrays) - count)
+
+
+def candles_to_arrays(candles: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Convert a candle buffer into columns.
+
+    Accepts ``MarketData``-like objects or dicts with timestamp/open/high/low/close.
+    Returns a dict with ``timestamp`` (int64 us), one float64 array per OHLC field and
+    ``timestamp_kind``.
+    """
+    n = len(candles)
+    columns: Dict[str, Any] = {name: np.empty(n, dtype=np.float64) for name in OHLC_FIELDS}
+    timestamps = np.empty(n, dtype=np.int64)
+    kind = TIMESTAMP_NAIVE
+
+    if n:
+        as_dict = isinstance(candles[0], dict)
+        first_ts = candles[0]["timestamp"] if as_dict else candles[0].timestamp
+        kind = timestamp_kind(first_ts)
+        for i, candle in enumerate(candles):
+            if as_dict:
+                ts = candle["timestamp"]
+                o, h, l, c = candle["open"], candle["high"], candle["low"], candle["close"]
+            else:
+                ts = candle.timestamp
+                o, h, l, c = candle.open, candle.high, candle.low, candle.close
+            timestamps[i] = int(ts) if kind == TIMESTAMP_RAW else datetime_to_us(ts)
+            columns["open"][i] = o
+            columns["high"][i] = h
+            columns["low"][i] = l
+            columns["close"][i] = c
+
+    columns["timestamp"] = timestamps
+    columns["timestamp_kind"] = kind
+    return columns
+
+
+def _rows(arrays: Dict[str, Any], start: int):
+    kind = int(arrays.get("timestamp_kind", TIMESTAMP_NAIVE))
+    timestamps = np.asarray(arrays["timestamp"][start:]).tolist()
+    opens = np.asarray(arrays["open"][start:], dtype=np.float64).tolist()
+    highs = np.asarray(arrays["high"][start:], dtype=np.float64).tolist()
+    lows = np.asarray(arrays["low"][start:], dtype=np.float64).tolist()
+    closes = np.asarray(arrays["close"][start:], dtype=np.float64).tolist()
+    for ts, o, h, l, c in zip(timestamps, opens, highs, lows, closes):
+        timestamp = ts if isinstance(ts, datetime) else us_to_datetime(ts, kind)
+        yield timestamp, o, h, l, c
+
+
+def arrays_to_candles(arrays: Dict[str, Any], candle_cls: Any, start: int = 0) -> List[Any]:
+    """Materialise ``candle_cls`` objects (e.g. MarketData) from columns[start:]"""
+    return [candle_cls(timestamp=ts, open=o, high=h, low=l, close=c) for ts, o, h, l, c in _rows(arrays, start)]
+
+
+def arrays_to_candle_dicts(arrays: Dict[str, Any], start: int = 0) -> List[Dict[str, Any]]:
+    """Materialise RSI Pairs style candle dicts from columns[start:]"""
+    return [
+        {'timestamp': ts, 'open': o, 'high': h, 'low': l, 'close': c}
+        for ts, o, h, l, c in _rows(arrays, start)
+    ]
@@ -1,33 +1,128 @@
-from typing import List, Optional, Dict
+from typing import TYPE_CHECKING, List, Optional, Dict
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy.orm import Session
 from app.models.trading_models import MarketData, TradeSignal, TradeDirection, SetupState
 from app.models.strategy_models import GoldBuyDipConfig, GoldBuyDipState
-from app.indicators.zscore import calculate_zscore
-from app.indicators.atr import calculate_atr
-from app.utilities.forex_logger import forex_logger
-from app.services.strategy_performance_tracker import StrategyPerformanceTracker
+# Compiled kernels when available, otherwise app.indicators.zscore / app.indicators.atr
+from app.indicators.kernels import calculate_zscore, calculate_atr
 from app.services.base_strategy import BaseStrategy
-from app.services.mt5_margin_validator import MT5MarginValidator
+from app.services.margin_service import MarginCheck, margin_service
+from app.services.symbol_registry import symbol_registry
+from app.utilities import fixed_point
+from app.utilities.fixed_point import PriceScale
+from app.utilities.lazy_imports import get_forex_logger, lazy_logger
+from app.utilities.ohlc_arrays import candles_to_arrays, arrays_to_candles, tail_start
 
-logger = forex_logger.get_logger(__name__)
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+    from app.services.strategy_performance_tracker import StrategyPerformanceTracker
+    from app.services.mt5_margin_validator import MT5MarginValidator
+    from app.services.equity_monitor import EquityMonitor
+    from app.services.event_journal import EventJournal
+    from app.services.trade_persistence import TradePersistence
+    from app.services.status_board import StatusBoard
+    from app.services.trade_ledger import TradeLedger
+
+logger = lazy_logger(__name__)
 
 class GoldBuyDipStrategy(BaseStrategy):
-    def __init__(self, config: GoldBuyDipConfig, pair: str, timeframe: str = "15M", db: Session = None):
+    def __init__(self, config: GoldBuyDipConfig, pair: str, timeframe: str = "15M", db: "Session" = None):
         super().__init__(pair, timeframe, "gold_buy_dip", db)
         self.config = config
         self.state = GoldBuyDipState()
         self.candles: List[MarketData] = []
-        self.performance_tracker = StrategyPerformanceTracker(timeframe)
-        self.margin_validator = MT5MarginValidator()
+        self._performance_tracker: Optional["StrategyPerformanceTracker"] = None
+        self._margin_validator: Optional["MT5MarginValidator"] = None
         self.is_gold = "XAU" in pair
+        self.symbol_registry = symbol_registry
+        self.margin_service = margin_service
+        self.equity_monitor: Optional["EquityMonitor"] = None
+        self.equity_key: Optional[str] = None
+        self._close_all_request: Optional[str] = None
+        # Grid take profit and spacing checks in integer points (app.utilities.fixed_point)
+        self.price_scale: Optional[PriceScale] = (
+            PriceScale.for_symbol(pair, self.symbol_registry)
+            if getattr(config, "use_fixed_point_prices", False) else None
+        )
+        # Optional binary record of state transitions and signals (app.services.event_journal)
+        self.journal: Optional["EventJournal"] = None
+        # Optional write-behind trade rows and ticket updates (app.services.trade_persistence)
+        self.persistence: Optional["TradePersistence"] = None
+        # Optional per-bar status snapshots for dashboards (app.services.status_board)
+        self.status_board: Optional["StatusBoard"] = None
+        self.status_key: Optional[str] = None
+        # Optional columnar history of closed baskets (app.services.trade_ledger), shared or per instance
+        self.trade_ledger: Optional["TradeLedger"] = None
+    
+    @property
+    def performance_tracker(self) -> "StrategyPerformanceTracker":
+        """Created on first use so the DB-backed tracker is not imported with the strategy"""
+        if self._performance_tracker is None:
+            from app.services.strategy_performance_tracker import StrategyPerformanceTracker
+            self._performance_tracker = StrategyPerformanceTracker(self.timeframe)
+        return self._performance_tracker
+    
+    @performance_tracker.setter
+    def performance_tracker(self, tracker: "StrategyPerformanceTracker"):
+        self._performance_tracker = tracker
+    
+    @property
+    def margin_validator(self) -> "MT5MarginValidator":
+        """Legacy per-instance validator; margin pre-checks go through the shared margin_service"""
+        if self._margin_validator is None:
+            from app.services.mt5_margin_validator import MT5MarginValidator
+            self._margin_validator = MT5MarginValidator()
+        return self._margin_validator
+    
+    @margin_validator.setter
+    def margin_validator(self, validator: "MT5MarginValidator"):
+        self._margin_validator = validator
+    
+    def _max_candles(self) -> int:
+        """Number of candles kept in the buffer"""
+        return max(self.config.lookback_candles, self.config.zscore_period, self.config.atr_period) + 10
     
     def add_candle(self, candle: MarketData):
         self.candles.append(candle)
-        max_needed = max(self.config.lookback_candles, self.config.zscore_period, self.config.atr_period) + 10
+        max_needed = self._max_candles()
+        if len(self.candles) > max_needed:
+            self.candles = self.candles[-max_needed:]
+    
+    def warm_up(self, ohlc_arrays: Dict) -> int:
+        """
+        Seed the candle buffer from a block of history in one call.
+        
+        ohlc_arrays holds timestamp/open/high/low/close columns (see
+        app.utilities.ohlc_arrays). Only the tail kept by the buffer is materialised;
+        no signals are evaluated and nothing is logged. Returns the buffer length.
+        """
+        self.candles = arrays_to_candles(ohlc_arrays, MarketData, tail_start(ohlc_arrays, self._max_candles()))
+        return len(self.candles)
+    
+    def fast_forward(self, candles: List[MarketData]) -> int:
+        """
+        Buffer stale bars without evaluating signals (catch-up, see app.services.catch_up).
+        
+        Only the newest bar of a backlog goes through _process_market_data. A pending
+        z-score wait still counts the skipped bars and times out as it would have bar
+        by bar. Returns the number of bars skipped.
+        """
+        if not candles:
+            return 0
+        self.candles.extend(candles)
+        max_needed = self._max_candles()
         if len(self.candles) > max_needed:
             self.candles = self.candles[-max_needed:]
+        
+        if self.state.setup_state == SetupState.WAITING_FOR_ZSCORE:
+            self.state.wait_candles_count += len(candles)
+            if self.state.wait_candles_count > self.config.zscore_wait_candles:
+                logger.info(f"Z-score confirmation timeout after {self.config.zscore_wait_candles} candles (catch-up)")
+                self.state.setup_state = SetupState.WAITING_FOR_TRIGGER
+                self.state.trigger_direction = None
+                if self.journal is not None:
+                    self._journal_step(candles[-1].timestamp, SetupState.WAITING_FOR_ZSCORE, None, candles[-1].close)
+        return len(candles)
     
     def check_percentage_trigger(self) -> Optional[TradeDirection]:
         # Use previous candle and exclude current from lookback range
@@ -113,11 +208,56 @@ class GoldBuyDipStrategy(BaseStrategy):
         else:
             return self.config.lot_size * self.config.grid_lot_multiplier
     
+    def check_grid_margin(self, grid_level: int, price: float, free_margin: Optional[float] = None) -> MarginCheck:
+        """Whether the lots for grid level ``grid_level`` can be added at ``price`` (cached margin check)"""
+        if self.state.grid_trades:
+            side = self.state.grid_trades[0]["direction"]
+        elif self.state.trigger_direction is not None:
+            side = self.state.trigger_direction.value
+        else:
+            side = "BUY"
+        lot_size = self.config.lot_size if grid_level == 0 else self.calculate_grid_lot_size(grid_level)
+        return self.margin_service.can_add(self.pair, side, lot_size, price, free_margin,
+                                           key=f"{self.pair}:{self.config.magic_number}:{grid_level}")
+    
+    def _take_profit_points(self) -> Optional[int]:
+        """Volume-weighted take profit as the first whole point that reaches it"""
+        scale = self.price_scale
+        lot_step = self.symbol_registry.get(self.pair).volume_step
+        trades = self.state.grid_trades
+        direction = 1 if trades[0]["direction"] == "BUY" else -1
+        return fixed_point.take_profit_level(
+            [scale.to_points(trade["price"]) for trade in trades],
+            [fixed_point.lot_units(trade["lot_size"], lot_step) for trade in trades],
+            direction,
+            take_profit_points=None if self.config.use_take_profit_percent else self.config.take_profit,
+            take_profit_percent=self.config.take_profit_percent if self.config.use_take_profit_percent else None,
+        )
+    
+    def _grid_spacing_points(self, last_price: int) -> int:
+        """calculate_grid_spacing in whole points"""
+        scale = self.price_scale
+        if self.config.use_grid_percent:
+            return fixed_point.grid_spacing_points(scale, last_price, grid_percent=self.config.grid_percent)
+        window = self.candles[-(self.config.atr_period + 2):]
+        atr = fixed_point.atr_points(
+            scale.points_array([c.high for c in window]),
+            scale.points_array([c.low for c in window]),
+            scale.points_array([c.close for c in window]),
+            self.config.atr_period,
+        )
+        return fixed_point.grid_spacing_points(scale, last_price, atr=atr,
+                                               atr_multiplier=self.config.grid_atr_multiplier)
+    
     def calculate_volume_weighted_take_profit(self) -> Optional[float]:
         """Calculate take profit based on volume-weighted average price of all grid trades"""
         if not self.state.grid_trades:
             return None
         
+        if self.price_scale is not None:
+            level = self._take_profit_points()
+            return None if level is None else self.price_scale.to_price(level)
+        
         total_lots = sum(trade["lot_size"] for trade in self.state.grid_trades)
         if total_lots == 0:
             return None
@@ -128,8 +268,8 @@ class GoldBuyDipStrategy(BaseStrategy):
         
         first_trade = self.state.grid_trades[0]
 
-        # Use Point value like MT4 (0.01 for gold, 0.0001 for forex)
-        point = 0.01 if self.is_gold else 0.0001
+        # Use Point value like MT4 (broker point when known, else 0.01 for gold, 0.0001 for forex)
+        point = self.symbol_registry.get(self.pair).point
 
         if first_trade["direction"] == "BUY":
             if self.config.use_take_profit_percent:
@@ -153,6 +293,14 @@ class GoldBuyDipStrategy(BaseStrategy):
         avg_tp = self.calculate_volume_weighted_take_profit()
         if avg_tp is not None:
             first_trade = self.state.grid_trades[0]
+            if self.price_scale is not None:
+                # Exact comparison in points; avg_tp is already the whole-point level
+                direction = 1 if first_trade["direction"] == "BUY" else -1
+                hit = fixed_point.take_profit_reached(self.price_scale.to_points(current_price),
+                                                      self.price_scale.to_points(avg_tp), direction)
+                if hit:
+                    logger.info(f"{first_trade['direction']} grid profit target reached: {current_price:.2f} at TP {avg_tp:.2f}")
+                return hit
             if first_trade["direction"] == "BUY" and current_price >= avg_tp:
                 logger.info(f"BUY grid profit target reached: {current_price:.2f} >= {avg_tp:.2f}")
                 return True
@@ -162,6 +310,65 @@ class GoldBuyDipStrategy(BaseStrategy):
         
         return False
     
+    def _exit_reason(self) -> str:
+        """Exit reason reported when the grid (or single trade) take profit is hit"""
+        if self.config.use_grid_trading:
+            return "Grid profit target reached"
+        return "Single trade profit target reached"
+    
+    def _record_closed_basket(self, price: float, exit_reason: str, timestamp: datetime = None):
+        """Add the grid about to be closed to the trade ledger, if one is attached"""
+        if self.trade_ledger is not None and self.state.grid_trades:
+            self.trade_ledger.append_grid_basket(self, self.state.grid_trades, price, timestamp, exit_reason)
+    
+    def _close_grid(self, price: float, exit_reason: str, timestamp: datetime = None) -> TradeSignal:
+        """Close all grid trades and build the CLOSE_ALL signal"""
+        self._record_closed_basket(price, exit_reason, timestamp)
+        self.state.setup_state = SetupState.WAITING_FOR_TRIGGER
+        self.state.grid_trades.clear()
+        
+        logger.info(f"Position closed at {price:.2f}: {exit_reason}")
+        
+        signal = TradeSignal(
+            action="CLOSE_ALL",
+            lot_size=0,
+            reason=exit_reason
+        )
+        # Remove pairs trading attribute for Gold Buy Dip
+        if hasattr(signal, 'symbol2_trade'):
+            delattr(signal, 'symbol2_trade')
+        return signal
+    
+    def get_exit_levels(self) -> List[tuple]:
+        """
+        Price levels at which the open grid would be closed, as (side, level, reason).
+        
+        A BUY grid closes when the BID reaches the volume-weighted TP or above, a SELL
+        grid when the ASK reaches it or below. Used by tick replay to evaluate the
+        take profit intra-bar with the same rule as check_grid_exit_conditions.
+        """
+        if not self.state.grid_trades:
+            return []
+        avg_tp = self.calculate_volume_weighted_take_profit()
+        if avg_tp is None:
+            return []
+        return [(self.state.grid_trades[0]["direction"], avg_tp, self._exit_reason())]
+    
+    def close_at_price(self, side: str, price: float, reason: str, timestamp: datetime = None) -> Optional[TradeSignal]:
+        """Close the grid at an intra-bar price reported by tick replay"""
+        if not self.state.grid_trades or self.state.grid_trades[0]["direction"] != side:
+            return None
+        previous = self.state.setup_state
+        signal = self._close_grid(price, f"{reason} (intra-bar)", timestamp)
+        # Store the intra-bar fill price for backtest accounting
+        signal.entry_price = price
+        if self.journal is not None:
+            self._journal_step(timestamp, previous, signal, price)
+        if self.persistence is not None:
+            self.persistence.record_exit(self, signal, timestamp, price)
+        self.publish_status()
+        return signal
+    
     def _check_strategy_drawdown(self, current_equity: float) -> bool:
         """Check if strategy-specific maximum drawdown is exceeded"""
         if self.state.initial_balance <= 0:
@@ -178,8 +385,58 @@ class GoldBuyDipStrategy(BaseStrategy):
         
         return False
     
+    def attach_equity_monitor(self, monitor: "EquityMonitor", key: Optional[str] = None) -> str:
+        """
+        Let a shared EquityMonitor check the drawdown instead of passing current_equity per bar.
+        
+        The monitor also feeds its free margin reading to this strategy's margin
+        service, so grid margin checks do not query the account.
+        """
+        self.equity_monitor = monitor
+        self.equity_key = monitor.register(self, key)
+        if monitor.margin_service is None:
+            monitor.margin_service = self.margin_service
+        return self.equity_key
+    
+    def attach_status_board(self, board: "StatusBoard", key: Optional[str] = None) -> str:
+        """Publish the grid status to a shared StatusBoard at the end of every bar"""
+        self.status_board = board
+        self.status_key = board.register(self, key)
+        self.publish_status()
+        return self.status_key
+    
+    def publish_status(self):
+        """Publish setup state and grid status to the attached status board"""
+        if self.status_board is not None:
+            self.status_board.publish(self.status_key, {"setup_state": self.state.setup_state.value,
+                                                        **self.get_grid_status()})
+    
+    def request_close_all(self, reason: str):
+        """CLOSE_ALL trigger from the equity monitor; acted on at the next bar"""
+        self._close_all_request = reason
+    
+    def _journal_step(self, timestamp, previous: SetupState, signal: Optional[TradeSignal], price: float):
+        """Record a setup state transition and / or a signal in the attached journal"""
+        open_trades = len(self.state.grid_trades)
+        if self.state.setup_state != previous:
+            self.journal.record_state(timestamp, previous, self.state.setup_state, price, open_trades)
+        if signal is not None:
+            self.journal.record_signal(timestamp, signal, price, open_trades)
+    
     def _process_market_data(self, candle: MarketData, current_equity: float = None) -> Optional[TradeSignal]:
         """Strategy-specific market data processing."""
+        previous = self.state.setup_state
+        signal = self._evaluate_market_data(candle, current_equity)
+        if self.journal is not None:
+            self._journal_step(candle.timestamp, previous, signal, candle.close)
+        if signal is not None and self.persistence is not None:
+            self.persistence.record_signal(self, signal, candle.timestamp, candle.close,
+                                           len(self.state.grid_trades) - 1)
+        if self.status_board is not None:
+            self.publish_status()
+        return signal
+    
+    def _evaluate_market_data(self, candle: MarketData, current_equity: float = None) -> Optional[TradeSignal]:
         self.add_candle(candle)
         
         # Debug logging
@@ -234,15 +491,20 @@ class GoldBuyDipStrategy(BaseStrategy):
             
             logger.info(f"Gold Buy Dip: PctFromLow={pct_from_low:.2f}%, PctFromHigh={pct_from_high:.2f}% , Threshold=±{self.config.percentage_threshold}%{tp_info}")
         
-        # Check for maximum drawdown only if positions exist
+        # Check for maximum drawdown only if positions exist; with an equity monitor
+        # attached the check was done once for all instances when it polled
         signal = None
-        if current_equity and self.state.grid_trades and self._check_strategy_drawdown(current_equity):
+        close_reason, self._close_all_request = self._close_all_request, None
+        if close_reason is None and current_equity and self.state.grid_trades and self._check_strategy_drawdown(current_equity):
+            close_reason = "Strategy maximum drawdown exceeded"
+        if close_reason and self.state.grid_trades:
+            self._record_closed_basket(candle.close, close_reason, candle.timestamp)
             self.state.setup_state = SetupState.WAITING_FOR_TRIGGER
             self.state.grid_trades.clear()
             signal = TradeSignal(
                 action="CLOSE_ALL",
                 lot_size=0,
-                reason="Strategy maximum drawdown exceeded"
+                reason=close_reason
             )
             # Remove pairs trading attribute for Gold Buy Dip
             signal.__dict__.pop('symbol2_trade', None)
@@ -256,31 +518,17 @@ class GoldBuyDipStrategy(BaseStrategy):
             should_exit = self.check_grid_exit_conditions(candle.close)
             if should_exit:
                 # Exit reason reflects TP-only logic in check_grid_exit_conditions
-                if self.config.use_grid_trading:
-                    exit_reason = "Grid profit target reached"
-                else:
-                    exit_reason = "Single trade profit target reached"
+                exit_reason = self._exit_reason()
             
             if should_exit:
-                # Close all trades
-                self.state.setup_state = SetupState.WAITING_FOR_TRIGGER
-                total_trades = len(self.state.grid_trades)
-                self.state.grid_trades.clear()
-                
-                logger.info(f"Position closed at {candle.close:.2f}: {exit_reason}")
-                
-                signal = TradeSignal(
-                    action="CLOSE_ALL",
-                    lot_size=0,
-                    reason=exit_reason
-                )
-                # Remove pairs trading attribute for Gold Buy Dip
-                if hasattr(signal, 'symbol2_trade'):
-                    delattr(signal, 'symbol2_trade')
+                signal = self._close_grid(candle.close, exit_reason, candle.timestamp)
         
         # Log only when signals are generated
         if signal is not None:
-            drawdown_pct = ((self.state.initial_balance - current_equity) / self.state.initial_balance) * 100 if current_equity and self.state.initial_balance > 0 else 0
+            if current_equity is None and self.equity_monitor is not None:
+                drawdown_pct = self.equity_monitor.strategy_drawdown(self.equity_key)
+            else:
+                drawdown_pct = ((self.state.initial_balance - current_equity) / self.state.initial_balance) * 100 if current_equity and self.state.initial_balance > 0 else 0
             self._log_market_data_with_signals(signal, zscore, atr, price_movement_score, drawdown_pct)
             return signal
         
@@ -352,23 +600,40 @@ class GoldBuyDipStrategy(BaseStrategy):
             ):
                 
                 last_trade = self.state.grid_trades[-1]
-                grid_spacing = self.calculate_grid_spacing()
                 
                 # Check if price moved against position by grid spacing amount
                 should_add_grid = False
                 price_diff = 0
                 
-                if last_trade["direction"] == "BUY":
-                    price_diff = last_trade["price"] - candle.close
-                    should_add_grid = price_diff >= grid_spacing
-                elif last_trade["direction"] == "SELL":
-                    price_diff = candle.close - last_trade["price"]
-                    should_add_grid = price_diff >= grid_spacing
+                if self.price_scale is not None:
+                    # Whole points: exact regardless of float noise in prices or spacing
+                    scale = self.price_scale
+                    last_points = scale.to_points(last_trade["price"])
+                    spacing_points = self._grid_spacing_points(last_points)
+                    direction = 1 if last_trade["direction"] == "BUY" else -1
+                    should_add_grid = fixed_point.grid_step_reached(last_points, scale.to_points(candle.close),
+                                                                    direction, spacing_points)
+                    grid_spacing = scale.to_price(spacing_points)
+                    price_diff = (last_trade["price"] - candle.close) * direction
+                else:
+                    grid_spacing = self.calculate_grid_spacing()
+                    if last_trade["direction"] == "BUY":
+                        price_diff = last_trade["price"] - candle.close
+                        should_add_grid = price_diff >= grid_spacing
+                    elif last_trade["direction"] == "SELL":
+                        price_diff = candle.close - last_trade["price"]
+                        should_add_grid = price_diff >= grid_spacing
                 
                 if should_add_grid:
                     grid_level = len(self.state.grid_trades)
                     lot_size = self.calculate_grid_lot_size(grid_level)
                     
+                    # Cached margin pre-check; the grid add is retried on the next bar
+                    margin = self.check_grid_margin(grid_level, candle.close)
+                    if not margin.approved:
+                        logger.warning(f"Grid trade level {grid_level + 1} skipped: {margin.reason}")
+                        return None
+                    
                     # Add ticket and open_time fields for grid trade tracking
                     self.state.grid_trades.append({
                         "price": candle.close,
@@ -455,7 +720,7 @@ class GoldBuyDipStrategy(BaseStrategy):
             'strategy_state': f"Grid:{len(self.state.grid_trades)} Drawdown:{drawdown_pct:.1f}%"
         }
         
-        forex_logger.log_signal(self.timeframe, candle_data, signal, indicators)
+        get_forex_logger().log_signal(self.timeframe, candle_data, signal, indicators)
 
     
     def set_initial_balance(self, balance: float):
@@ -472,8 +737,29 @@ class GoldBuyDipStrategy(BaseStrategy):
         logger.info("Resetting strategy state")
         self.state = GoldBuyDipState()
         self.candles.clear()
+        self._close_all_request = None
         logger.info("Strategy reset complete")
     
+    def snapshot_state(self) -> Dict:
+        """Full strategy state for app.services.state_snapshot (candles stored as columns)"""
+        return {
+            "state": dict(vars(self.state)),
+            "candles": candles_to_arrays(self.candles),
+        }
+    
+    def restore_state(self, snapshot: Dict):
+        """Restore state written by snapshot_state()"""
+        state = GoldBuyDipState()
+        for key, value in snapshot["state"].items():
+            setattr(state, key, value)
+        state.setup_state = SetupState(state.setup_state)
+        if state.trigger_direction is not None:
+            state.trigger_direction = TradeDirection(state.trigger_direction)
+        self.state = state
+        self.candles = arrays_to_candles(snapshot["candles"], MarketData)
+        logger.info(f"Strategy state restored: State={self.state.setup_state}, Grid={len(self.state.grid_trades)}, Candles={len(self.candles)}")
+        self.publish_status()
+    
     def update_trade_ticket(self, grid_level: int, ticket: str):
         """Update trade ticket after successful execution"""
         if not isinstance(grid_level, int) or grid_level < 0 or grid_level >= len(self.state.grid_trades):
@@ -482,6 +768,9 @@ class GoldBuyDipStrategy(BaseStrategy):
         try:
             self.state.grid_trades[grid_level]["ticket"] = ticket
             logger.info(f"Updated grid trade {grid_level} with ticket {ticket}")
+            if self.persistence is not None:
+                self.persistence.update_ticket(self, grid_level, ticket,
+                                               self.state.grid_trades[grid_level].get("open_time"))
         except Exception as e:
             logger.error(f"Failed to update ticket for grid trade {grid_level}: {e}")
     
@@ -491,5 +780,6 @@ class GoldBuyDipStrategy(BaseStrategy):
         if 0 <= grid_level < len(self.state.grid_trades):
             removed_trade = self.state.grid_trades.pop(grid_level)
             logger.warning(f"Removed failed trade at level {grid_level}: {removed_trade}")
+            self.publish_status()
         else:
             logger.error(f"Attempted to remove trade at invalid grid level {grid_level}. No trade removed.")
@@ -0,0 +1,87 @@
+"""
+Shared helpers for the service and strategy tests.
+
+The ``app`` package lives in ``Gold Buy Dip/app`` and the strategy modules sit in
+per-strategy folders whose file names are not importable, so they are loaded by
+path. Tests that need parts of the full application (``app.models``,
+``app.services.base_strategy``, ...) skip when those are not importable.
+"""
+
+import importlib
+import importlib.util
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+GOLD_ROOT = Path(__file__).resolve().parents[1]
+REPO_ROOT = GOLD_ROOT.parent
+
+if str(GOLD_ROOT) not in sys.path:
+    sys.path.append(str(GOLD_ROOT))
+
+STRATEGY_FILES = {
+    "gold_buy_dip_strategy": GOLD_ROOT / "gold_buy_dip_strategy.py",
+    "rsi_6_trades_strategy": REPO_ROOT / "RSI 6 Trades" / "rsi_6_trades_strategy (1).py",
+    "rsi_pairs_strategy": REPO_ROOT / "RSI Pairs Strategy" / "rsi_pairs_strategy.py",
+}
+
+
+def import_app_module(name: str):
+    """Import an app module, skipping the test when the full application is not available"""
+    try:
+        return importlib.import_module(name)
+    except (ImportError, SyntaxError) as e:
+        pytest.skip(f"{name} not importable in this checkout: {e}")
+
+
+@pytest.fixture
+def app_logging():
+    """Services log through app.utilities.forex_logger, which ships with the full application"""
+    return import_app_module("app.utilities.forex_logger")
+
+
+def load_strategy_module(name: str):
+    """Load one of the strategy files by path (once per session)"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, STRATEGY_FILES[name])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except (ImportError, SyntaxError) as e:
+        del sys.modules[name]
+        pytest.skip(f"{name} needs the full application: {e}")
+    return module
+
+
+def random_walk_candles(n: int, start_price: float = 2000.0, step: float = 3.0, minutes: int = 15, seed: int = 1):
+    """MarketData bars of a seeded random walk (Gold-like prices by default)"""
+    trading_models = import_app_module("app.models.trading_models")
+    rng = np.random.default_rng(seed)
+    closes = start_price + np.cumsum(rng.normal(0.0, step, n))
+    opens = np.r_[closes[0], closes[:-1]]
+    highs = np.maximum(opens, closes) + rng.random(n) * step
+    lows = np.minimum(opens, closes) - rng.random(n) * step
+    start = datetime(2024, 1, 1)
+    return [trading_models.MarketData(start + timedelta(minutes=minutes * i), float(opens[i]), float(highs[i]),
+                                      float(lows[i]), float(closes[i]))
+            for i in range(n)]
+
+
+def gold_strategy(**config):
+    """GoldBuyDipStrategy on XAUUSD with thresholds that trade often on random_walk_candles"""
+    strategy_models = import_app_module("app.models.strategy_models")
+    gold = load_strategy_module("gold_buy_dip_strategy")
+    settings = {"percentage_threshold": 0.5, "zscore_threshold_sell": 1.5, "zscore_threshold_buy": -1.5, **config}
+    strategy = gold.GoldBuyDipStrategy(strategy_models.GoldBuyDipConfig(**settings), "XAUUSD")
+    strategy.state.initial_balance = 10_000
+    return strategy
+
+
+def signal_actions(signals):
+    """Comparable (action, lot_size, reason) tuples of a run's signals"""
+    return [None if s is None else (str(s.action), s.lot_size, s.reason) for s in signals]
@@ -0,0 +1,76 @@
+import sys
+
+import numpy as np
+import pytest
+
+from app.utilities.ohlc_arrays import candles_to_arrays
+from conftest import gold_strategy, import_app_module, random_walk_candles
+
+
+@pytest.fixture
+def backtest_cache(app_logging):
+    return import_app_module("app.services.backtest_cache")
+
+
+def _prefix(columns, bars):
+    return {name: values[:bars] if isinstance(values, np.ndarray) else values for name, values in columns.items()}
+
+
+def _runner(backtest_cache, directory, starting_balance=10_000.0):
+    trading_models = import_app_module("app.models.trading_models")
+    cache = backtest_cache.BacktestCache(str(directory))
+    return backtest_cache.CachedBacktestRunner(cache, backtest_cache.single_symbol_feed(trading_models.MarketData),
+                                               starting_balance)
+
+
+def _assert_same_ledger(a, b):
+    assert len(a) == len(b) > 0
+    for name in ("pnl", "entry_time_us", "exit_time_us", "depth", "s1_entry_price"):
+        assert np.array_equal(a.column(name), b.column(name), equal_nan=True), name
+    assert a.metrics_dict() == b.metrics_dict()
+
+
+def test_resume_matches_full_run(backtest_cache, tmp_path):
+    columns = candles_to_arrays(random_walk_candles(3000))
+    config = gold_strategy().config
+
+    full = _runner(backtest_cache, tmp_path / "full").run("gold", config, {"XAUUSD": columns}, gold_strategy)
+    assert full.source == "full"
+
+    runner = _runner(backtest_cache, tmp_path / "resumed")
+    first = runner.run("gold", config, {"XAUUSD": _prefix(columns, 1800)}, gold_strategy)
+    resumed = runner.run("gold", config, {"XAUUSD": columns}, gold_strategy)
+    assert (first.source, resumed.source, resumed.bars_processed) == ("full", "resumed", 1200)
+    _assert_same_ledger(full.ledger, resumed.ledger)
+
+    again = runner.run("gold", config, {"XAUUSD": columns}, gold_strategy)
+    assert again.source == "cache"
+    _assert_same_ledger(full.ledger, again.ledger)
+
+
+def test_starting_balance_is_part_of_the_key(backtest_cache, tmp_path):
+    columns = candles_to_arrays(random_walk_candles(1500))
+    config = gold_strategy().config
+
+    small = _runner(backtest_cache, tmp_path, 1_000.0).run("gold", config, {"XAUUSD": columns}, gold_strategy)
+    large = _runner(backtest_cache, tmp_path, 100_000.0).run("gold", config, {"XAUUSD": columns}, gold_strategy)
+
+    assert large.source == "full" and large.key != small.key
+    assert large.ledger.metrics.starting_balance == 100_000.0
+
+
+def test_code_version_covers_imported_modules(backtest_cache, tmp_path, monkeypatch):
+    package = tmp_path / "cvpkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "helper.py").write_text("def value():\n    return 1\n")
+    (package / "strategy.py").write_text("from cvpkg.helper import value\n\nclass Strategy:\n    pass\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ("cvpkg", "cvpkg.helper", "cvpkg.strategy"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    strategy = __import__("cvpkg.strategy", fromlist=["Strategy"])
+
+    before = backtest_cache.code_version(strategy.Strategy, packages=("cvpkg",))
+    assert backtest_cache.code_version(strategy.Strategy, packages=("cvpkg",)) == before
+    (package / "helper.py").write_text("def value():\n    return 2\n")
+    assert backtest_cache.code_version(strategy.Strategy, packages=("cvpkg",)) != before
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from app.services.candle_archive import ArchiveError, CandleArchive, _sample_m1, load_pair
+
+FIELDS = ("timestamp", "open", "high", "low", "close")
+
+
+def _slice(columns, part):
+    return {name: values[part] if isinstance(values, np.ndarray) else values for name, values in columns.items()}
+
+
+def _assert_columns(actual, expected):
+    for name in FIELDS:
+        assert np.array_equal(actual[name], expected[name]), name
+
+
+@pytest.fixture
+def archive(tmp_path, app_logging):
+    return CandleArchive(str(tmp_path), chunk_size=1000)
+
+
+def test_write_then_read_round_trips(archive):
+    data = _sample_m1(5500)
+    archive.write("XAUUSD", data, point=0.01)
+
+    _assert_columns(archive.read("XAUUSD"), data)
+    info = archive.info("XAUUSD")
+    assert info["bars"] == 5500 and info["chunks"] == 6
+    assert archive.symbols() == ["XAUUSD"]
+
+
+def test_append_overlapping_bars_round_trips(archive):
+    data = _sample_m1(5500)
+    archive.write("XAUUSD", _slice(data, slice(0, 3000)), point=0.01)
+    # Overlaps the stored tail; only bars after the last stored timestamp are added
+    archive.append("XAUUSD", _slice(data, slice(2500, None)))
+    archive.append("XAUUSD", _slice(data, slice(5499, None)))
+
+    _assert_columns(archive.read("XAUUSD"), data)
+    assert archive.info("XAUUSD")["bars"] == 5500
+
+
+def test_range_and_tail_decode_only_the_requested_bars(archive):
+    data = _sample_m1(5500)
+    archive.write("XAUUSD", data, point=0.01)
+    ts = data["timestamp"]
+
+    _assert_columns(archive.read("XAUUSD", int(ts[1234]), int(ts[4321])), _slice(data, slice(1234, 4321)))
+    _assert_columns(archive.read("XAUUSD", int(ts[999]), int(ts[1000])), _slice(data, slice(999, 1000)))
+    _assert_columns(archive.tail("XAUUSD", 1500), _slice(data, slice(-1500, None)))
+    _assert_columns(archive.tail("XAUUSD", 10 ** 6), data)
+
+
+def test_load_pair_aligns_timestamps(archive):
+    data = _sample_m1(3000)
+    archive.write("EURUSD", _slice(data, slice(None, None, 2)), point=0.01)
+    archive.write("GBPUSD", _slice(data, slice(None, None, 3)), point=0.01)
+
+    pair = load_pair(archive, "EURUSD", "GBPUSD")
+    assert np.array_equal(pair["EURUSD"]["timestamp"], pair["GBPUSD"]["timestamp"])
+    _assert_columns(pair["EURUSD"], _slice(data, slice(None, None, 6)))
+
+
+def test_corrupt_file_raises(archive, tmp_path):
+    (tmp_path / "BAD.cndl").write_bytes(b"xx" * 20)
+    with pytest.raises(ArchiveError):
+        archive.read("BAD")
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from conftest import import_app_module, load_strategy_module
+
+PERIOD = 14
+
+
+@pytest.fixture(scope="module")
+def kernels():
+    return import_app_module("app.indicators.kernels")
+
+
+@pytest.fixture(scope="module")
+def ohlc():
+    rng = np.random.default_rng(11)
+    closes = 2000.0 + np.cumsum(rng.normal(0.0, 1.5, 3000))
+    opens = np.concatenate(([closes[0]], closes[:-1]))
+    highs = np.maximum(opens, closes) + rng.random(len(closes))
+    lows = np.minimum(opens, closes) - rng.random(len(closes))
+    # Flat stretch: zero gains / losses and zero standard deviation
+    closes[500:540] = closes[499]
+    highs[500:540] = lows[500:540] = closes[499]
+    return highs.tolist(), lows.tolist(), closes.tolist()
+
+
+class _Bar:
+    def __init__(self, high, low, close):
+        self.high = high
+        self.low = low
+        self.close = close
+
+
+def test_check_parity_against_original_code(kernels):
+    diffs = kernels.check_parity(n_bars=3000, period=PERIOD)
+
+    assert set(diffs) == {"rsi_series", "atr_series", "zscore", "atr", "zscore_series", "atr_window_series"}
+    assert max(diffs.values()) <= 1e-12
+
+
+def test_series_match_rsi6_python_implementations(kernels, ohlc):
+    rsi6 = load_strategy_module("rsi_6_trades_strategy")
+    highs, lows, closes = ohlc
+
+    for period in (6, PERIOD):
+        expected_rsi = rsi6.python_calculate_rsi_series(closes, period)
+        expected_atr = rsi6.python_calculate_atr_series(highs, lows, closes, period)
+        assert kernels.calculate_rsi_series(closes, period) == expected_rsi
+        assert kernels.calculate_atr_series(highs, lows, closes, period) == expected_atr
+        # The default parity reference is the same code
+        assert kernels.original_rsi_series(closes, period) == expected_rsi
+        assert kernels.original_atr_series(highs, lows, closes, period) == expected_atr
+
+    diffs = kernels.check_parity(rsi6.python_calculate_rsi_series, rsi6.python_calculate_atr_series, n_bars=2000)
+    assert max(diffs.values()) <= 1e-12
+
+
+def test_zscore_and_atr_match_app_indicators(kernels, ohlc):
+    zscore = import_app_module("app.indicators.zscore")
+    atr = import_app_module("app.indicators.atr")
+    highs, lows, closes = ohlc
+    bars = [_Bar(h, l, c) for h, l, c in zip(highs, lows, closes)]
+
+    z_series = kernels.zscore_series(closes, PERIOD)
+    atr_series = kernels.atr_window_series(highs, lows, closes, PERIOD)
+    for i in range(len(closes)):
+        expected_z = zscore.calculate_zscore(closes[max(0, i - PERIOD):i + 1], PERIOD)
+        expected_atr = atr.calculate_atr(bars[max(0, i - PERIOD - 1):i + 1], PERIOD)
+        assert kernels.calculate_zscore(closes[:i + 1], PERIOD) == pytest.approx(expected_z, abs=1e-12)
+        assert kernels.calculate_atr(bars[:i + 1], PERIOD) == pytest.approx(expected_atr, abs=1e-12)
+        assert z_series[i] == pytest.approx(expected_z, abs=1e-12)
+        assert atr_series[i] == pytest.approx(expected_atr, abs=1e-12)
+
+
+def test_short_inputs(kernels):
+    assert kernels.calculate_rsi_series([1.0] * PERIOD, PERIOD) == []
+    assert kernels.calculate_atr_series([1.0] * PERIOD, [1.0] * PERIOD, [1.0] * PERIOD, PERIOD) == []
+
+
+def test_benchmark_runs(kernels):
+    results = kernels.benchmark(n_bars=2000, period=PERIOD)
+
+    assert set(results) == {"rsi_series", "atr_series", "zscore", "atr"}
+    assert all(row["python_s"] > 0 and row["accelerated_s"] > 0 for row in results.values())
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import margin_service as margin_module
+from app.services.equity_monitor import EquityMonitor
+from app.services.margin_service import MarginRequest, MarginService
+
+
+class _Module:
+    def __init__(self, module):
+        self.module = module
+
+    def get(self):
+        return self.module
+
+
+def test_calculator_is_asked_with_broker_spelling():
+    asked = []
+
+    def calculator(symbol, side, price):
+        asked.append(symbol)
+        return 2000.0
+
+    service = MarginService(calculator=calculator, free_margin=lambda: 1e6)
+    assert service.margin_per_lot("XAUUSDm", "BUY", 2000.0) == (2000.0, False)
+    # The cache is keyed case-insensitively
+    assert service.margin_per_lot("xauusdm", "BUY", 2000.0) == (2000.0, True)
+    assert asked == ["XAUUSDm"]
+
+
+def test_checks_are_permissive_without_mt5(monkeypatch):
+    monkeypatch.setattr(margin_module, "_mt5", _Module(None))
+    service = MarginService(calculator=lambda symbol, side, price: 2000.0)
+
+    check = service.can_add("XAUUSD", "BUY", 50.0, 2000.0)
+    assert check.approved and "unavailable" in check.reason
+
+    # An explicit free margin is still checked
+    assert not service.can_add("XAUUSD", "BUY", 50.0, 2000.0, free_margin=1000.0).approved
+
+
+def test_failed_account_read_rejects_with_mt5(monkeypatch, app_logging):
+    mt5 = SimpleNamespace(account_info=lambda: None)
+    monkeypatch.setattr(margin_module, "_mt5", _Module(mt5))
+    service = MarginService(calculator=lambda symbol, side, price: 2000.0)
+
+    checks = service.validate_batch([MarginRequest("XAUUSD", "BUY", 0.01, 2000.0)])
+    assert [c.approved for c in checks] == [False]
+
+
+def test_batch_consumes_free_margin():
+    service = MarginService(calculator=lambda symbol, side, price: 1000.0, free_margin=lambda: 2500.0)
+    checks = service.validate_batch([MarginRequest("XAUUSD", "BUY", 1.0, 2000.0, key=str(i)) for i in range(3)])
+
+    assert [c.approved for c in checks] == [True, True, False]
+    assert [c.free_margin for c in checks] == pytest.approx([2500.0, 1500.0, 500.0])
+
+
+class _CountingAccount:
+    def __init__(self, free_margin):
+        self.free_margin = free_margin
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.free_margin
+
+
+def test_free_margin_is_read_once_and_consumed_by_approved_adds():
+    account = _CountingAccount(2500.0)
+    service = MarginService(calculator=lambda symbol, side, price: 1000.0, free_margin=account)
+
+    assert service.can_add("XAUUSD", "BUY", 1.0, 2000.0).approved
+    assert service.can_add("XAUUSD", "BUY", 1.0, 2000.0).approved
+    third = service.can_add("XAUUSD", "BUY", 1.0, 2000.0)
+    assert not third.approved and third.free_margin == pytest.approx(500.0)
+    assert account.reads == 1
+
+    # A pushed reading (equity monitor poll) replaces the cached one
+    service.set_free_margin(5000.0)
+    assert service.can_add("XAUUSD", "BUY", 1.0, 2000.0).approved
+    assert account.reads == 1
+
+
+def test_free_margin_is_reread_after_max_age(monkeypatch):
+    account = _CountingAccount(2500.0)
+    service = MarginService(calculator=lambda symbol, side, price: 1000.0, free_margin=account, max_age_seconds=60.0)
+    now = [1000.0]
+    monkeypatch.setattr(margin_module.time, "monotonic", lambda: now[0])
+
+    service.can_add("XAUUSD", "BUY", 1.0, 2000.0)
+    now[0] += 61.0
+    service.can_add("XAUUSD", "BUY", 1.0, 2000.0)
+    assert account.reads == 2
+
+
+def test_estimates_are_not_cached(app_logging):
+    answers = [None, 2000.0]
+
+    def calculator(symbol, side, price):
+        return answers.pop(0)
+
+    service = MarginService(calculator=calculator, free_margin=lambda: 1e6, leverage=100.0)
+    estimate, cached = service.margin_per_lot("XAUUSD", "BUY", 2000.0)
+    assert not cached and estimate == pytest.approx(service.registry.get("XAUUSD").contract_size * 2000.0 / 100.0)
+
+    # The broker is asked again and its answer is what gets cached
+    assert service.margin_per_lot("XAUUSD", "BUY", 2000.0) == (2000.0, False)
+    assert service.margin_per_lot("XAUUSD", "BUY", 2000.0) == (2000.0, True)
+    assert service.stats()["estimates"] == 1
+
+
+def test_equity_monitor_pushes_free_margin(app_logging):
+    account = _CountingAccount(0.0)
+    service = MarginService(calculator=lambda symbol, side, price: 1000.0, free_margin=account)
+    monitor = EquityMonitor(fetch=lambda: (10_000.0, 10_000.0, 1500.0), margin_service=service)
+
+    assert monitor.poll() is not None
+    assert service.can_add("XAUUSD", "BUY", 1.0, 2000.0).approved
+    assert account.reads == 0
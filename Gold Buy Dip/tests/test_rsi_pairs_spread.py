@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.utilities.clock import ReplayClock
+from app.utilities.ohlc_arrays import candles_to_arrays
+from conftest import import_app_module, load_strategy_module
+
+START = datetime(2024, 1, 1)
+
+
+def _history(n=300, seed=3):
+    rng = np.random.default_rng(seed)
+    s1 = 1.10 + np.cumsum(rng.normal(0, 0.0005, n))
+    s2 = 0.85 * s1 + np.cumsum(rng.normal(0, 0.0003, n))
+    times = [START + timedelta(minutes=5 * i) for i in range(n)]
+    return times, s1, s2
+
+
+def _arrays(times, closes):
+    return candles_to_arrays([{"timestamp": t, "open": c, "high": c + 0.0002, "low": c - 0.0002, "close": c}
+                              for t, c in zip(times, closes)])
+
+
+def _streamed(spread, window, s1, s2):
+    stats = spread.SpreadStats(window)
+    for x, y in zip(s1, s2):
+        stats.update(float(x), float(y))
+    return stats
+
+
+def test_seed_matches_streaming_updates():
+    spread = import_app_module("app.indicators.spread")
+    _, s1, s2 = _history()
+    seeded = spread.SpreadStats(100)
+    seeded.seed(s1, s2)
+    streamed = _streamed(spread, 100, s1, s2)
+
+    assert seeded.ready and len(seeded) == 100
+    assert seeded.spread_stats() == pytest.approx(streamed.spread_stats(), rel=1e-9, abs=1e-12)
+
+    # Later updates continue from the seeded window
+    seeded.update(1.2, 1.0)
+    streamed.update(1.2, 1.0)
+    assert seeded.spread_stats() == pytest.approx(streamed.spread_stats(), rel=1e-9, abs=1e-12)
+
+
+def test_seed_with_short_history_is_not_ready():
+    spread = import_app_module("app.indicators.spread")
+    stats = spread.SpreadStats(100)
+    stats.seed([1.0, 1.1, 1.2], [2.0, 2.1, 2.3])
+
+    assert len(stats) == 3 and not stats.ready
+    assert stats.spread_stats() == pytest.approx(_streamed(spread, 100, [1.0, 1.1, 1.2], [2.0, 2.1, 2.3]).spread_stats())
+
+
+def test_warm_up_seeds_spread_in_positive_mode():
+    strategy_models = import_app_module("app.models.strategy_models")
+    spread = import_app_module("app.indicators.spread")
+    pairs = load_strategy_module("rsi_pairs_strategy")
+    times, s1, s2 = _history()
+
+    strategy = pairs.RSIPairsStrategy(strategy_models.RSIPairsConfig(mode="positive"), "EURUSD-GBPUSD")
+    strategy.warm_up(_arrays(times, s1), strategy.symbol1)
+    assert len(strategy.spread_stats) == 0
+    # symbol2 history is missing its first bar and one bar in the middle: rows are matched on time
+    keep = [i for i in range(len(times)) if i not in (0, 250)]
+    strategy.warm_up(_arrays([times[i] for i in keep], s2[keep]), strategy.symbol2)
+
+    assert strategy.spread_stats.ready
+    aligned = keep[-100:]
+    expected = _streamed(spread, 100, s1[aligned], s2[aligned])
+    assert strategy.spread_stats.spread_stats() == pytest.approx(expected.spread_stats(), rel=1e-9, abs=1e-12)
+
+
+def test_warm_up_leaves_spread_alone_in_negative_mode():
+    strategy_models = import_app_module("app.models.strategy_models")
+    pairs = load_strategy_module("rsi_pairs_strategy")
+    times, s1, s2 = _history()
+
+    strategy = pairs.RSIPairsStrategy(strategy_models.RSIPairsConfig(mode="negative"), "EURUSD-GBPUSD")
+    strategy.warm_up(_arrays(times, s1), strategy.symbol1)
+    strategy.warm_up(_arrays(times, s2), strategy.symbol2)
+
+    assert len(strategy.spread_stats) == 0
+
+
+def test_pair_trade_book_time_limit_uses_injected_clock():
+    pair_portfolio = import_app_module("app.services.pair_portfolio")
+    clock = ReplayClock(START)
+    book = pair_portfolio.PairTradeBook(profit_target_usd=1e9, stop_loss_usd=-1e9, max_trade_hours=24, clock=clock)
+    book.open_trade("t1", "EURUSD", "GBPUSD", "long", 0.1, 0.1, 1.1, 1.3, START)
+    prices = {"EURUSD": 1.1, "GBPUSD": 1.3}
+
+    clock.observe(START + timedelta(hours=23))
+    assert book.evaluate(prices) == []
+    clock.observe(START + timedelta(hours=24))
+    assert [hit[:2] for hit in book.evaluate(prices)] == [("t1", "TIME_LIMIT")]
+
+
+def _run_pairs(mode, times, s1, s2, **config):
+    """Bar-by-bar RSIPairsStrategy run: {bar: check_entry_conditions result}, entries and the strategy"""
+    strategy_models = import_app_module("app.models.strategy_models")
+    trading_models = import_app_module("app.models.trading_models")
+    pairs = load_strategy_module("rsi_pairs_strategy")
+    strategy = pairs.RSIPairsStrategy(strategy_models.RSIPairsConfig(mode=mode, **config), "EURUSD-GBPUSD")
+    checks = {}
+    entries = []
+    check_entry_conditions = strategy.check_entry_conditions
+
+    def recording_check(indicators):
+        checks[bar] = check_entry_conditions(indicators)
+        return checks[bar]
+    strategy.check_entry_conditions = recording_check
+
+    for bar, (t, x, y) in enumerate(zip(times, s1, s2)):
+        strategy.add_candle_data(strategy.symbol2, trading_models.MarketData(t, y, y + 0.0002, y - 0.0002, y))
+        signal = strategy._process_market_data(trading_models.MarketData(t, x, x + 0.0002, x - 0.0002, x))
+        if signal is not None and signal.action != "CLOSE_ALL":
+            indicators = strategy._last_indicators
+            entries.append((strategy.state.trade_direction, strategy.state.hedge_ratio, strategy.state.lot_size_s2,
+                            indicators.get('beta'), strategy.spread_stats.divergence,
+                            indicators['s1_rsi'] - indicators['s2_rsi']))
+    return checks, entries, strategy
+
+
+@pytest.mark.parametrize("mode", ["negative", "positive"])
+def test_screen_flags_the_bars_the_strategy_trades(mode, app_logging):
+    spread = import_app_module("app.indicators.spread")
+    times, s1, s2 = _history(n=1500, seed=5)
+    config = {"rsi_overbought": 62, "rsi_oversold": 38}
+    checks, _, strategy = _run_pairs(mode, times, s1, s2, **config)
+
+    signals = spread.entry_signal_series(s1, s2, rsi_overbought=62, rsi_oversold=38,
+                                         min_hedge_ratio=strategy.config.min_hedge_ratio,
+                                         max_hedge_ratio=strategy.config.max_hedge_ratio)
+    names = (("negative_short", "short"), ("negative_long", "long")) if mode == "negative" else \
+        (("positive_short_spread", "short_spread"), ("positive_long_spread", "long_spread"))
+    screened = {}
+    for bar in checks:
+        flagged = [trade_type for name, trade_type in names if signals[name][bar]]
+        screened[bar] = flagged[0] if flagged else None
+
+    assert sum(result is not None for result in checks.values()) >= 3
+    assert checks == screened
+
+    rows = spread.screen_pairs({"EURUSD": s1, "GBPUSD": s2}, [("EURUSD", "GBPUSD")], rsi_overbought=62,
+                               rsi_oversold=38, min_hedge_ratio=strategy.config.min_hedge_ratio,
+                               max_hedge_ratio=strategy.config.max_hedge_ratio)
+    assert rows[0][names[0][0]] == int(signals[names[0][0]].sum())
+
+
+def test_positive_trade_holds_the_spread_that_triggered_it(app_logging):
+    times, s1, s2 = _history(n=1500, seed=5)
+    _, entries, strategy = _run_pairs("positive", times, s1, s2, rsi_overbought=62, rsi_oversold=38)
+    assert entries
+
+    for trade_type, hedge_ratio, lot_size_s2, beta, divergence, rsi_divergence in entries:
+        assert trade_type in ("long_spread", "short_spread")
+        # Entry divergence is the one SpreadStats tracks
+        assert divergence == rsi_divergence
+        # Leg 2 is sized with the beta the spread z-score was computed with
+        assert hedge_ratio == pytest.approx(beta)
+        assert lot_size_s2 == pytest.approx(
+            strategy.normalize_lot_size(strategy.symbol2, strategy.config.base_lot_size * beta))
+
+
+def test_fast_forward_keeps_spread_stats_identical(app_logging):
+    strategy_models = import_app_module("app.models.strategy_models")
+    trading_models = import_app_module("app.models.trading_models")
+    pairs = load_strategy_module("rsi_pairs_strategy")
+    times, s1, _ = _history(n=400)
+    candles = [trading_models.MarketData(t, x, x + 0.0002, x - 0.0002, x) for t, x in zip(times, s1)]
+
+    def make():
+        return pairs.RSIPairsStrategy(strategy_models.RSIPairsConfig(mode="positive"), "EURUSD-GBPUSD",
+                                      clock=ReplayClock())
+
+    stepped = make()
+    for candle in candles:
+        stepped._process_market_data(candle)
+
+    # A loop that fell behind skips 250 stale bars, then evaluates the rest
+    caught_up = make()
+    assert caught_up.fast_forward(candles[:250]) == 250
+    for candle in candles[250:]:
+        caught_up._process_market_data(candle)
+
+    assert len(caught_up.spread_stats) == len(stepped.spread_stats)
+    assert caught_up.spread_stats.spread_stats() == stepped.spread_stats.spread_stats()
+    assert caught_up.spread_stats.divergence == stepped.spread_stats.divergence
+    assert caught_up.state.s1_candles == stepped.state.s1_candles
+    assert caught_up.state.s2_candles == stepped.state.s2_candles
@@ -0,0 +1,64 @@
+import os
+import threading
+
+import pytest
+
+from app.services import state_snapshot
+from app.services.state_snapshot import write_bytes_atomic
+from conftest import gold_strategy, random_walk_candles, signal_actions
+
+
+def test_concurrent_writers_of_one_path_do_not_collide(tmp_path):
+    path = str(tmp_path / "state.snap")
+    payloads = [bytes([i]) * 50_000 for i in range(8)]
+    errors = []
+
+    def writer(data):
+        try:
+            for _ in range(20):
+                write_bytes_atomic(path, data)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(data,)) for data in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(path, "rb") as fh:
+        assert fh.read() in payloads
+    assert os.listdir(tmp_path) == ["state.snap"]
+
+
+def test_failed_write_leaves_no_temporary_file(tmp_path, monkeypatch):
+    def failing_fsync(fd):
+        raise OSError("disk full")
+    monkeypatch.setattr(state_snapshot.os, "fsync", failing_fsync)
+
+    with pytest.raises(OSError):
+        write_bytes_atomic(str(tmp_path / "state.snap"), b"data")
+    assert os.listdir(tmp_path) == []
+
+
+def test_restore_then_continue_matches_uninterrupted_run(tmp_path, app_logging):
+    candles = random_walk_candles(3000)
+    reference = gold_strategy()
+    expected = [reference._process_market_data(candle) for candle in candles]
+    assert sum(s is not None for s in expected) > 10
+
+    # Bar 1614 closes with a two-trade grid open
+    split = 1615
+    first = gold_strategy()
+    signals = [first._process_market_data(candle) for candle in candles[:split]]
+    assert len(first.state.grid_trades) == 2
+    state_snapshot.write_snapshot(str(tmp_path / "gold.snap"), first)
+
+    restored = gold_strategy()
+    assert state_snapshot.load_snapshot(str(tmp_path / "gold.snap"), restored)
+    signals += [restored._process_market_data(candle) for candle in candles[split:]]
+
+    assert signal_actions(signals) == signal_actions(expected)
+    assert restored.state.grid_trades == reference.state.grid_trades
+    assert restored.state.setup_state == reference.state.setup_state
@@ -0,0 +1,44 @@
+from app.services.status_board import StatusBoard
+from conftest import gold_strategy, random_walk_candles
+
+
+def test_strategy_keeps_running_after_unregister_and_clear(app_logging):
+    board = StatusBoard()
+    first, second = gold_strategy(), gold_strategy()
+    first_key = first.attach_status_board(board, "first")
+    second.attach_status_board(board, "second")
+    candles = random_walk_candles(60)
+
+    for candle in candles[:20]:
+        first._process_market_data(candle)
+    assert board.get(first_key) is not None
+
+    board.unregister(first_key)
+    for candle in candles[20:40]:
+        first._process_market_data(candle)
+    assert board.get(first_key) is None
+
+    board.clear()
+    for candle in candles[40:]:
+        first._process_market_data(candle)
+        second._process_market_data(candle)
+    assert board.get_all_statuses().statuses == {}
+
+
+def test_clear_reports_removed_keys_to_pollers(app_logging):
+    board = StatusBoard()
+    board.register(object(), "a")
+    board.register(object(), "b")
+    board.publish("a", {"open_trades": 0})
+    board.publish("b", {"open_trades": 1})
+    seen = board.get_all_statuses()
+
+    board.clear()
+    update = board.get_all_statuses(seen.version)
+    assert update.version > seen.version
+    assert sorted(update.removed) == ["a", "b"] and not update.statuses
+    assert board.get_all_statuses(update.version).removed == ()
+
+    # Publishing to a cleared key is ignored
+    assert board.publish("a", {"open_trades": 2}) == 0
+    assert board.get_all_statuses(update.version).version == update.version
@@ -0,0 +1,95 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import symbol_registry as registry_module
+from app.services.symbol_registry import SymbolRegistry, heuristic_spec
+
+
+class _FakeMT5:
+    """symbol_info that, like MT5, only knows the broker's exact spelling"""
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.queried = []
+
+    def symbol_info(self, symbol):
+        self.queried.append(symbol)
+        fields = self.specs.get(symbol)
+        return SimpleNamespace(**fields) if fields is not None else None
+
+
+class _Module:
+    def __init__(self, module):
+        self.module = module
+
+    def get(self):
+        return self.module
+
+
+def _eurusdm(tick_value):
+    return {"point": 0.00001, "digits": 5, "trade_tick_size": 0.00001, "trade_tick_value": tick_value,
+            "trade_contract_size": 100_000.0, "volume_min": 0.01, "volume_max": 50.0, "volume_step": 0.01}
+
+
+@pytest.mark.parametrize("symbol, point", [
+    ("XAUUSD", 0.01), ("xauusd", 0.01), ("EURUSD", 0.0001), ("USDJPY", 0.0001),
+    ("XAGUSD", 0.0001), ("XPTUSD", 0.0001), ("XPDUSD", 0.0001),
+])
+def test_heuristic_point_matches_gold_buy_dip_baseline(symbol, point):
+    # Gold Buy Dip used `0.01 if "XAU" in pair else 0.0001`
+    assert heuristic_spec(symbol).point == point
+
+
+def test_suffixed_broker_symbols_are_loaded_and_refreshed_with_their_spelling(monkeypatch):
+    mt5 = _FakeMT5({"EURUSDm": _eurusdm(1.0)})
+    monkeypatch.setattr(registry_module, "_mt5", _Module(mt5))
+    registry = SymbolRegistry()
+
+    assert registry.load_from_mt5(["EURUSDm"]) == 1
+    spec = registry.get("EURUSDm")
+    assert spec.symbol == "EURUSDm" and spec.source == "mt5"
+    assert registry.get("EURUSDM") is spec
+    assert spec.pip_value == pytest.approx(10.0)
+
+    mt5.specs["EURUSDm"] = _eurusdm(0.9)
+    assert registry.refresh_tick_values() == 1
+    assert mt5.queried == ["EURUSDm", "EURUSDm"]
+    assert registry.get("EURUSDm").pip_value == pytest.approx(9.0)
+
+
+def test_snapshot_keeps_broker_spelling(tmp_path, monkeypatch, app_logging):
+    monkeypatch.setattr(registry_module, "_mt5", _Module(_FakeMT5({"EURUSDm": _eurusdm(1.0)})))
+    registry = SymbolRegistry()
+    registry.load_from_mt5(["EURUSDm"])
+    registry.save_json(str(tmp_path / "symbols.json"))
+
+    restored = SymbolRegistry()
+    assert restored.load_json(str(tmp_path / "symbols.json")) == 1
+    assert restored.get("eurusdm").symbol == "EURUSDm"
+    assert restored.get("EURUSDm").source == "snapshot"
+
+
+def test_symbols_is_safe_while_other_threads_register():
+    registry = SymbolRegistry()
+    stop = threading.Event()
+    errors = []
+
+    def reader():
+        while not stop.is_set():
+            try:
+                registry.symbols()
+            except RuntimeError as e:
+                errors.append(e)
+                return
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(20_000):
+        registry.get(f"SYM{i}")
+    stop.set()
+    thread.join()
+
+    assert errors == []
+    assert len(registry.symbols()) == 20_000
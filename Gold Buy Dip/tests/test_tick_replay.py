@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.tick_replay import TickReplayEngine, TickStream, bar_extremes, synthetic_ticks_from_ohlc
+from app.utilities.ohlc_arrays import datetime_to_us
+from conftest import import_app_module, load_strategy_module
+
+
+def test_bar_extremes_ignores_ticks_after_last_bar(app_logging):
+    ticks = TickStream(
+        bar_index=np.array([-1, 0, 0, 1, 2, 2, 5]),
+        bid=np.array([9.0, 1.0, 3.0, 2.0, 50.0, 0.5, 99.0]),
+        ask=np.array([9.5, 1.5, 3.5, 2.5, 50.5, 1.0, 99.5]),
+    )
+    extremes = bar_extremes(ticks, 2)
+
+    assert extremes["start"].tolist() == [1, 3]
+    assert extremes["stop"].tolist() == [3, 4]
+    assert extremes["min_bid"].tolist() == [1.0, 2.0]
+    assert extremes["max_bid"].tolist() == [3.0, 2.0]
+    assert extremes["max_ask"].tolist() == [3.5, 2.5]
+
+
+def test_bar_extremes_bars_without_ticks_are_nan():
+    ticks = TickStream(bar_index=np.array([1, 1]), bid=np.array([1.0, 2.0]), ask=np.array([1.0, 2.0]))
+    extremes = bar_extremes(ticks, 3)
+
+    assert np.isnan(extremes["max_bid"][0]) and np.isnan(extremes["max_bid"][2])
+    assert extremes["max_bid"][1] == 2.0
+
+
+class _RecordingMT5:
+    """Stand-in MetaTrader5 module: positions / rates are unavailable, every call is recorded"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name.isupper():
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return None
+        return call
+
+
+class _RecordingModule:
+    def __init__(self, module):
+        self.module = module
+
+    def get(self):
+        return self.module
+
+
+def test_rsi6_intra_bar_exits_place_no_broker_calls(monkeypatch):
+    trading_models = import_app_module("app.models.trading_models")
+    rsi6 = load_strategy_module("rsi_6_trades_strategy")
+    mt5 = _RecordingMT5()
+    monkeypatch.setattr(rsi6, "_mt5", _RecordingModule(mt5))
+
+    strategy = rsi6.RSI6TradesStrategy({"symbol": "EURUSD"}, "EURUSD", "M5")
+    calls_inside_close = []
+    close_at_price = strategy.close_at_price
+
+    def recording_close_at_price(*args, **kwargs):
+        before = len(mt5.calls)
+        signal = close_at_price(*args, **kwargs)
+        calls_inside_close.extend(mt5.calls[before:])
+        return signal
+    monkeypatch.setattr(strategy, "close_at_price", recording_close_at_price)
+
+    rng = np.random.default_rng(1)
+    n = 3000
+    closes = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    opens = np.r_[closes[0], closes[:-1]]
+    highs = np.maximum(opens, closes) + 0.0003
+    lows = np.minimum(opens, closes) - 0.0003
+    start = datetime(2024, 1, 1)
+    candles = [trading_models.MarketData(start + timedelta(minutes=5 * i), opens[i], highs[i], lows[i], closes[i])
+               for i in range(n)]
+
+    engine = TickReplayEngine(strategy, candles, synthetic_ticks_from_ohlc(opens, highs, lows, closes, 0.00002))
+    engine.run()
+
+    assert engine.intra_bar_exits > 0
+    assert calls_inside_close == []
+    assert not any(name.startswith("order") for name in mt5.calls)
+
+
+class _OneLevelStrategy:
+    """Long basket closed when the bid reaches 2.0; records the exit timestamps"""
+
+    def __init__(self):
+        self.exits = []
+
+    def get_exit_levels(self):
+        return [] if self.exits else [("BUY", 2.0, "TP")]
+
+    def close_at_price(self, side, price, reason, timestamp=None):
+        self.exits.append(timestamp)
+        return reason
+
+    def _process_market_data(self, candle):
+        return None
+
+
+def test_tick_exit_timestamps_match_bar_timestamp_kind(app_logging):
+    start = datetime(2024, 1, 1)
+    candles = [SimpleNamespace(timestamp=start + timedelta(minutes=5 * i), close=1.0) for i in range(2)]
+    tick_time = start + timedelta(minutes=3, seconds=7)
+    ticks = TickStream(bar_index=np.array([1, 1]), bid=np.array([1.5, 2.5]), ask=np.array([1.5, 2.5]),
+                       times=np.array([datetime_to_us(tick_time) - 1, datetime_to_us(tick_time)]))
+    strategy = _OneLevelStrategy()
+    TickReplayEngine(strategy, candles, ticks).run()
+
+    assert strategy.exits == [tick_time]
+    assert strategy.exits[0].tzinfo is None
+
+
+def test_rsi6_side_resets_are_journalled_at_bar_time(monkeypatch, tmp_path):
+    trading_models = import_app_module("app.models.trading_models")
+    rsi6 = load_strategy_module("rsi_6_trades_strategy")
+    from app.services.event_journal import EVENT_SIDE_RESET, EventJournal, JournalReader
+    from app.utilities.clock import ReplayClock
+
+    # The broker reports no positions, so the bar's sync resets the stale SELL side
+    monkeypatch.setattr(rsi6, "_mt5", _RecordingModule(SimpleNamespace(positions_get=lambda symbol: [])))
+    # Never observed: reading it would raise
+    strategy = rsi6.RSI6TradesStrategy({"symbol": "EURUSD"}, "EURUSD", "M5", clock=ReplayClock())
+    monkeypatch.setattr(strategy.clock, "observe", lambda timestamp: None)
+    strategy.journal = EventJournal(str(tmp_path / "rsi6.evj"))
+    strategy.sell_state.first_price, strategy.sell_state.expected_trades = 1.2, 2
+
+    bar_time = datetime(2024, 1, 1, 12, 0)
+    strategy._process_market_data(trading_models.MarketData(bar_time, 1.1, 1.101, 1.099, 1.1))
+
+    # A tick exit resets the BUY side at the tick's time
+    tick_time = bar_time + timedelta(minutes=2, seconds=30)
+    strategy.current_positions = [{"ticket": 1, "type": "BUY", "volume": 0.01, "price": 1.1, "time": 0}]
+    strategy.buy_state.first_price, strategy.buy_state.expected_trades = 1.1, 1
+    assert strategy.close_at_price("BUY", 1.105, "TP", tick_time) is not None
+    strategy.journal.flush()
+
+    reader = JournalReader(str(tmp_path / "rsi6.evj"))
+    resets = [(event.code, event.timestamp) for event in reader.events(reader.select(kind=EVENT_SIDE_RESET))]
+    assert resets == [("SELL", bar_time), ("BUY", tick_time)]
+    assert len(reader.select(kind=EVENT_SIDE_RESET, start=bar_time, stop=bar_time + timedelta(minutes=5))) == 2
+    reader.close()
+    strategy.journal.close()
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import import_app_module, load_strategy_module
+
+START = datetime(2024, 1, 1)
+
+
+def _gold_strategy(trade_ledger):
+    strategy_models = import_app_module("app.models.strategy_models")
+    gold = load_strategy_module("gold_buy_dip_strategy")
+    strategy = gold.GoldBuyDipStrategy(strategy_models.GoldBuyDipConfig(), "XAUUSD")
+    strategy.trade_ledger = trade_ledger.TradeLedger()
+    return strategy
+
+
+def _open_grid(strategy, direction, fills):
+    strategy.state.setup_state = "TRADE_EXECUTED"
+    strategy.state.grid_trades = [
+        {"price": price, "direction": direction, "lot_size": lots, "grid_level": level, "ticket": None,
+         "open_time": START + timedelta(minutes=15 * level)}
+        for level, (price, lots) in enumerate(fills)
+    ]
+
+
+def test_gold_intra_bar_close_records_the_basket(app_logging):
+    trade_ledger = import_app_module("app.services.trade_ledger")
+    strategy = _gold_strategy(trade_ledger)
+    ledger = strategy.trade_ledger
+    _open_grid(strategy, "BUY", [(2000.0, 0.1), (1990.0, 0.3)])
+
+    exit_time = START + timedelta(hours=2)
+    assert strategy.close_at_price("BUY", 2000.0, "Grid profit target reached", exit_time) is not None
+
+    spec = strategy.symbol_registry.get("XAUUSD")
+    average = (2000.0 * 0.1 + 1990.0 * 0.3) / 0.4
+    pips = (2000.0 - average) / spec.pip_size
+    assert len(ledger) == 1
+    assert ledger.column("depth").tolist() == [2]
+    assert ledger.column("s1_entry_price")[0] == pytest.approx(average)
+    assert ledger.column("s1_lots")[0] == pytest.approx(0.4)
+    assert ledger.column("pnl")[0] == pytest.approx(pips * spec.pip_value * 0.4)
+    assert ledger.labels("symbol1").tolist() == ["XAUUSD"]
+    assert ledger.labels("trade_type").tolist() == ["BUY"]
+    assert ledger.column("exit_time_us")[0] - ledger.column("entry_time_us")[0] == 2 * 3_600_000_000
+    assert ledger.metrics.wins == 1
+
+
+def test_sell_basket_closed_above_entry_is_a_loss():
+    trade_ledger = import_app_module("app.services.trade_ledger")
+    ledger = trade_ledger.TradeLedger()
+
+    class _Strategy:
+        pair = "XAUUSD"
+        symbol_registry = import_app_module("app.services.symbol_registry").SymbolRegistry()
+
+    trades = [{"price": 2000.0, "direction": "SELL", "lot_size": 0.1, "open_time": START}]
+    ledger.append_grid_basket(_Strategy(), trades, 2005.0, START + timedelta(hours=1), "Strategy maximum drawdown exceeded")
+
+    assert ledger.column("s1_pips")[0] == pytest.approx(-5.0 / _Strategy.symbol_registry.get("XAUUSD").pip_size)
+    assert ledger.column("pnl")[0] < 0
+    assert ledger.metrics.losses == 1
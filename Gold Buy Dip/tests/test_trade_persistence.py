@@ -0,0 +1,182 @@
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+from app.services.trade_persistence import TradePersistence, create_tables, strategy_exits, strategy_trades
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'trades.db'}")
+    create_tables(engine)
+    yield engine
+    engine.dispose()
+
+
+def _strategy(pair="XAUUSD", state=None):
+    return SimpleNamespace(strategy_name="gold_buy_dip", pair=pair, timeframe="15M", state=state)
+
+
+def _signal(action, lot_size=0.1, reason="test", entry_price=None):
+    return SimpleNamespace(action=action, lot_size=lot_size, reason=reason, entry_price=entry_price)
+
+
+def _count(engine, table):
+    with Session(bind=engine) as session:
+        return session.scalar(select(func.count()).select_from(table))
+
+
+class _FailingCommits:
+    """Session factory whose first ``failures`` commits raise"""
+
+    def __init__(self, engine, failures):
+        self.engine = engine
+        self.failures = failures
+        self.commits = 0
+
+    def __call__(self):
+        session = Session(bind=self.engine)
+        commit = session.commit
+
+        def failing_commit():
+            self.commits += 1
+            if self.failures > 0:
+                self.failures -= 1
+                raise RuntimeError("database is locked")
+            commit()
+        session.commit = failing_commit
+        return session
+
+
+def test_rows_are_written_in_batches(engine, app_logging):
+    persistence = TradePersistence(lambda: Session(bind=engine), batch_size=20, flush_interval=0.01)
+    strategy = _strategy()
+    for i in range(45):
+        persistence.record_signal(strategy, _signal("BUY"), START + timedelta(minutes=15 * i), 2000.0 + i, grid_level=i % 5)
+    for i in range(5):
+        persistence.record_signal(strategy, _signal("CLOSE_ALL"), START + timedelta(days=1, minutes=i), 2100.0)
+    assert persistence.pending == 50 and _count(engine, strategy_trades) == 0
+
+    # Started after queueing, so the writer drains full batches
+    persistence.start()
+    assert persistence.flush(5)
+    persistence.stop()
+
+    assert _count(engine, strategy_trades) == 45
+    assert _count(engine, strategy_exits) == 5
+    assert persistence.batches == 3
+    assert persistence.stats()["written"] == 50 and persistence.stats()["pending"] == 0
+    with Session(bind=engine) as session:
+        row = session.execute(select(strategy_trades).where(strategy_trades.c.grid_level == 3)).first()
+        assert row.action == "BUY" and row.entry_price == pytest.approx(2003.0) and row.opened_at == START + timedelta(minutes=45)
+        exit_row = session.execute(select(strategy_exits)).first()
+        assert exit_row.action == "CLOSE_ALL" and exit_row.exit_price_s1 == pytest.approx(2100.0)
+
+
+def test_ticket_update_matches_one_position(engine, app_logging):
+    persistence = TradePersistence(lambda: Session(bind=engine), flush_interval=0.01)
+    gold, eurusd = _strategy(), _strategy("EURUSD")
+    opened, later = START, START + timedelta(hours=1)
+    # Same grid level in another position, another pair and at another time
+    persistence.record_trade(gold, _signal("BUY"), opened, 2000.0, grid_level=1)
+    persistence.record_trade(gold, _signal("BUY"), opened, 2000.0, grid_level=0)
+    persistence.record_trade(gold, _signal("BUY"), later, 2010.0, grid_level=1)
+    persistence.record_trade(eurusd, _signal("BUY"), opened, 1.1, grid_level=1)
+    persistence.update_ticket(gold, 1, 12345, opened)
+
+    persistence.start()
+    assert persistence.flush(5)
+    persistence.stop()
+
+    with Session(bind=engine) as session:
+        rows = session.execute(select(strategy_trades.c.pair, strategy_trades.c.grid_level,
+                                      strategy_trades.c.opened_at, strategy_trades.c.ticket)
+                               .order_by(strategy_trades.c.id)).all()
+    assert [row.ticket for row in rows] == ["12345", None, None, None]
+    assert (rows[0].pair, rows[0].grid_level, rows[0].opened_at) == ("XAUUSD", 1, opened)
+
+
+def test_failed_commit_is_retried_with_backoff(engine, app_logging):
+    sessions = _FailingCommits(engine, failures=2)
+    persistence = TradePersistence(sessions, flush_interval=0.01, max_retries=3, retry_backoff=0.02)
+    persistence.record_trade(_strategy(), _signal("BUY"), START, 2000.0)
+
+    started = time.monotonic()
+    persistence.start()
+    assert persistence.flush(5)
+    persistence.stop()
+
+    # Two failed attempts wait 0.02s and 0.04s before the third succeeds
+    assert time.monotonic() - started >= 0.06
+    assert sessions.commits == 3
+    assert persistence.retries == 2 and persistence.written == 1 and not persistence.failed
+    assert _count(engine, strategy_trades) == 1
+
+
+def test_exhausted_batch_moves_to_failed_and_can_be_requeued(engine, app_logging):
+    sessions = _FailingCommits(engine, failures=2)
+    persistence = TradePersistence(sessions, flush_interval=0.01, max_retries=1, retry_backoff=0.01)
+    persistence.record_trade(_strategy(), _signal("BUY"), START, 2000.0)
+    persistence.record_exit(_strategy(), _signal("CLOSE_ALL"), START + timedelta(hours=1), 2010.0)
+
+    persistence.start()
+    assert persistence.flush(5)
+    assert len(persistence.failed) == 2 and persistence.written == 0
+    assert _count(engine, strategy_trades) == 0 and _count(engine, strategy_exits) == 0
+
+    assert persistence.retry_failed() == 2
+    assert persistence.flush(5)
+    persistence.stop()
+
+    assert not persistence.failed and persistence.written == 2
+    assert _count(engine, strategy_trades) == 1 and _count(engine, strategy_exits) == 1
+
+
+def test_full_queue_drops_and_counts_without_blocking(engine, app_logging):
+    persistence = TradePersistence(lambda: Session(bind=engine), max_queue=3)
+    strategy = _strategy()
+
+    started = time.monotonic()
+    for i in range(10):
+        persistence.record_trade(strategy, _signal("BUY"), START + timedelta(minutes=i), 2000.0)
+    persistence.update_ticket(strategy, 0, 1, START)
+    assert time.monotonic() - started < 1.0
+
+    assert persistence.dropped == 8
+    assert persistence.stats()["queued"] == 3 and persistence.pending == 3
+
+    persistence.start()
+    assert persistence.flush(5)
+    persistence.stop()
+    assert _count(engine, strategy_trades) == 3
+
+
+def test_full_failed_rows_count_evictions(engine, app_logging):
+    sessions = _FailingCommits(engine, failures=100)
+    persistence = TradePersistence(sessions, batch_size=2, flush_interval=0.01, max_retries=0, max_failed=3)
+    for i in range(5):
+        persistence.record_trade(_strategy(), _signal("BUY"), START + timedelta(minutes=i), 2000.0)
+
+    persistence.start()
+    assert persistence.flush(5)
+    persistence.stop()
+
+    assert persistence.failed_evicted == 2 and persistence.stats()["failed_evicted"] == 2
+    assert [row["opened_at"] for _, row in persistence.failed] == [START + timedelta(minutes=i) for i in (2, 3, 4)]
+
+
+def test_stop_without_start_writes_pending_rows(engine, app_logging):
+    persistence = TradePersistence(lambda: Session(bind=engine), batch_size=2)
+    for i in range(5):
+        persistence.record_trade(_strategy(), _signal("BUY"), START + timedelta(minutes=i), 2000.0)
+
+    persistence.stop()
+
+    assert persistence.pending == 0 and persistence.batches == 3
+    assert _count(engine, strategy_trades) == 5
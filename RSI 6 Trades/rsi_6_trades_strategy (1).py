@@ -11,24 +11,27 @@ ATR-derived target.
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
-
-try:
-    import MetaTrader5 as mt5
-except ImportError as exc:
-    mt5 = None
-    _import_error = exc
-else:
-    _import_error = None
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 from app.services.base_strategy import BaseStrategy
 from app.models.strategy_models import RSI6TradesConfig, RSI6TradesState
 from app.models.trading_models import MarketData, TradeSignal, TradeDirection
-from app.utilities.forex_logger import forex_logger
+from app.indicators import kernels as indicator_kernels
+from app.utilities.clock import Clock, system_clock
+from app.utilities.lazy_imports import OptionalModule, lazy_logger
+from app.utilities.ohlc_arrays import candles_to_arrays, arrays_to_candles, tail_start
+
+if TYPE_CHECKING:
+    from app.services.event_journal import EventJournal
+    from app.services.trade_persistence import TradePersistence
+    from app.services.status_board import StatusBoard
+
+logger = lazy_logger(__name__)
 
-logger = forex_logger.get_logger(__name__)
+# Broker API, imported on the first MT5 call rather than with the strategy
+_mt5 = OptionalModule("MetaTrader5")
 
 _TIMEFRAME_ALIASES: Dict[str, str] = {
     "M1": "TIMEFRAME_M1", "M2": "TIMEFRAME_M2", "M3": "TIMEFRAME_M3", "M4": "TIMEFRAME_M4",
@@ -45,8 +48,9 @@ def _resolve_timeframe(value: str | int) -> Tuple[int, str]:
     tf = str(value).upper().strip()
     if tf.startswith("PERIOD_"):
         tf = tf.replace("PERIOD_", "")
+    mt5 = _mt5.get()
     if mt5 is None:
-        raise RuntimeError("MetaTrader5 module required") from _import_error
+        raise RuntimeError("MetaTrader5 module required") from _mt5.import_error
     attr_name = _TIMEFRAME_ALIASES.get(tf)
     if attr_name and hasattr(mt5, attr_name):
         return getattr(mt5, attr_name), tf
@@ -104,6 +108,15 @@ def calculate_atr_series(highs: List[float], lows: List[float], closes: List[flo
     
     return atrs
 
+# Keep the Python implementations reachable for kernel parity checks
+python_calculate_rsi_series = calculate_rsi_series
+python_calculate_atr_series = calculate_atr_series
+
+if indicator_kernels.ACCELERATED:
+    # Compiled kernels with identical output (indicator_kernels.check_parity)
+    calculate_rsi_series = indicator_kernels.calculate_rsi_series
+    calculate_atr_series = indicator_kernels.calculate_atr_series
+
 @dataclass
 class SideState:
     first_rsi: float = 0.0
@@ -127,8 +140,9 @@ class RSI6TradesStrategy(BaseStrategy):
     - Martingale position sizing
     """
     
-    def __init__(self, config: dict, pair: str, timeframe: str, db_session=None):
+    def __init__(self, config: dict, pair: str, timeframe: str, db_session=None, clock: Optional[Clock] = None):
         super().__init__(pair, timeframe, "RSI6Trades", db_session)
+        self.clock = clock or system_clock
         
         # Convert dict config to RSI6TradesConfig
         self.config = RSI6TradesConfig(**config)
@@ -146,9 +160,77 @@ class RSI6TradesStrategy(BaseStrategy):
         self.current_positions = []
         self._broker_positions_available = False
         
+        # Optional binary record of side resets and signals (app.services.event_journal)
+        self.journal: Optional["EventJournal"] = None
+        # Optional write-behind trade rows (app.services.trade_persistence)
+        self.persistence: Optional["TradePersistence"] = None
+        # Optional per-bar status snapshots for dashboards (app.services.status_board)
+        self.status_board: Optional["StatusBoard"] = None
+        self.status_key: Optional[str] = None
+        
         logger.info(f"RSI 6 Trades Strategy initialized for {pair} on {timeframe}")
     
+    def warm_up(self, ohlc_arrays: Dict[str, Any]) -> int:
+        """
+        Seed the candle buffer from a block of history in one call.
+        
+        ohlc_arrays holds timestamp/open/high/low/close columns (see
+        app.utilities.ohlc_arrays). Only the tail kept by the buffer is materialised;
+        no signals are evaluated, the broker is not queried and nothing is logged.
+        Returns the buffer length.
+        """
+        self.candle_data = arrays_to_candles(ohlc_arrays, MarketData, tail_start(ohlc_arrays, self.max_candles))
+        return len(self.candle_data)
+    
+    def fast_forward(self, candles: List[MarketData]) -> int:
+        """
+        Buffer stale bars without evaluating signals (catch-up, see app.services.catch_up).
+        
+        The broker is not queried and no entries or exits are checked; only the newest
+        bar of a backlog goes through _process_market_data. Zone permissions are still
+        reset for every skipped bar where the lower-timeframe RSI left its zone, so a
+        re-entry into the zone is not missed. Returns the number of bars skipped.
+        """
+        if not candles:
+            return 0
+        self.clock.observe(candles[-1].timestamp)
+        first = len(self.candle_data)
+        self.candle_data.extend(candles)
+        
+        ltf_value = getattr(self.config, "rsi_timeframe", self.timeframe)
+        zones_used = self.buy_state.zone_used or self.sell_state.zone_used
+        if zones_used and self._normalize_timeframe_key(ltf_value) == self._normalize_timeframe_key(self.timeframe):
+            # Same windows as _process_market_data / _load_timeframe_data on each skipped bar
+            min_candles = max(self.config.rsi_period, self.config.atr_grid_period, self.config.atr_tp_period) + 10
+            required = max(self.config.rsi_period + 2, 20)
+            closes = [float(c.close) for c in self.candle_data]
+            for end in range(max(first, min_candles - 1, required - 1), len(closes)):
+                window = closes[max(0, end + 1 - (required + 5)):end + 1]
+                rsi_series = calculate_rsi_series(window, self.config.rsi_period)
+                if len(rsi_series) >= 2 and rsi_series[-1] is not None and rsi_series[-2] is not None:
+                    self._update_zone_permissions(float(rsi_series[-2]), float(rsi_series[-1]))
+                    if not (self.buy_state.zone_used or self.sell_state.zone_used):
+                        break
+        
+        if len(self.candle_data) > self.max_candles:
+            self.candle_data = self.candle_data[-self.max_candles:]
+        return len(candles)
+    
     def _process_market_data(self, candle: MarketData, current_equity: float = None) -> Optional[TradeSignal]:
+        """Evaluate one closed bar, publishing the status and recording any signal"""
+        signal = self._evaluate_market_data(candle, current_equity)
+        if self.status_board is not None:
+            self.publish_status()
+        if signal is None:
+            return None
+        if self.journal is not None:
+            open_trades = self._count_side_orders(True) + self._count_side_orders(False)
+            self.journal.record_signal(candle.timestamp, signal, candle.close, open_trades)
+        if self.persistence is not None:
+            self.persistence.record_signal(self, signal, candle.timestamp, candle.close)
+        return signal
+    
+    def _evaluate_market_data(self, candle: MarketData, current_equity: float = None) -> Optional[TradeSignal]:
         """
         Process market data following the exact flow from documentation:
         1. Check exit conditions (priority)
@@ -157,8 +239,10 @@ class RSI6TradesStrategy(BaseStrategy):
         4. Check first entry conditions
         5. Check scaling conditions
         """
+        self.clock.observe(candle.timestamp)
+        
         # Sync live positions before making decisions so we do not rely on stale local state
-        self._refresh_positions_cache()
+        self._refresh_positions_cache(candle.timestamp)
         
         # Add candle to data storage
         self.candle_data.append(candle)
@@ -193,7 +277,7 @@ class RSI6TradesStrategy(BaseStrategy):
         if scale_signal:
             return scale_signal
         
-        self.state.last_tick_time = datetime.now()
+        self.state.last_tick_time = self.clock.now()
         return None
     
     def _collect_indicators(self) -> Optional[Dict[str, float]]:
@@ -321,6 +405,7 @@ class RSI6TradesStrategy(BaseStrategy):
             lows = [float(getattr(c, "low", 0.0)) for c in window]
             return closes, highs, lows
         
+        mt5 = _mt5.get()
         if mt5 is None:
             logger.debug("MetaTrader5 module unavailable; cannot load timeframe %s", tf_key)
             return None
@@ -355,7 +440,7 @@ class RSI6TradesStrategy(BaseStrategy):
         lows = [float(entry["low"]) for entry in rates_slice]
         return closes, highs, lows
 
-    def _refresh_positions_cache(self) -> None:
+    def _refresh_positions_cache(self, timestamp: Any) -> None:
         """
         Synchronise the in-memory position cache with live broker data when available.
         Falls back to the local cache if MT5 is unavailable or returns an error.
@@ -367,11 +452,12 @@ class RSI6TradesStrategy(BaseStrategy):
         
         self._broker_positions_available = True
         self.current_positions = broker_positions
-        self._sync_side_state_from_positions(is_buy=True)
-        self._sync_side_state_from_positions(is_buy=False)
+        self._sync_side_state_from_positions(is_buy=True, timestamp=timestamp)
+        self._sync_side_state_from_positions(is_buy=False, timestamp=timestamp)
 
     def _get_broker_positions(self) -> Optional[List[Dict[str, Any]]]:
         """Fetch open positions from MT5 filtered by symbol, comment, and magic number."""
+        mt5 = _mt5.get()
         if mt5 is None:
             return None
         
@@ -412,7 +498,7 @@ class RSI6TradesStrategy(BaseStrategy):
             })
         return filtered
 
-    def _sync_side_state_from_positions(self, is_buy: bool) -> None:
+    def _sync_side_state_from_positions(self, is_buy: bool, timestamp: Any) -> None:
         """Align side state with live broker positions, clearing expectations when fills fail."""
         side = self.buy_state if is_buy else self.sell_state
         target_type = "BUY" if is_buy else "SELL"
@@ -422,7 +508,7 @@ class RSI6TradesStrategy(BaseStrategy):
         if count == 0:
             if side.expected_trades > 0 or side.first_price != 0.0:
                 logger.debug("Broker shows no %s positions; resetting local side state", target_type)
-                self._reset_side_state(is_buy)
+                self._reset_side_state(is_buy, timestamp)
             return
         
         side.zone_used = True
@@ -618,43 +704,15 @@ class RSI6TradesStrategy(BaseStrategy):
             # Exit condition 1: Retrace to first entry (priority exit)
             if sell_count > 1 and self.sell_state.first_price > 0.0:
                 if current_price <= self.sell_state.first_price:
-                    self._close_all_side_orders(is_buy=False)
-                    self._reset_side_state(is_buy=False)
-                    
                     logger.info(f"Closed SELL basket - retrace to first entry @ {current_price:.5f}")
-                    
-                    return TradeSignal(
-                        action=TradeDirection.CLOSE_SELL,
-                        entry_price=current_price,
-                        lot_size=0.0,  # Close all
-                        take_profit=None,
-                        stop_loss=None,
-                        timestamp=candle.timestamp,
-                        confidence=1.0,
-                        strategy_name=self.strategy_name,
-                        signal_strength=1.0
-                    )
+                    return self._close_basket(is_buy=False, price=current_price, timestamp=candle.timestamp)
             
             # Exit condition 2: ATR take profit using VWAP
             if sell_count < self.config.max_trades and self.sell_state.atr_tp > 0.0:
                 vwap, total_volume = self._side_vwap(is_buy=False)
                 if total_volume > 0.0 and (vwap - current_price) >= self.sell_state.atr_tp:
-                    self._close_all_side_orders(is_buy=False)
-                    self._reset_side_state(is_buy=False)
-                    
                     logger.info(f"Closed SELL basket - ATR TP @ {current_price:.5f} (VWAP {vwap:.5f})")
-                    
-                    return TradeSignal(
-                        action=TradeDirection.CLOSE_SELL,
-                        entry_price=current_price,
-                        lot_size=0.0,  # Close all
-                        take_profit=None,
-                        stop_loss=None,
-                        timestamp=candle.timestamp,
-                        confidence=1.0,
-                        strategy_name=self.strategy_name,
-                        signal_strength=1.0
-                    )
+                    return self._close_basket(is_buy=False, price=current_price, timestamp=candle.timestamp)
         
         # Check BUY positions exit
         buy_count = self._count_side_orders(is_buy=True)
@@ -664,46 +722,78 @@ class RSI6TradesStrategy(BaseStrategy):
             # Exit condition 1: Retrace to first entry (priority exit)
             if buy_count > 1 and self.buy_state.first_price > 0.0:
                 if current_price >= self.buy_state.first_price:
-                    self._close_all_side_orders(is_buy=True)
-                    self._reset_side_state(is_buy=True)
-                    
                     logger.info(f"Closed BUY basket - retrace to first entry @ {current_price:.5f}")
-                    
-                    return TradeSignal(
-                        action=TradeDirection.CLOSE_BUY,
-                        entry_price=current_price,
-                        lot_size=0.0,  # Close all
-                        take_profit=None,
-                        stop_loss=None,
-                        timestamp=candle.timestamp,
-                        confidence=1.0,
-                        strategy_name=self.strategy_name,
-                        signal_strength=1.0
-                    )
+                    return self._close_basket(is_buy=True, price=current_price, timestamp=candle.timestamp)
             
             # Exit condition 2: ATR take profit using VWAP
             if buy_count < self.config.max_trades and self.buy_state.atr_tp > 0.0:
                 vwap, total_volume = self._side_vwap(is_buy=True)
                 if total_volume > 0.0 and (current_price - vwap) >= self.buy_state.atr_tp:
-                    self._close_all_side_orders(is_buy=True)
-                    self._reset_side_state(is_buy=True)
-                    
                     logger.info(f"Closed BUY basket - ATR TP @ {current_price:.5f} (VWAP {vwap:.5f})")
-                    
-                    return TradeSignal(
-                        action=TradeDirection.CLOSE_BUY,
-                        entry_price=current_price,
-                        lot_size=0.0,  # Close all
-                        take_profit=None,
-                        stop_loss=None,
-                        timestamp=candle.timestamp,
-                        confidence=1.0,
-                        strategy_name=self.strategy_name,
-                        signal_strength=1.0
-                    )
+                    return self._close_basket(is_buy=True, price=current_price, timestamp=candle.timestamp)
         
         return None
     
+    def _close_basket(self, is_buy: bool, price: float, timestamp: Any) -> TradeSignal:
+        """Close every position on one side and build the matching CLOSE signal"""
+        self._close_all_side_orders(is_buy=is_buy)
+        self._reset_side_state(is_buy=is_buy, timestamp=timestamp)
+        return TradeSignal(
+            action=TradeDirection.CLOSE_BUY if is_buy else TradeDirection.CLOSE_SELL,
+            entry_price=price,
+            lot_size=0.0,  # Close all
+            take_profit=None,
+            stop_loss=None,
+            timestamp=timestamp,
+            confidence=1.0,
+            strategy_name=self.strategy_name,
+            signal_strength=1.0
+        )
+    
+    def get_exit_levels(self) -> List[Tuple[str, float, str]]:
+        """
+        Price levels at which an open basket would be closed, as (side, level, reason).
+        
+        BUY baskets close when the BID reaches the level or above, SELL baskets when the
+        ASK reaches the level or below. Used by tick replay to evaluate exits intra-bar
+        with the same rules as `_try_close_by_targets`.
+        """
+        levels: List[Tuple[str, float, str]] = []
+        
+        sell_count = self._count_side_orders(is_buy=False)
+        if sell_count > 0:
+            if sell_count > 1 and self.sell_state.first_price > 0.0:
+                levels.append(("SELL", self.sell_state.first_price, "retrace to first entry"))
+            if sell_count < self.config.max_trades and self.sell_state.atr_tp > 0.0:
+                vwap, total_volume = self._side_vwap(is_buy=False)
+                if total_volume > 0.0:
+                    levels.append(("SELL", vwap - self.sell_state.atr_tp, "ATR TP"))
+        
+        buy_count = self._count_side_orders(is_buy=True)
+        if buy_count > 0:
+            if buy_count > 1 and self.buy_state.first_price > 0.0:
+                levels.append(("BUY", self.buy_state.first_price, "retrace to first entry"))
+            if buy_count < self.config.max_trades and self.buy_state.atr_tp > 0.0:
+                vwap, total_volume = self._side_vwap(is_buy=True)
+                if total_volume > 0.0:
+                    levels.append(("BUY", vwap + self.buy_state.atr_tp, "ATR TP"))
+        
+        return levels
+    
+    def close_at_price(self, side: str, price: float, reason: str, timestamp: Any = None) -> Optional[TradeSignal]:
+        """Close one basket at an intra-bar price reported by tick replay"""
+        is_buy = side == "BUY"
+        if self._count_side_orders(is_buy) == 0:
+            return None
+        logger.info(f"Closed {side} basket - {reason} @ {price:.5f} (intra-bar)")
+        signal = self._close_basket(is_buy=is_buy, price=price, timestamp=timestamp)
+        if self.journal is not None:
+            self.journal.record_signal(timestamp, signal, price, self._count_side_orders(not is_buy))
+        if self.persistence is not None:
+            self.persistence.record_exit(self, signal, timestamp, price)
+        self.publish_status()
+        return signal
+    
     # Helper methods for position management (simulated for BaseStrategy interface)
     
     def _count_side_orders(self, is_buy: bool) -> int:
@@ -768,7 +858,7 @@ class RSI6TradesStrategy(BaseStrategy):
             "type": position_type,
             "volume": volume,
             "price": price,
-            "time": datetime.now().timestamp()
+            "time": self.clock.now().timestamp()
         })
     
     def _close_all_side_orders(self, is_buy: bool) -> bool:
@@ -780,9 +870,12 @@ class RSI6TradesStrategy(BaseStrategy):
         self.current_positions = [pos for pos in self.current_positions if pos["type"] != target_type]
         return True
     
-    def _reset_side_state(self, is_buy: bool) -> None:
-        """Reset state for one side"""
+    def _reset_side_state(self, is_buy: bool, timestamp: Any) -> None:
+        """Reset state for one side, journalling the reset at the bar or tick ``timestamp``"""
         side = self.buy_state if is_buy else self.sell_state
+        if self.journal is not None:
+            self.journal.record_side_reset(timestamp, "BUY" if is_buy else "SELL", side.first_price,
+                                           side.expected_trades)
         side.first_rsi = 0.0
         side.next_index = 1
         side.zone_used = False
@@ -800,6 +893,41 @@ class RSI6TradesStrategy(BaseStrategy):
         self.current_positions = []
         logger.info("RSI 6 Trades strategy state reset")
     
+    def snapshot_state(self) -> Dict[str, Any]:
+        """Full strategy state for app.services.state_snapshot (candles stored as columns)"""
+        return {
+            "state": dict(vars(self.state)),
+            "buy_state": asdict(self.buy_state),
+            "sell_state": asdict(self.sell_state),
+            "positions": [dict(pos) for pos in self.current_positions],
+            "candles": candles_to_arrays(self.candle_data),
+        }
+    
+    def restore_state(self, snapshot: Dict[str, Any]) -> None:
+        """Restore state written by snapshot_state(); broker positions re-sync on the next bar"""
+        state = RSI6TradesState()
+        for key, value in snapshot["state"].items():
+            setattr(state, key, value)
+        self.state = state
+        self.buy_state = SideState(**snapshot["buy_state"])
+        self.sell_state = SideState(**snapshot["sell_state"])
+        self.current_positions = list(snapshot["positions"])
+        self.candle_data = arrays_to_candles(snapshot["candles"], MarketData)
+        logger.info(f"RSI 6 Trades state restored: {len(self.current_positions)} positions, {len(self.candle_data)} candles")
+        self.publish_status()
+    
+    def attach_status_board(self, board: "StatusBoard", key: Optional[str] = None) -> str:
+        """Publish get_status() to a shared StatusBoard at the end of every bar"""
+        self.status_board = board
+        self.status_key = board.register(self, key)
+        self.publish_status()
+        return self.status_key
+    
+    def publish_status(self):
+        """Publish the current status to the attached status board"""
+        if self.status_board is not None:
+            self.status_board.publish(self.status_key, self.get_status())
+    
     def get_status(self) -> dict:
         """Get current strategy status"""
         return {
@@ -1,29 +1,64 @@
 """RSI Pairs Trading Strategy Implementation"""
 
-from typing import List, Optional, Dict, Any
+from typing import TYPE_CHECKING, List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from decimal import Decimal
-from sqlalchemy.orm import Session
+import numpy as np
 from app.models.trading_models import MarketData, TradeSignal, TradeDirection
 from app.models.strategy_models import RSIPairsConfig, RSIPairsState
 from app.indicators.rsi import calculate_rsi
-from app.indicators.atr import calculate_atr
-from app.utilities.forex_logger import forex_logger
+# Compiled kernel when available, otherwise app.indicators.atr
+from app.indicators.kernels import calculate_atr
+from app.indicators.spread import LEG_DIRECTIONS, SpreadStats, positive_entry
 from app.services.base_strategy import BaseStrategy
+from app.services.symbol_registry import symbol_registry
+from app.utilities.clock import Clock, system_clock
+from app.utilities.lazy_imports import lazy_logger
+from app.utilities.ohlc_arrays import candles_to_arrays, arrays_to_candle_dicts, tail_start
 
-logger = forex_logger.get_logger(__name__)
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+    from app.services.trade_ledger import TradeLedger
+    from app.services.event_journal import EventJournal
+    from app.services.trade_persistence import TradePersistence
+    from app.services.status_board import StatusBoard
+
+logger = lazy_logger(__name__)
 
 class RSIPairsStrategy(BaseStrategy):
     """RSI Pairs Trading Strategy with positive/negative correlation modes"""
     
-    def __init__(self, config: RSIPairsConfig, pair: str, timeframe: str = "5M", db: Session = None):
+    def __init__(self, config: RSIPairsConfig, pair: str, timeframe: str = "5M", db: "Session" = None,
+                 clock: Optional[Clock] = None):
         super().__init__(pair, timeframe, "rsi_pairs", db)
         self.config = config
+        self.clock = clock or system_clock
         self.state = RSIPairsState()
         
         # Store both symbols for pairs trading
         self.symbol1 = config.symbol1
         self.symbol2 = config.symbol2
+        self.symbol_registry = symbol_registry
+        
+        # Hedge-adjusted spread statistics for the positive correlation mode
+        self.spread_stats = SpreadStats(getattr(config, "spread_window", 100))
+        # Warm-up closes per symbol until both legs are in and the spread can be seeded
+        self._warm_up_closes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        
+        # Optional columnar trade history (app.services.trade_ledger), shared or per instance
+        self.trade_ledger: Optional["TradeLedger"] = None
+        
+        # Optional binary record of signals (app.services.event_journal)
+        self.journal: Optional["EventJournal"] = None
+        
+        # Optional write-behind entry / exit rows (app.services.trade_persistence)
+        self.persistence: Optional["TradePersistence"] = None
+        
+        # Optional per-bar status snapshots for dashboards (app.services.status_board);
+        # published with the indicators of the last processed bar
+        self.status_board: Optional["StatusBoard"] = None
+        self.status_key: Optional[str] = None
+        self._last_indicators: Optional[Dict[str, float]] = None
         
 
         
@@ -51,6 +86,42 @@ class RSIPairsStrategy(BaseStrategy):
             if len(self.state.s2_candles) > max_needed:
                 self.state.s2_candles = self.state.s2_candles[-max_needed:]
     
+    def warm_up(self, ohlc_arrays: Dict[str, Any], symbol: Optional[str] = None) -> int:
+        """
+        Seed one symbol's candle buffer (symbol1 by default) from a block of history.
+        
+        ohlc_arrays holds timestamp/open/high/low/close columns (see
+        app.utilities.ohlc_arrays). Only the tail kept by the buffer is materialised;
+        no signals are evaluated and nothing is logged. Returns the buffer length.
+        
+        In positive mode, once both symbols are warmed up the spread statistics are
+        seeded from the last spread_window bars the two histories share, so entries
+        do not wait for spread_window live bars after a cold start.
+        """
+        symbol = symbol or self.symbol1
+        max_needed = max(self.config.rsi_period, self.config.atr_period) + 10
+        candles = arrays_to_candle_dicts(ohlc_arrays, tail_start(ohlc_arrays, max_needed))
+        
+        if symbol == self.symbol1:
+            self.state.s1_candles = candles
+        elif symbol == self.symbol2:
+            self.state.s2_candles = candles
+        else:
+            raise ValueError(f"Symbol {symbol} is not part of {self.symbol1}/{self.symbol2}")
+        
+        if self.config.mode == "positive":
+            self._warm_up_closes[symbol] = (np.asarray(ohlc_arrays['timestamp']),
+                                            np.asarray(ohlc_arrays['close'], dtype=np.float64))
+            if len(self._warm_up_closes) == 2:
+                self._seed_spread(*self._warm_up_closes[self.symbol1], *self._warm_up_closes[self.symbol2])
+                self._warm_up_closes.clear()
+        return len(candles)
+    
+    def _seed_spread(self, s1_times: np.ndarray, s1_closes: np.ndarray, s2_times: np.ndarray, s2_closes: np.ndarray):
+        """Seed the spread statistics from the last bars both symbols have (matched on timestamp)"""
+        _, s1_rows, s2_rows = np.intersect1d(s1_times, s2_times, assume_unique=True, return_indices=True)
+        self.spread_stats.seed(s1_closes[s1_rows], s2_closes[s2_rows])
+    
     def calculate_indicators(self) -> Dict[str, float]:
         """Calculate RSI and ATR for both symbols"""
         indicators = {
@@ -87,24 +158,8 @@ class RSIPairsStrategy(BaseStrategy):
         return indicators
     
     def get_pip_size(self, symbol: str) -> float:
-        """Get pip size for symbol with comprehensive support (from notebook)"""
-        symbol = symbol.upper()
-        
-        # Precious metals
-        if symbol.startswith('XAU'):  # Gold (XAUUSD, XAUGBP, etc.)
-            return 0.1
-        elif symbol.startswith('XAG'):  # Silver (XAGUSD, XAGGBP, etc.)
-            return 0.001
-        elif symbol.startswith('XPD') or symbol.startswith('XPT'):  # Palladium/Platinum
-            return 0.1
-        
-        # JPY pairs - pip is always 0.01 regardless of digits
-        elif 'JPY' in symbol:
-            return 0.01
-        
-        # Standard forex pairs - assume 5-digit broker (most common)
-        else:
-            return 0.0001  # For 5-digit broker, pip = 0.0001
+        """Get pip size for symbol from the shared symbol spec registry"""
+        return self.symbol_registry.get(symbol).pip_size
     
     def calculate_hedge_ratio(self, s1_atr: float, s2_atr: float) -> float:
         """Calculate hedge ratio using ATR normalized to pips (from notebook)"""
@@ -133,13 +188,27 @@ class RSIPairsStrategy(BaseStrategy):
         
         return volatility_ratio
     
-    def calculate_lot_sizes(self, s1_atr: float, s2_atr: float, account_balance: float) -> tuple[float, float]:
-        """Calculate lot sizes with ATR-based hedge ratios and risk management"""
+    def spread_hedge_ratio(self, beta: float) -> float:
+        """symbol2 lots per symbol1 lot that hold the spread s1 - beta * s2 (positive mode)"""
+        s1_contract = self.symbol_registry.get(self.symbol1).contract_size
+        s2_contract = self.symbol_registry.get(self.symbol2).contract_size
+        return beta * s1_contract / s2_contract
+    
+    def entry_hedge_ratio(self, indicators: Dict[str, float]) -> float:
+        """Hedge ratio of a new trade: the spread beta in positive mode, the ATR ratio in negative mode"""
+        if self.config.mode == "positive":
+            return self.spread_hedge_ratio(indicators.get('beta', self.spread_stats.beta))
+        return self.calculate_hedge_ratio(indicators['s1_atr'], indicators['s2_atr'])
+    
+    def calculate_lot_sizes(self, s1_atr: float, s2_atr: float, account_balance: float,
+                            hedge_ratio: Optional[float] = None) -> tuple[float, float]:
+        """Calculate lot sizes with the given hedge ratio (ATR-based by default) and risk management"""
         # Use base lot size for symbol1 (from notebook approach)
         s1_lots = self.config.base_lot_size
         
         # Calculate hedge ratio using ATR normalized to pips
-        hedge_ratio = self.calculate_hedge_ratio(s1_atr, s2_atr)
+        if hedge_ratio is None:
+            hedge_ratio = self.calculate_hedge_ratio(s1_atr, s2_atr)
         s2_lots = s1_lots * hedge_ratio
         
         # Apply broker constraints and safety bounds
@@ -153,8 +222,9 @@ class RSIPairsStrategy(BaseStrategy):
         # Apply configurable safety bounds
         lot_size = max(self.config.safety_min_lot, min(self.config.safety_max_lot, lot_size))
         
-        # Round to standard step (0.01)
-        lot_size = round(lot_size / 0.01) * 0.01
+        # Round to the broker's lot step (0.01 unless broker metadata says otherwise)
+        lot_step = self.symbol_registry.get(symbol).volume_step
+        lot_size = round(lot_size / lot_step) * lot_step
         
         return max(self.config.safety_min_lot, lot_size)
     
@@ -176,9 +246,17 @@ class RSIPairsStrategy(BaseStrategy):
             elif s1_rsi < self.config.rsi_oversold and s2_rsi < self.config.rsi_oversold:
                 return "long"
         elif self.config.mode == "positive":
-            # Positive correlation: divergence signals (placeholder - needs specific implementation)
-            # TODO: Implement positive correlation logic when requirements are defined
-            pass
+            # Positive correlation: RSI divergence confirmed by a stretched hedge-adjusted spread.
+            # Sell the rich leg, buy the cheap one ("short_spread" = short symbol1 / long symbol2).
+            # The second leg is sized with the spread's beta, so it must be within the hedge bounds.
+            if not self.spread_stats.ready:
+                return None
+            min_divergence = getattr(self.config, "rsi_divergence",
+                                     self.config.rsi_overbought - self.config.rsi_oversold)
+            return positive_entry(self.spread_stats.divergence, indicators.get('spread_z', 0.0),
+                                  min_divergence, getattr(self.config, "spread_entry_z", 2.0),
+                                  self.entry_hedge_ratio(indicators),
+                                  self.config.min_hedge_ratio, self.config.max_hedge_ratio)
         
         return None
     
@@ -187,14 +265,18 @@ class RSIPairsStrategy(BaseStrategy):
         if not self.state.in_trade or not self.state.entry_time:
             return None
         
+        # Legs share the direction in negative mode and are opposite in positive mode
+        s1_type, s2_type = LEG_DIRECTIONS.get(
+            self.state.trade_direction, (self.state.trade_direction, self.state.trade_direction))
+        
         # Calculate current USD P&L for both positions using MT5-style calculation
         s1_pnl = self.calculate_pnl_usd(
-            self.symbol1, self.state.trade_direction, 
+            self.symbol1, s1_type, 
             self.state.lot_size_s1, self.state.entry_price_s1, current_s1_price
         )
         
         s2_pnl = self.calculate_pnl_usd(
-            self.symbol2, self.state.trade_direction,
+            self.symbol2, s2_type,
             self.state.lot_size_s2, self.state.entry_price_s2, current_s2_price
         )
         
@@ -209,15 +291,15 @@ class RSIPairsStrategy(BaseStrategy):
             return ("STOP_LOSS", total_pnl, s1_pnl, s2_pnl)
         
         # Check time limit
-        current_time = datetime.now()
+        current_time = self.clock.now()
         trade_duration = current_time - self.state.entry_time
         if trade_duration.total_seconds() / 3600 >= self.config.max_trade_hours:
             return ("TIME_LIMIT", total_pnl, s1_pnl, s2_pnl)
         
         return None
     
-    def _process_market_data(self, candle: MarketData) -> Optional[TradeSignal]:
-        """Process market data for pairs trading"""
+    def _add_primary_candle(self, candle: MarketData):
+        """Buffer a symbol1 bar (and the stand-in symbol2 bar when symbol2 data is missing)"""
         # This method processes data for the primary symbol (pair)
         # For now, assume this is symbol1 data and simulate symbol2 data
         self.add_candle_data(self.symbol1, candle)
@@ -236,13 +318,60 @@ class RSIPairsStrategy(BaseStrategy):
             max_needed = max(self.config.rsi_period, self.config.atr_period) + 10
             if len(self.state.s2_candles) > max_needed:
                 self.state.s2_candles = self.state.s2_candles[-max_needed:]
+    
+    def _has_indicator_data(self) -> bool:
+        return (len(self.state.s1_candles) >= self.config.rsi_period + 1 and
+                len(self.state.s2_candles) >= self.config.rsi_period + 1)
+    
+    def _update_spread(self, candle: MarketData, indicators: Dict[str, float]):
+        """O(1) rolling update; adds beta/spread/spread_z to the indicators"""
+        s2_close = self.state.s2_candles[-1]['close'] if self.state.s2_candles else candle.close
+        self.spread_stats.update(candle.close, s2_close, indicators['s1_rsi'], indicators['s2_rsi'])
+        indicators.update(self.spread_stats.spread_stats())
+    
+    def fast_forward(self, candles: List[MarketData]) -> int:
+        """
+        Buffer stale symbol1 bars without evaluating signals (catch-up, see app.services.catch_up).
+        
+        The spread statistics of the positive mode are still updated bar by bar so
+        they match a bar-by-bar run; entries and exits are only checked on the newest
+        bar, which goes through _process_market_data. Returns the number of bars skipped.
+        """
+        if not candles:
+            return 0
+        self.clock.observe(candles[-1].timestamp)
+        for candle in candles:
+            self._add_primary_candle(candle)
+            if self.config.mode == "positive" and self._has_indicator_data():
+                self._update_spread(candle, self.calculate_indicators())
+        return len(candles)
+    
+    def _process_market_data(self, candle: MarketData) -> Optional[TradeSignal]:
+        """Process market data for pairs trading, publishing the status and recording any signal"""
+        signal = self._evaluate_market_data(candle)
+        if self.status_board is not None:
+            self.publish_status()
+        if signal is None:
+            return None
+        if self.journal is not None:
+            self.journal.record_signal(candle.timestamp, signal, candle.close, int(self.state.in_trade))
+        if self.persistence is not None:
+            self.persistence.record_signal(self, signal, candle.timestamp, candle.close)
+        return signal
+    
+    def _evaluate_market_data(self, candle: MarketData) -> Optional[TradeSignal]:
+        self.clock.observe(candle.timestamp)
+        self._add_primary_candle(candle)
         
         # Check if we have sufficient data
-        if (len(self.state.s1_candles) < self.config.rsi_period + 1 or 
-            len(self.state.s2_candles) < self.config.rsi_period + 1):
+        if not self._has_indicator_data():
             return None
         
         indicators = self.calculate_indicators()
+        self._last_indicators = indicators
+        
+        if self.config.mode == "positive":
+            self._update_spread(candle, indicators)
         
         # Check exit conditions first
         if self.state.in_trade:
@@ -257,6 +386,7 @@ class RSIPairsStrategy(BaseStrategy):
                 self.state.s1_pnl = s1_pnl
                 self.state.s2_pnl = s2_pnl
                 
+                entry_time = self.state.entry_time
                 self.state.in_trade = False
                 self.state.entry_time = None
                 
@@ -264,6 +394,9 @@ class RSIPairsStrategy(BaseStrategy):
                 self.state.exit_price_s1 = candle.close
                 self.state.exit_price_s2 = self.state.s2_candles[-1]['close'] if self.state.s2_candles else candle.close
                 
+                if self.trade_ledger is not None:
+                    self.trade_ledger.append_pair_trade(self, entry_time, self.clock.now())
+                
                 logger.info(f"RSI Pairs Exit: {exit_reason} | Total P&L: ${total_pnl:.2f}")
                 
                 return TradeSignal(
@@ -278,20 +411,19 @@ class RSIPairsStrategy(BaseStrategy):
             if trade_type:
 
                 
-                # Calculate lot sizes with ATR-based hedge ratios
+                # Calculate lot sizes with the hedge ratio of the mode (spread beta or ATR ratio)
                 # No account balance calculation - use configured lot sizes directly
                 account_balance = 0  # Not used
                 
+                # Same ratio for sizing and storage
+                hedge_ratio = self.entry_hedge_ratio(indicators)
                 s1_lots, s2_lots = self.calculate_lot_sizes(
-                    indicators['s1_atr'], indicators['s2_atr'], account_balance
+                    indicators['s1_atr'], indicators['s2_atr'], account_balance, hedge_ratio
                 )
                 
-                # Calculate hedge ratio for storage
-                hedge_ratio = self.calculate_hedge_ratio(indicators['s1_atr'], indicators['s2_atr'])
-                
                 # Store comprehensive trade state
                 self.state.in_trade = True
-                self.state.entry_time = datetime.now()
+                self.state.entry_time = self.clock.now()
                 self.state.entry_price_s1 = candle.close
                 self.state.entry_price_s2 = self.state.s2_candles[-1]['close'] if self.state.s2_candles else candle.close
                 self.state.lot_size_s1 = s1_lots
@@ -308,7 +440,7 @@ class RSIPairsStrategy(BaseStrategy):
                 logger.info(f"RSI Pairs Entry: {trade_type} {self.symbol1}({s1_lots}) + {self.symbol2}({s2_lots})")
                 
                 # Return signal for symbol1 (in full implementation, would handle both symbols)
-                action = "BUY" if trade_type == "long" else "SELL"
+                action = "BUY" if LEG_DIRECTIONS[trade_type][0] == "long" else "SELL"
                 signal = TradeSignal(
                     action=action,
                     lot_size=s1_lots,
@@ -333,8 +465,24 @@ class RSIPairsStrategy(BaseStrategy):
     
     def get_strategy_status(self) -> Dict[str, Any]:
         """Get current strategy status with capital allocation"""
-        indicators = self.calculate_indicators()
-        
+        return self._build_status(self.calculate_indicators())
+    
+    def attach_status_board(self, board: "StatusBoard", key: Optional[str] = None) -> str:
+        """Publish the strategy status to a shared StatusBoard at the end of every bar"""
+        self.status_board = board
+        self.status_key = board.register(self, key)
+        self.publish_status()
+        return self.status_key
+    
+    def publish_status(self):
+        """Publish the status with the indicators of the last bar (computed once if there is none yet)"""
+        if self.status_board is None:
+            return
+        if self._last_indicators is None:
+            self._last_indicators = self.calculate_indicators()
+        self.status_board.publish(self.status_key, self._build_status(self._last_indicators))
+    
+    def _build_status(self, indicators: Dict[str, float]) -> Dict[str, Any]:
         # Direct MT5 trading - no capital allocation
         capital_info = {
             'allocated_capital': 0.0,
@@ -404,22 +552,8 @@ class RSIPairsStrategy(BaseStrategy):
         return usd_pnl
     
     def get_pip_value(self, symbol: str, lot_size: float) -> float:
-        """Get pip value in USD for given symbol and lot size (simplified)"""
-        symbol = symbol.upper()
-        
-        # Simplified pip values (actual values depend on current exchange rates)
-        if 'JPY' in symbol:
-            # For JPY pairs, 1 pip = 0.01, standard lot pip value ≈ $9.43 (varies with USD/JPY rate)
-            return 9.43 * lot_size
-        elif symbol.startswith('XAU'):  # Gold
-            # For XAUUSD, 1 pip = 0.1, standard lot pip value = $1
-            return 1.0 * lot_size
-        elif symbol.startswith('XAG'):  # Silver
-            # For XAGUSD, 1 pip = 0.001, standard lot pip value = $5
-            return 5.0 * lot_size
-        else:
-            # For major USD pairs, 1 pip = 0.0001, standard lot pip value = $10
-            return 10.0 * lot_size
+        """Get pip value in account currency for given symbol and lot size"""
+        return self.symbol_registry.get(symbol).pip_value * lot_size
     
     def calculate_pips(self, symbol: str, entry_price: float, current_price: float, trade_type: str) -> float:
         """Calculate profit/loss in pips"""
@@ -434,7 +568,39 @@ class RSIPairsStrategy(BaseStrategy):
         
         return pips
     
+    def snapshot_state(self) -> Dict[str, Any]:
+        """Full strategy state for app.services.state_snapshot (candles stored as columns)"""
+        state = {k: v for k, v in vars(self.state).items() if k not in ('s1_candles', 's2_candles')}
+        return {
+            'state': state,
+            's1_candles': candles_to_arrays(self.state.s1_candles),
+            's2_candles': candles_to_arrays(self.state.s2_candles),
+            'spread': self.spread_stats.snapshot()
+        }
+    
+    def restore_state(self, snapshot: Dict[str, Any]):
+        """Restore state written by snapshot_state()"""
+        state = RSIPairsState()
+        for key, value in snapshot['state'].items():
+            setattr(state, key, value)
+        state.s1_candles = arrays_to_candle_dicts(snapshot['s1_candles'])
+        state.s2_candles = arrays_to_candle_dicts(snapshot['s2_candles'])
+        self.state = state
+        if 'spread' in snapshot:
+            self.spread_stats.restore(snapshot['spread'])
+        elif self.config.mode == "positive":
+            # Snapshot without spread statistics: seed them from the restored buffers
+            s1 = candles_to_arrays(state.s1_candles)
+            s2 = candles_to_arrays(state.s2_candles)
+            self._seed_spread(s1['timestamp'], s1['close'], s2['timestamp'], s2['close'])
+        logger.info(f"RSI Pairs state restored: {self.symbol1}/{self.symbol2} in_trade={self.state.in_trade}")
+        self._last_indicators = None
+        self.publish_status()
+    
     def reset_strategy(self):
         """Reset strategy state"""
         logger.info("Resetting RSI Pairs strategy state")
-        self.state = RSIPairsState()
\ No newline at end of file
+        self.state = RSIPairsState()
+        self.spread_stats = SpreadStats(self.spread_stats.window)
+        self._last_indicators = None
+        self.publish_status()